@@ -1,26 +1,92 @@
-from saleae.analyzers import AnalyzerFrame
+try:
+    from saleae.analyzers import AnalyzerFrame
+except ImportError:
+    from OfflineAnalyzers import AnalyzerFrame
+from Constants import HEX
 
 
+# Output frame of the APDU decoding, kept as a compact record until it is returned: only the times of its input
+# frames and the decoded value are stored, the hex string and the AnalyzerFrame are built by getOutputFrame().
 class APDU_Frame:
+    __slots__ = ('title', 'type', 'data', 'value', 'start_time', 'end_time', 'isTwoBytes', 'turnaround', 'response')
 
-    def __init__(self, title: str, type: str, data: str, hexString: str, frame1, frame2=None):
+    # `value` is one byte, or two bytes when the frame spans two input frames (`frame2`). Without `data`, the
+    # transmitted data is the hex string.
+    def __init__(self, title: str, type: str, data, value: int, frame1, frame2=None):
         self.title = title
         self.type = type
         self.data = data
-        self.hexString = hexString
-        self.inputFrame1 = frame1
-        self.inputFrame2 = frame2
-
-    def getOutputFrame(self):
-        if self.inputFrame2 is not None:
-            return AnalyzerFrame(self.title, self.inputFrame1.start_time, self.inputFrame2.end_time, {
-                'category': self.type,
-                'transmitted_data': self.data,
-                'hex': self.hexString
-            })
+        self.value = value
+        self.start_time = frame1.start_time
+        if frame2 is not None:
+            self.end_time = frame2.end_time
+            self.isTwoBytes = True
         else:
-            return AnalyzerFrame(self.title, self.inputFrame1.start_time, self.inputFrame1.end_time, {
-                'category': self.type,
-                'transmitted_data': self.data,
-                'hex': self.hexString
-            })
+            self.end_time = frame1.end_time
+            self.isTwoBytes = False
+        # Time from the end of the command to the answer, in nanoseconds, for the status of an answer
+        self.turnaround = None
+        # Time from the procedure byte of T=0 to the first character of the answer, in nanoseconds
+        self.response = None
+
+    def getHexString(self):
+        if self.isTwoBytes:
+            hexString = HEX[self.value >> 8] + HEX[self.value & 0xFF]
+        else:
+            hexString = HEX[self.value]
+
+        # Bytes of the command are shown as 0x.., bytes of the answer as they are
+        if self.title == 'APDU':
+            return '0x' + hexString
+        return hexString
+
+    # Output frame of the session number `session`.
+    def getOutputFrame(self, session):
+        hexString = self.getHexString()
+        data = {
+            'category': self.type,
+            'transmitted_data': hexString if self.data is None else self.data,
+            'hex': hexString,
+            'session': session
+        }
+        if self.turnaround is not None:
+            data['turnaround_ns'] = self.turnaround
+        if self.response is not None:
+            data['response_ns'] = self.response
+        return AnalyzerFrame(self.title, self.start_time, self.end_time, data)
+
+
+# Output frame of any number of bytes, held in `raw`: a BER-TLV data object of an answer (from its tag to the end of
+# its value, or to the end of its length for a constructed object, whose children have their own frames), a run of
+# NULL procedure bytes...
+class Raw_Frame(APDU_Frame):
+    __slots__ = ('raw',)
+
+    def __init__(self, title, type, data, raw, frame1, frame2):
+        super().__init__(title, type, data, None, frame1, frame2)
+        self.raw = raw
+
+    def getHexString(self):
+        return self.raw.hex().upper()
+
+
+# Status word ending an answer fetched in several exchanges (61 XX, 6C XX): besides SW1-SW2, it carries the INS of
+# the command, the number of `exchanges`, the whole data of the answer in `raw`, and `elapsed`, the time from the
+# start of the first command in nanoseconds.
+class Transaction_Frame(APDU_Frame):
+    __slots__ = ('ins', 'exchanges', 'raw', 'elapsed')
+
+    def __init__(self, data, value, ins, exchanges, raw, elapsed, frame1, frame2):
+        super().__init__('APDU Ans', 'SW1-SW2', data, value, frame1, frame2)
+        self.ins = ins
+        self.exchanges = exchanges
+        self.raw = raw
+        self.elapsed = elapsed
+
+    def getOutputFrame(self, session):
+        frame = super().getOutputFrame(session)
+        frame.data['ins'] = HEX[self.ins]
+        frame.data['exchanges'] = self.exchanges
+        frame.data['transaction_hex'] = self.raw.hex().upper()
+        frame.data['elapsed_ns'] = self.elapsed
+        return frame
@@ -0,0 +1,57 @@
+# Cache of the parsed ATRs, shared by every analyzer: captures of warm resets repeat the same ATR again and again.
+#
+# The ATRs are stored in a tree with one node per character, keyed by the value of the character. TS is decoded
+# anyway, as it sets the convention: the lookups start with T0. Each node holds the type and decoded data of its
+# character, which only depend on the characters before it, and the node of the last character holds the interface
+# parameters of the ATR. A repeated ATR then costs one lookup per character.
+import copy
+
+# Number of different ATRs kept. Once it is reached, new ATRs are decoded but not stored anymore.
+ATR_CACHE_SIZE = 256
+
+
+class ATRNode:
+    __slots__ = ('type', 'readData', 'children', 'parameters', 'transferOk')
+
+    def __init__(self, type, readData):
+        self.type = type
+        self.readData = readData
+        # Value of the next character -> ATRNode
+        self.children = {}
+        # Attributes of the analyzer set by the ATR, on the node of its last character only
+        self.parameters = None
+        # Result of the TCK check, None without TCK
+        self.transferOk = None
+
+
+class ATRCache:
+
+    def __init__(self, capacity=ATR_CACHE_SIZE):
+        self.capacity = capacity
+        # TS -> ATRNode of TS
+        self.roots = {}
+        self.count = 0
+
+    # Node of TS for the ATRs starting with `ts`, None if there is none.
+    def find(self, ts):
+        return self.roots.get(ts)
+
+    # Store the ATR `atr`, the (type, readData) of each of its characters in `annotations` and the attributes it set
+    # in `parameters`. Mutable values are copied: the analyzer goes on changing its own.
+    def store(self, atr, annotations, parameters, transferOk):
+        if self.count >= self.capacity or len(atr) < 2 or len(annotations) != len(atr):
+            return
+        # setdefault: analyzers running in other threads may store the same ATR
+        children = self.roots
+        for value, (type, readData) in zip(atr, annotations):
+            node = children.get(value)
+            if node is None:
+                node = children.setdefault(value, ATRNode(type, readData))
+            children = node.children
+        if node.parameters is None:
+            node.transferOk = transferOk
+            node.parameters = {name: copy.copy(value) for name, value in parameters.items()}
+            self.count += 1
+
+
+atrCache = ATRCache()
@@ -0,0 +1,106 @@
+# Batch decoding of a directory of Logic 2 async serial exports, one capture per worker process.
+#
+# Usage: python Batch.py captures/ -o decoded/ [--workers 8] [--edc-type LRC]
+import argparse
+import concurrent.futures
+import csv
+import os
+import sys
+import time
+
+from Constants import EDC_Type, T0_Framing
+from Instructions import INSTRUCTION_SETS, DEFAULT_INSTRUCTION_SET
+from Replay import DEFAULT_CHAR_DURATION, replay
+
+DECODED_SUFFIX = '.decoded.csv'
+SUMMARY_FIELDS = ('capture', 'output', 'characters', 'frames', 'seconds', 'error')
+
+
+# Captures of `inputDir` matching `extension`, sorted so that the output order does not depend on the file system.
+def findCaptures(inputDir, extension='.csv'):
+    return sorted(name for name in os.listdir(inputDir)
+                  if name.endswith(extension) and not name.endswith(DECODED_SUFFIX)
+                  and os.path.isfile(os.path.join(inputDir, name)))
+
+
+# Decode one capture in a worker process, with its own analyzer. Errors are returned, so that one bad capture does
+# not stop the batch.
+def decodeCapture(inputPath, outputPath, charDuration, settings):
+    start = time.perf_counter()
+    try:
+        with open(inputPath, newline='') as inputFile, open(outputPath, 'w', newline='') as outputFile:
+            charCount, frameCount = replay(inputFile, outputFile, charDuration, **settings)
+    except Exception as e:
+        return 0, 0, time.perf_counter() - start, '{}: {}'.format(type(e).__name__, e)
+    return charCount, frameCount, time.perf_counter() - start, ''
+
+
+# Decode every capture of `inputDir` into `outputDir` with `workers` processes, and write one summary row per
+# capture, in the order of the file names. Return the number of captures that could not be decoded.
+def decodeDirectory(inputDir, outputDir, summaryFile, workers=None, charDuration=DEFAULT_CHAR_DURATION, **settings):
+    names = findCaptures(inputDir)
+    os.makedirs(outputDir, exist_ok=True)
+    outputNames = [os.path.splitext(name)[0] + DECODED_SUFFIX for name in names]
+
+    writer = csv.writer(summaryFile)
+    writer.writerow(SUMMARY_FIELDS)
+
+    errorCount = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() returns the results in submission order, as soon as each of them and the previous ones are done
+        results = executor.map(decodeCapture,
+                               [os.path.join(inputDir, name) for name in names],
+                               [os.path.join(outputDir, name) for name in outputNames],
+                               [charDuration] * len(names), [settings] * len(names))
+        for name, outputName, (charCount, frameCount, seconds, error) in zip(names, outputNames, results):
+            writer.writerow((name, outputName, charCount, frameCount, '{:.3f}'.format(seconds), error))
+            summaryFile.flush()
+            if error:
+                errorCount += 1
+                print('{}: {}'.format(name, error), file=sys.stderr)
+
+    return len(names), errorCount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Decode every CSV export of a directory with the ISO7816 analyzer.')
+    parser.add_argument('input', help='directory of async serial exports (CSV)')
+    parser.add_argument('-o', '--output', required=True, help='directory of the decoded frames, one CSV per capture')
+    parser.add_argument('--summary', help='summary CSV (default: OUTPUT/summary.csv)')
+    parser.add_argument('-j', '--workers', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--edc-type', choices=(EDC_Type.NA, EDC_Type.LRC, EDC_Type.CRC), default=EDC_Type.NA,
+                        help='error detection code used by T=1 blocks')
+    parser.add_argument('--t0-framing', choices=(T0_Framing.PROCEDURE_BYTES, T0_Framing.APDU),
+                        default=T0_Framing.PROCEDURE_BYTES,
+                        help='split T=0 exchanges by their procedure bytes, or by the timing for captures of '
+                             'whole APDUs (default: %(default)s)')
+    parser.add_argument('--instruction-set', choices=list(INSTRUCTION_SETS), default=DEFAULT_INSTRUCTION_SET,
+                        help='names of the instructions (default: %(default)s)')
+    parser.add_argument('--char-duration', type=float, default=DEFAULT_CHAR_DURATION,
+                        help='character duration in seconds, used when the exports have no duration column')
+    parser.add_argument('--clock-frequency', type=float, default=0,
+                        help='card clock frequency in Hz (default: 4.8 MHz)')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input):
+        parser.error('{} is not a directory'.format(args.input))
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers must be at least 1')
+
+    summaryPath = args.summary or os.path.join(args.output, 'summary.csv')
+    os.makedirs(args.output, exist_ok=True)
+    with open(summaryPath, 'w', newline='') as summaryFile:
+        captureCount, errorCount = decodeDirectory(args.input, args.output, summaryFile, args.workers,
+                                                   args.char_duration, edc_type=args.edc_type,
+                                                   clock_frequency=args.clock_frequency,
+                                                   instruction_set=args.instruction_set,
+                                                   t0_framing=args.t0_framing)
+
+    print('{} captures decoded, {} failed. Summary: {}'.format(captureCount - errorCount, errorCount, summaryPath),
+          file=sys.stderr)
+    if errorCount:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+# Throughput benchmark of Hla.decode on reproducible synthetic traces, one scenario per protocol phase.
+#
+# Usage: python Benchmark.py [-o benchmark.json] [--compare previous.json] [--scenario t0-4S] [--exchanges 200]
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import Constants
+from Checksum import computeCRC, computeLRC
+from Constants import EDC_Type, T0_Framing
+from HighLevelAnalyzer import AnalyzerFrame
+from OfflineAnalyzers import SaleaeTime
+from Replay import createAnalyzer
+
+DEFAULT_ETU = Constants.DEFAULT_Fi / (Constants.DEFAULT_Di * Constants.DEFAULT_f)
+SEED = 7816
+
+
+# Build the input frames of a capture, character by character, with the timing of a real line.
+class TraceBuilder:
+
+    def __init__(self, isDirect=True, etu=DEFAULT_ETU):
+        self.isDirect = isDirect
+        self.etu = etu
+        self.time = 0.0
+        self.frames = []
+
+    # Send characters separated by `gap` ETU of guard time, the first one after `delay` ETU of idle line.
+    def send(self, values, delay=2, gap=2):
+        self.time += (delay - gap) * self.etu
+        for value in values:
+            if not self.isDirect:
+                value = Constants.INVERSE_CONVENTION[value]
+            self.time += gap * self.etu
+            end = self.time + 10 * self.etu
+            self.frames.append(AnalyzerFrame('data', SaleaeTime(self.time), SaleaeTime(end),
+                                             {'data': bytes((value,))}))
+            self.time = end
+
+
+def withTCK(atr):
+    return atr + [computeLRC(atr[1:])]
+
+
+# TS, T0 = 2 historical bytes (T=0 by default, so no TCK), T1 T2
+ATR_T0 = [0x3B, 0x02, 0x14, 0x50]
+# Same ATR, TS announcing the inverse convention
+ATR_T0_INVERSE = [0x3F, 0x02, 0x14, 0x50]
+# TS, T0 = TA(1) + TD(1), TA(1) = Fi 512 / Di 16, TD(1) = TD(2) + T=0, TD(2) = T=1
+ATR_PPS = withTCK([0x3B, 0x90, 0x95, 0x80, 0x01])
+# TS, T0 = TD(1), TD(1) = TD(2) + T=1, TD(2) = TA(3) + TB(3) + T=1, IFSC = 254, BWI/CWI
+ATR_T1 = withTCK([0x3B, 0x80, 0x81, 0x31, 0xFE, 0x45])
+PPS_REQUEST = [0xFF, 0x10, 0x95]
+PPS_REQUEST = PPS_REQUEST + [computeLRC(PPS_REQUEST)]
+
+
+def randomBytes(rng, length):
+    return [rng.randrange(256) for _ in range(length)]
+
+
+# Command and answer bytes of an APDU of the given case (SEE: iso7816_4 part 5.3.2).
+def buildAPDU(rng, case):
+    header = [0x00, rng.choice((0xB0, 0xD6, 0xA4, 0x88, 0xCA)), rng.randrange(256), rng.randrange(256)]
+    lc = rng.randrange(1, 256)
+    le = rng.randrange(1, 256)
+    extendedLc = rng.randrange(256, 1024)
+    extendedLe = rng.randrange(256, 1024)
+
+    if case == '1':
+        command, answerLength = header, 0
+    elif case == '2S':
+        command, answerLength = header + [le], le
+    elif case == '3S':
+        command, answerLength = header + [lc] + randomBytes(rng, lc), 0
+    elif case == '4S':
+        command, answerLength = header + [lc] + randomBytes(rng, lc) + [le], le
+    elif case == '2E':
+        command, answerLength = header + [0x00, extendedLe >> 8, extendedLe & 0xFF], extendedLe
+    elif case == '3E':
+        command = header + [0x00, extendedLc >> 8, extendedLc & 0xFF] + randomBytes(rng, extendedLc)
+        answerLength = 0
+    else:
+        command = header + [0x00, extendedLc >> 8, extendedLc & 0xFF] + randomBytes(rng, extendedLc) + \
+                  [extendedLe >> 8, extendedLe & 0xFF]
+        answerLength = extendedLe
+
+    return command, randomBytes(rng, answerLength) + [0x90, 0x00]
+
+
+def atrSessions(isDirect, count):
+    sessions = []
+    for _ in range(count):
+        builder = TraceBuilder(isDirect)
+        builder.send(ATR_T0 if isDirect else ATR_T0_INVERSE)
+        sessions.append(builder.frames)
+    return sessions
+
+
+def ppsSessions(count):
+    sessions = []
+    for _ in range(count):
+        builder = TraceBuilder()
+        builder.send(ATR_PPS)
+        builder.send(PPS_REQUEST, delay=200)
+        builder.send(PPS_REQUEST, delay=20)
+        sessions.append(builder.frames)
+    return sessions
+
+
+def t0Session(case, exchanges):
+    rng = random.Random(SEED)
+    builder = TraceBuilder()
+    builder.send(ATR_T0)
+    for _ in range(exchanges):
+        command, answer = buildAPDU(rng, case)
+        builder.send(command, delay=200)
+        builder.send(answer, delay=8)
+    return [builder.frames]
+
+
+def t1Session(edcType, exchanges):
+    rng = random.Random(SEED)
+    builder = TraceBuilder()
+    builder.send(ATR_T1)
+    sequence = 0
+    for _ in range(exchanges):
+        for inf in (randomBytes(rng, 254), randomBytes(rng, 32) + [0x90, 0x00]):
+            block = [0x00, sequence << 6, len(inf)] + inf
+            if edcType == EDC_Type.LRC:
+                block.append(computeLRC(block))
+            else:
+                crc = computeCRC(block)
+                block += [crc >> 8, crc & 0xFF]
+            builder.send(block, delay=200)
+            sequence ^= 1
+    return [builder.frames]
+
+
+# Extended UPDATE BINARY commands and long answers split in I-blocks of IFSC_CHAINED bytes, every block but the last
+# of a chain being acknowledged by an R-block.
+IFSC_CHAINED = 254
+
+
+def t1ChainedSession(exchanges):
+    rng = random.Random(SEED)
+    builder = TraceBuilder()
+    builder.send(ATR_T1)
+    # N(S) of the reader and of the card
+    sequences = [0, 0]
+
+    def sendBlock(pcb, inf):
+        block = [0x00, pcb, len(inf)] + inf
+        builder.send(block + [computeLRC(block)], delay=200)
+
+    for _ in range(exchanges):
+        data = randomBytes(rng, 600)
+        command = [0x00, 0xD6, 0x00, 0x00, 0x00, len(data) >> 8, len(data) & 0xFF] + data
+        answer = randomBytes(rng, 256) + [0x90, 0x00]
+        for sender, apdu in ((0, command), (1, answer)):
+            for start in range(0, len(apdu), IFSC_CHAINED):
+                isLast = start + IFSC_CHAINED >= len(apdu)
+                sendBlock(sequences[sender] << 6 | (0 if isLast else 0x20), apdu[start:start + IFSC_CHAINED])
+                sequences[sender] ^= 1
+                if not isLast:
+                    # R-block of the receiver, asking for the next N(S)
+                    sendBlock(0x80 | sequences[sender] << 4, [])
+    return [builder.frames]
+
+
+# T=0 exchanges with their procedure bytes: a case 4 SELECT FILE answered 61 XX and its GET RESPONSE, the card
+# sending NULL bytes while it is busy, then an UPDATE BINARY acknowledged byte by byte.
+def t0TransportSession(exchanges):
+    rng = random.Random(SEED)
+    builder = TraceBuilder()
+    builder.send(ATR_T0)
+    for _ in range(exchanges):
+        data = randomBytes(rng, rng.randrange(1, 256))
+        answer = randomBytes(rng, rng.randrange(1, 256))
+        builder.send([0x00, 0xA4, 0x04, 0x00, len(data)], delay=200)
+        builder.send([0xA4], delay=8)
+        builder.send(data, delay=8)
+        builder.send([0x61, len(answer)], delay=8)
+
+        builder.send([0x00, 0xC0, 0x00, 0x00, len(answer)], delay=200)
+        builder.send([0x60, 0x60], delay=8, gap=1000)
+        builder.send([0xC0] + answer + [0x90, 0x00], delay=1000)
+
+        update = randomBytes(rng, 16)
+        builder.send([0x00, 0xD6, 0x00, 0x00, len(update)], delay=200)
+        for value in update:
+            builder.send([0xD6 ^ 0xFF], delay=8)
+            builder.send([value], delay=8)
+        builder.send([0x90, 0x00], delay=8)
+    return [builder.frames]
+
+
+# Warm resets of the card in one capture: ATR and a case 4S APDU, again and again, after an idle line of RESET_IDLE
+# ETU.
+RESET_IDLE = 100
+
+
+def resetsSession(exchanges):
+    rng = random.Random(SEED)
+    builder = TraceBuilder()
+    for _ in range(exchanges):
+        builder.send(ATR_T0, delay=RESET_IDLE)
+        command, answer = buildAPDU(rng, '4S')
+        builder.send(command, delay=200)
+        builder.send(answer, delay=8)
+    return [builder.frames]
+
+
+# Scenario name -> (settings, function building the list of sessions). Every session is decoded by a new analyzer.
+def buildScenarios(exchanges):
+    scenarios = {
+        'atr-direct': ({}, lambda: atrSessions(True, exchanges)),
+        'atr-inverse': ({}, lambda: atrSessions(False, exchanges)),
+        'pps': ({}, lambda: ppsSessions(exchanges)),
+    }
+    # Whole APDUs without procedure bytes, split by the timing
+    apduFraming = {'t0_framing': T0_Framing.APDU}
+    for case in ('1', '2S', '3S', '4S', '2E', '3E', '4E'):
+        scenarios['t0-' + case] = (apduFraming, lambda case=case: t0Session(case, exchanges))
+    scenarios['t0-transport'] = ({}, lambda: t0TransportSession(exchanges))
+    for edcType in (EDC_Type.LRC, EDC_Type.CRC):
+        scenarios['t1-' + edcType.lower()] = ({'edc_type': edcType}, lambda edcType=edcType: t1Session(edcType, exchanges))
+    scenarios['t1-chained'] = ({'edc_type': EDC_Type.LRC}, lambda: t1ChainedSession(exchanges))
+    scenarios['resets'] = (apduFraming, lambda: resetsSession(exchanges))
+    return scenarios
+
+
+def decodeSessions(sessions, settings):
+    frameCount = 0
+    for frames in sessions:
+        hla = createAnalyzer(**settings)
+        for out in map(hla.decode, frames):
+            if out is None:
+                continue
+            frameCount += 1 if isinstance(out, AnalyzerFrame) else len(out)
+        out = hla.flush()
+        if out is not None:
+            frameCount += len(out)
+    return frameCount
+
+
+def runScenario(sessions, settings, repeat):
+    charCount = sum(len(frames) for frames in sessions)
+
+    # Best of `repeat` runs for the throughput, then a separate run for the memory since tracing slows decoding down.
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frameCount = decodeSessions(sessions, settings)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    tracemalloc.start()
+    decodeSessions(sessions, settings)
+    peakMemory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'characters': charCount,
+        'frames': frameCount,
+        'seconds': best,
+        'characters_per_second': charCount / best,
+        'frames_per_second': frameCount / best,
+        'peak_memory_bytes': peakMemory,
+    }
+
+
+def printResults(results, previous=None):
+    print('{:<12} {:>10} {:>10} {:>14} {:>14} {:>12}'.format(
+        'scenario', 'chars', 'frames', 'chars/s', 'frames/s', 'peak KiB'), end='')
+    print('  speedup' if previous else '')
+    for name, result in results.items():
+        print('{:<12} {:>10} {:>10} {:>14.0f} {:>14.0f} {:>12.1f}'.format(
+            name, result['characters'], result['frames'], result['characters_per_second'],
+            result['frames_per_second'], result['peak_memory_bytes'] / 1024), end='')
+        if previous and name in previous:
+            print('  {:>6.2f}x'.format(result['characters_per_second'] /
+                                      previous[name]['characters_per_second']))
+        else:
+            print()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the throughput of Hla.decode per protocol phase.')
+    parser.add_argument('-o', '--output', default='benchmark.json', help='JSON results file (default: %(default)s)')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare with')
+    parser.add_argument('--scenario', action='append', help='scenario to run (default: all). Can be repeated')
+    parser.add_argument('--exchanges', type=int, default=200,
+                        help='ATR/PPS sessions or APDU exchanges per scenario (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per scenario (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    scenarios = buildScenarios(args.exchanges)
+    names = args.scenario or list(scenarios)
+    unknown = [name for name in names if name not in scenarios]
+    if unknown:
+        parser.error('unknown scenario {}. Choose from {}'.format(', '.join(unknown), ', '.join(scenarios)))
+
+    results = {}
+    with open(os.devnull, 'w') as devnull:
+        for name in names:
+            settings, build = scenarios[name]
+            sessions = build()
+            # The analyzer console messages are part of the decoding cost, but not of the benchmark output
+            with contextlib.redirect_stdout(devnull):
+                results[name] = runScenario(sessions, settings, args.repeat)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)['scenarios']
+    printResults(results, previous)
+
+    with open(args.output, 'w') as file:
+        json.dump({
+            'python': sys.version,
+            'platform': platform.platform(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'exchanges': args.exchanges,
+            'scenarios': results,
+        }, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
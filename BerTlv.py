@@ -0,0 +1,181 @@
+# Streaming decoder of BER-TLV data objects (SEE: iso7816_4 part 5.2.2 and annex D), as found in the answers to
+# SELECT FILE (FCI, FCP), READ RECORD (EMV records) or GET DATA.
+#
+# The decoder runs over a memoryview of the stored bytes and only keeps offsets: values are never copied. Data may
+# arrive in chunks: an object cut by the end of the data is left for the next call, once more bytes are stored.
+
+# Names of common tags (SEE: iso7816_4 part 5 and EMV Book 3 annex A).
+TAG_NAMES = {
+    0x4F: 'Application identifier',
+    0x50: 'Application label',
+    0x57: 'Track 2 equivalent data',
+    0x5A: 'Application PAN',
+    0x61: 'Application template',
+    0x62: 'FCP template',
+    0x64: 'FMD template',
+    0x6F: 'FCI template',
+    0x70: 'Record template',
+    0x77: 'Response message template format 2',
+    0x80: 'Response message template format 1',
+    0x82: 'File descriptor',
+    0x83: 'File identifier',
+    0x84: 'DF name',
+    0x87: 'Application priority indicator',
+    0x88: 'Short EF identifier',
+    0x8A: 'Life cycle status',
+    0x8C: 'CDOL1',
+    0x8D: 'CDOL2',
+    0x8E: 'CVM list',
+    0x8F: 'CA public key index',
+    0x90: 'Issuer public key certificate',
+    0x94: 'Application file locator',
+    0xA5: 'FCI proprietary template',
+    0x5F20: 'Cardholder name',
+    0x5F24: 'Application expiration date',
+    0x5F25: 'Application effective date',
+    0x5F28: 'Issuer country code',
+    0x5F2D: 'Language preference',
+    0x5F34: 'PAN sequence number',
+    0x9F07: 'Application usage control',
+    0x9F08: 'Application version number',
+    0x9F0D: 'IAC default',
+    0x9F0E: 'IAC denial',
+    0x9F0F: 'IAC online',
+    0x9F11: 'Issuer code table index',
+    0x9F12: 'Application preferred name',
+    0x9F36: 'Application transaction counter',
+    0x9F38: 'PDOL',
+    0x9F4A: 'SDA tag list',
+    0x9F4D: 'Log entry',
+    0xBF0C: 'FCI issuer discretionary data',
+}
+
+# Instructions answering BER-TLV data objects: SELECT FILE, READ RECORD(S) and GET DATA. The data fetched with GET
+# RESPONSE is decoded after the INS of the command it answers.
+TLV_INSTRUCTIONS = frozenset((0xA4, 0xB2, 0xCA, 0xCB))
+
+# Longest tag and longest length field supported, in bytes.
+MAX_TAG_SIZE = 4
+MAX_LENGTH_SIZE = 4
+
+
+class TLVError(Exception):
+    pass
+
+
+# Data object found at `start` in the data: its tag, then its value from `valueStart` to `end` (excluded). The
+# children of a constructed object follow it, one `depth` deeper.
+class TLVObject:
+    __slots__ = ('tag', 'constructed', 'start', 'valueStart', 'end', 'depth')
+
+    def __init__(self, tag, constructed, start, valueStart, end, depth):
+        self.tag = tag
+        self.constructed = constructed
+        self.start = start
+        self.valueStart = valueStart
+        self.end = end
+        self.depth = depth
+
+    def getTagName(self):
+        return TAG_NAMES.get(self.tag, '')
+
+    # Value of the object in `data`, as a view on it.
+    def getValue(self, data):
+        return data[self.valueStart:self.end]
+
+
+# Incremental decoder: parse() decodes the objects completed by the bytes stored since the previous call.
+class TLVParser:
+
+    def __init__(self, start=0):
+        # Offset of the next object to decode
+        self.position = start
+        # Ends of the constructed objects holding the next one, innermost last
+        self.parents = []
+
+    # Decode the objects of `data` (bytes, bytearray or memoryview) from the current position. Constructed objects
+    # are returned as soon as their tag and length are known, before their children; a primitive object once its
+    # value is complete. Return the decoded objects, in the order of the data. Raise TLVError if the data is not
+    # BER-TLV.
+    def parse(self, data):
+        size = len(data)
+        position = self.position
+        parents = self.parents
+        objects = []
+
+        while position < size:
+            # The constructed objects ending here are complete
+            while parents and parents[-1] == position:
+                parents.pop()
+
+            first = data[position]
+            # '00' and 'FF' are not tags: padding before, between or after the objects
+            if first == 0x00 or first == 0xFF:
+                position += 1
+                continue
+
+            # Tag: one byte, or more if the tag number is not in the first byte (bit 8 set in all but the last one)
+            offset = position + 1
+            tag = first
+            if first & 0x1F == 0x1F:
+                while offset < size:
+                    if offset - position == MAX_TAG_SIZE:
+                        raise TLVError('Tag longer than {} bytes at offset {}.'.format(MAX_TAG_SIZE, position))
+                    value = data[offset]
+                    tag = tag << 8 | value
+                    offset += 1
+                    if not value & 0x80:
+                        break
+                else:
+                    # The tag is not stored yet
+                    break
+            if offset == size:
+                break
+
+            # Length: one byte up to 127, else the number of the length bytes that follow
+            length = data[offset]
+            offset += 1
+            if length & 0x80:
+                lengthSize = length & 0x7F
+                if not lengthSize or lengthSize > MAX_LENGTH_SIZE:
+                    raise TLVError('Unsupported length field {:02X} at offset {}.'.format(length, offset - 1))
+                if offset + lengthSize > size:
+                    break
+                length = int.from_bytes(data[offset:offset + lengthSize], 'big')
+                offset += lengthSize
+
+            end = offset + length
+            if parents and end > parents[-1]:
+                raise TLVError('Object at offset {} ends after its parent.'.format(position))
+
+            constructed = bool(first & 0x20)
+            if constructed:
+                objects.append(TLVObject(tag, True, position, offset, end, len(parents)))
+                parents.append(end)
+                position = offset
+            elif end <= size:
+                objects.append(TLVObject(tag, False, position, offset, end, len(parents)))
+                position = end
+            else:
+                # The value is not stored yet
+                break
+
+        self.position = position
+        return objects
+
+    # True if every object started was complete at the end of the `size` bytes data.
+    def isComplete(self, size):
+        return self.position == size and all(end == size for end in self.parents)
+
+
+# Objects of the data from `start` to `end` (excluded) of `data`, with their offsets in `data`, and the offset where
+# the decoding stopped: the bytes after it are not part of a complete object. Return no objects if the data is not
+# BER-TLV.
+def parseTLV(data, start, end):
+    with memoryview(data) as view:
+        parser = TLVParser(start)
+        try:
+            objects = parser.parse(view[:end])
+        except TLVError:
+            return [], start
+        return objects, parser.position
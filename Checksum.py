@@ -0,0 +1,46 @@
+from functools import reduce
+from operator import xor
+
+# Divider of the T=1 CRC (x^16+x^12+x^5+1), most significant bit first.
+CRC16_POLYNOMIAL = 0x1021
+CRC16_INIT = 0xFFFF
+
+
+def _buildCRC16Table():
+    table = []
+    for value in range(256):
+        crc = value << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = (crc << 1) ^ CRC16_POLYNOMIAL
+            else:
+                crc <<= 1
+        table.append(crc & 0xFFFF)
+    return tuple(table)
+
+
+# Remainder of every possible leading byte, so the division costs one lookup per byte.
+CRC16_TABLE = _buildCRC16Table()
+
+
+# Return the CRC-16 of a byte buffer. `crc` can be used to carry on a computation over several chunks.
+def computeCRC(data, crc=CRC16_INIT) -> int:
+    table = CRC16_TABLE
+    for value in data:
+        crc = ((crc << 8) & 0xFF00) ^ table[(crc >> 8) ^ value]
+    return crc
+
+
+# Check a buffer ending with its two CRC bytes (MSB first): the remainder of the whole buffer is then 0.
+def checkCRC(data) -> bool:
+    return computeCRC(data) == 0
+
+
+# Return the XOR of every byte of the buffer (T=1 LRC, ATR TCK and PPS PCK).
+def computeLRC(data) -> int:
+    return reduce(xor, data, 0)
+
+
+# Check a buffer ending with its LRC byte: XORing every byte, check character included, gives 0.
+def checkLRC(data) -> bool:
+    return computeLRC(data) == 0
@@ -1,92 +1,70 @@
 import math
 
 CONV_FI = {
-    '0000': {
+    0b0000: {
         'Fi': 372,
         'f': 4
     },
-    '0001': {
+    0b0001: {
         'Fi': 372,
         'f': 5
     },
-    '0010': {
+    0b0010: {
         'Fi': 558,
         'f': 6
     },
-    '0011': {
+    0b0011: {
         'Fi': 744,
         'f': 8
     },
-    '0100': {
+    0b0100: {
         'Fi': 1116,
         'f': 12
     },
-    '0101': {
+    0b0101: {
         "Fi": 1488,
         'f': 16
     },
-    '0110': {
+    0b0110: {
         "Fi": 1860,
         'f': 20
     },
-    '1001': {
+    0b1001: {
         "Fi": 512,
         'f': 5
     },
-    '1010': {
+    0b1010: {
         "Fi": 768,
         'f': 7.5
     },
-    '1011': {
+    0b1011: {
         "Fi": 1024,
         'f': 10
     },
-    '1100': {
+    0b1100: {
         "Fi": 1536,
         'f': 15
     },
-    '1101': {
+    0b1101: {
         'Fi': 2048,
         'f': 20
     }
 }
 
 CONV_DI = {
-    '0001': 1,
-    '0010': 2,
-    '0011': 4,
-    '0100': 8,
-    '0101': 16,
-    '0110': 32,
-    '1000': 12,
-    '1001': 20
+    0b0001: 1,
+    0b0010: 2,
+    0b0011: 4,
+    0b0100: 8,
+    0b0101: 16,
+    0b0110: 32,
+    0b1000: 12,
+    0b1001: 20
 }
 
 CONV_II = {
-    "00": 25,
-    "01": 50
-}
-
-# SEE: https://cardwerk.com/smart-card-standard-iso7816-4-section-5-basic-organizations/ part 5.4.2
-CONV_INS = {
-    '0E': 'ERASE BINARY',
-    '20': 'VERIFY',
-    '70': 'MANAGE CHANNEL',
-    '82': 'EXTERNAL AUTHENTICATE',
-    '84': 'GET CHALLENGE',
-    '88': 'INTERNAL AUTHENTICATE',
-    'A4': 'SELECT FILE',
-    'B0': 'READ BINARY',
-    'B2': 'READ RECORD(S)',
-    'C0': 'GET RESPONSE',
-    'C2': 'ENVELOPE',
-    'CA': 'GET DATA',
-    'D0': 'WRITE BINARY',
-    'D2': 'WRITE RECORD',
-    'D6': 'UPDATE BINARY',
-    'DA': 'PUT DATA',
-    'DC': 'UPDATE DATA',
-    'E2': 'APPEND RECORD',
+    0b00: 25,
+    0b01: 50
 }
 
 
@@ -115,6 +93,20 @@ DEFAULT_Fi = 372
 DEFAULT_Di = 1
 DEFAULT_N = 0
 DEFAULT_f = 4.8 * math.pow(10, 6)
+# Highest clock frequency of ISO7816-3 (fmax of TA(1))
+MAX_f = 20 * math.pow(10, 6)
+# Waiting time integer (TC(2)) and block waiting time integer (TB(3))
+DEFAULT_WI = 10
+DEFAULT_BWI = 4
+# Clock cycles of a reset: RST held low at least this long, then TS starts at least this long after RST goes high
+RESET_CYCLES = 400
+# Longest delay between the leading edges of two characters of an ATR, in ETU (SEE: iso7816_3 part 8.2)
+ATR_WAITING_ETU = 9600
+
+# Characters kept for the message being decoded: the longest T=0 exchange, a case 4E command (header, Lc, 65535
+# data bytes, Le) followed by 65536 data bytes and SW1-SW2.
+DEFAULT_BUFFER_SIZE = 4 + 3 + 0xFFFF + 2 + 0x10000 + 2
+MAX_BUFFER_SIZE = 1 << 24
 
 
 class Title:
@@ -132,6 +124,13 @@ class Title:
     UNDEFINED = 'Undefined'
 
 
+class T0_Framing:
+    # Header, procedure bytes, data and status of the T=0 transport
+    PROCEDURE_BYTES = 'Procedure bytes'
+    # Whole command then whole answer, without procedure bytes, split by the timing
+    APDU = 'APDU (timing)'
+
+
 class EDC_Type:
     LRC = 'LRC'
     CRC = 'CRC'
@@ -139,15 +138,14 @@ class EDC_Type:
 
 
 class InitBinary:
-    PPS_INIT = '11111111'
-
-
-class Bits:
-    b1 = 'b1'
-    b2 = 'b2'
-    b3 = 'b3'
-    b4 = 'b4'
-    b5 = 'b5'
-    b6 = 'b6'
-    b7 = 'b7'
-    b8 = 'b8'
+    PPS_INIT = 0xFF
+    # TS of the direct and of the inverse convention, as read in direct convention
+    TS_DIRECT = 0x3B
+    TS_INVERSE = 0x03
+
+
+# Byte value as read in direct convention -> byte value once inverted and reversed (inverse convention).
+INVERSE_CONVENTION = bytes(int('{:08b}'.format(b ^ 0xFF)[::-1], 2) for b in range(256))
+
+# Byte value -> two digits upper case hex string.
+HEX = tuple('{:02X}'.format(b) for b in range(256))
@@ -1,18 +1,50 @@
 # High Level Analyzer For more information and documentation, please go to
 # https://support.saleae.com/extensions/high-level-analyzer-extensions
-import math
-
-import saleae
-from saleae.analyzers import HighLevelAnalyzer, AnalyzerFrame, StringSetting, NumberSetting, ChoicesSetting
+import copy
+import heapq
+import logging
+import os
+import sys
+
+try:
+    from saleae.analyzers import HighLevelAnalyzer, AnalyzerFrame, StringSetting, NumberSetting, ChoicesSetting
+except ImportError:
+    # Running outside of Logic 2 (offline replay): use the bundled stand-in.
+    from OfflineAnalyzers import HighLevelAnalyzer, AnalyzerFrame, StringSetting, NumberSetting, ChoicesSetting
 import Constants
-from Constants import Title, InitBinary, Bits, EDC_Type
-from APDU_Frame import APDU_Frame
+from Checksum import checkCRC, checkLRC
+from Constants import Title, InitBinary, EDC_Type, T0_Framing, HEX
+from StatusWords import decodeSW
+from APDU_Frame import APDU_Frame, Raw_Frame, Transaction_Frame
+from ATRCache import atrCache
+from BerTlv import parseTLV, TLV_INSTRUCTIONS
+from Instructions import (decodeINS, CLA_CLASS, INSTRUCTION_SETS, DEFAULT_INSTRUCTION_SET,
+                          REGISTRIES, OUTGOING_INSTRUCTIONS)
+from JsonExport import openExporter, toHex
+from Latency import LatencyHistograms
+from MessageBuffer import FrameColumns, MessageBuffer
+from Log import logger, configureLogging, LOG_LEVELS, DEFAULT_LOG_LEVEL
+from Profiling import profiler, PROFILE_ENVIRONMENT_VARIABLE
+from ResponseChaining import ResponseChaining, getChannel
+import T0Transport
+from T0Transport import T0Parser
+from Timing import TimingModel, toNanoseconds
 
 
 # High level analyzers must subclass the HighLevelAnalyzer class.
 class Hla(HighLevelAnalyzer):
     # List of settings that a user can set for this High Level Analyzer.
     edc_type = ChoicesSetting([EDC_Type.NA, EDC_Type.LRC, EDC_Type.CRC])
+    log_level = ChoicesSetting(list(LOG_LEVELS), label='Log level')
+    log_file = StringSetting(label='Log file (empty : console)')
+    buffer_size = NumberSetting(label='Message buffer size (0 : default)', min_value=0,
+                                max_value=Constants.MAX_BUFFER_SIZE)
+    clock_frequency = NumberSetting(label='Card clock frequency in Hz (0 : 4.8 MHz)', min_value=0,
+                                    max_value=Constants.MAX_f)
+    profile_file = StringSetting(label='Profile file (empty : off)')
+    export_file = StringSetting(label='JSON lines export file (empty : off)')
+    instruction_set = ChoicesSetting(list(INSTRUCTION_SETS), label='Instruction set')
+    t0_framing = ChoicesSetting([T0_Framing.PROCEDURE_BYTES, T0_Framing.APDU], label='T=0 framing')
 
     # An optional list of types this analyzer produces, providing a way to customize the way frames are displayed in
     # Logic 2.
@@ -34,6 +66,9 @@ class Hla(HighLevelAnalyzer):
         },
         'Exchange using T=1': {
             'format': 'Type : {{data.category}} | Data : {{data.transmitted_data}} | Hex : {{data.hex}}'
+        },
+        'Buffer overflow': {
+            'format': 'Message longer than {{data.capacity}} bytes, oldest bytes dropped'
         }
 
     }
@@ -45,12 +80,82 @@ class Hla(HighLevelAnalyzer):
         Settings can be accessed using the same name used above.
         '''
 
+        # Settings are not set when the analyzer is built outside of Logic 2 without them
+        logLevel = getattr(self, 'log_level', None)
+        if logLevel not in LOG_LEVELS:
+            logLevel = DEFAULT_LOG_LEVEL
+        logFile = getattr(self, 'log_file', '')
+        if not isinstance(logFile, str):
+            logFile = ''
+        configureLogging(logLevel, logFile)
+        # Checked before logging on every character
+        self.isDebugEnabled = logger.isEnabledFor(logging.DEBUG)
+
+        # Profiling is enabled by the setting, or by the environment (offline tools, production builds)
+        profileFile = getattr(self, 'profile_file', '')
+        if not isinstance(profileFile, str) or not profileFile:
+            profileFile = os.environ.get(PROFILE_ENVIRONMENT_VARIABLE, '')
+        if profileFile:
+            profiler.enable(profileFile)
+            instrumentDecoder()
+
+        clockFrequency = getattr(self, 'clock_frequency', 0)
+        if not isinstance(clockFrequency, (int, float)) or clockFrequency <= 0:
+            clockFrequency = Constants.DEFAULT_f
+        self.f = clockFrequency
+        bufferSize = getattr(self, 'buffer_size', 0)
+        if not isinstance(bufferSize, (int, float)) or bufferSize <= 0:
+            bufferSize = Constants.DEFAULT_BUFFER_SIZE
+        self.message = MessageBuffer(int(bufferSize))
+        # End of the previous character, in nanoseconds from the origin of the message buffer
+        self.lastEnd = None
+        # Turnaround times of the decoded APDUs, per class of CLA and INS
+        self.latency = LatencyHistograms()
+        # Streaming export of the decoded units, if enabled
+        exportFile = getattr(self, 'export_file', '')
+        if isinstance(exportFile, str) and exportFile:
+            self.exporter = openExporter(exportFile)
+        else:
+            self.exporter = None
+        # EDC of the T=1 blocks, checked once instead of on every character
+        edcType = getattr(self, 'edc_type', EDC_Type.NA)
+        self.edcType = edcType if edcType in (EDC_Type.LRC, EDC_Type.CRC) else EDC_Type.NA
+        # Names of the instructions, looked up by class of CLA and INS
+        instructionSet = getattr(self, 'instruction_set', DEFAULT_INSTRUCTION_SET)
+        if not isinstance(instructionSet, str) or instructionSet not in REGISTRIES:
+            instructionSet = DEFAULT_INSTRUCTION_SET
+        self.instructions = REGISTRIES[instructionSet]
+        self.outgoingInstructions = OUTGOING_INSTRUCTIONS[instructionSet]
+        # T=0 exchanges split by their procedure bytes, or by the timing when the capture has none
+        t0Framing = getattr(self, 't0_framing', T0_Framing.PROCEDURE_BYTES)
+        self.t0Framing = T0_Framing.APDU if t0Framing == T0_Framing.APDU else T0_Framing.PROCEDURE_BYTES
+        # Handler of each state of the decoder (communicationContext), called for every character. The states of the
+        # HEADER and DATA handlers are not used anymore.
+        self.handlers = {
+            Title.ATR: self.handleATR,
+            Title.PPS: self.handlePPS,
+            Title.PPS_ANSWER: self.handlePPS_ANSWER,
+            Title.LOOKING_FOR_KNOWN_INIT: self.handleSearchingInit,
+            Title.STORING_FRAMES: self.handleT0 if self.t0Framing == T0_Framing.PROCEDURE_BYTES
+            else self.handleStoringFrames,
+            Title.T1EXCHANGE: self.handleT1,
+        }
+        # Sessions of the capture, one per ATR: a reset of the card starts a new one
+        self.session = 1
+        # TS of a reset, held until T0 confirms it
+        self.resetFrame = None
+        self.resetSession()
+
+    # Set the decoding state of a new session, waiting for the ATR. The settings, the turnaround times and the export
+    # file are kept from one session to the next.
+    def resetSession(self):
         # Initializing algorithme variables
 
+        self.message.clear()
         self.cameOnce = False
         self.instructionType = None
-        self.f = Constants.DEFAULT_f
         self.errorInPPS_ANSWER = False
+        self.ppsAnswerLength = None
         self.PPSMessage = []
         self.readData = None
         self.type = None
@@ -58,16 +163,12 @@ class Hla(HighLevelAnalyzer):
         self.DIpps = None
         self.FIpps = None
         self.communicationContext = Title.ATR
-        self.subContext = None
         self.isTypeDefined = False  # For this variable, type means direct or inverted
         self.isFormatDefined = False
         self.charCount = 0
         self.nbFormatCount = 1
         self.interfaceOctets = []
         self.histoOctets = []
-        self.totalBinaryString = []
-        self.totalByteStrings = []
-        self.totalHexStrings = []
         self.neededIndent = 0
         self.holdNeeded = False
         self.isEndOfHold = False
@@ -76,15 +177,48 @@ class Hla(HighLevelAnalyzer):
         self.PPSi = {}
         self.Ti = {}
         self.ppsiOctets = []
-        self.bits = {}
         self.mightTriggerPPS = False
-        self.lastEndTime = None
+        self.timing = TimingModel()
         self.frame = None
-        self.Le = ''
-        self.binaryLe = ''
-        self.messageFrames = []
+        self.Le = 0
+        self.leBytes = bytearray()
+        self.apduCases = {}
+        self.apduMaxLen = None
+        self.apduCase = None
+        self.answerStart = None
+        self.expectedAnswerLength = None
         self.outputFrames = None
         self.len = None
+        # T=0: answers fetched in several exchanges (61 XX, 6C XX), per logical channel
+        self.responseChaining = ResponseChaining()
+        # T=0 exchange following the procedure bytes: role of each stored character, frames of the runs of NULL bytes
+        # (not stored) and of the current one, time the card was busy, time from the header to the first character of
+        # the card
+        self.t0 = T0Parser(self.outgoingInstructions)
+        self.t0Roles = bytearray()
+        self.t0Frames = []
+        self.t0NullRun = None
+        self.t0Busy = 0
+        self.t0Turnaround = None
+        # End of the last procedure byte of the card, then time from it to the first character of the answer
+        self.t0ProcedureEnd = None
+        self.t0Response = None
+        # T=1 chaining: INF fields of the I-blocks of the current chain, and frames held until the chain ends
+        self.t1IsCommand = True
+        self.t1Inf = bytearray()
+        self.t1InfFrames = FrameColumns()
+        self.t1Frames = []
+        self.t1Chaining = False
+        self.t1ChainEnded = False
+        self.t1AfterRBlock = False
+        # The last R-block gave the line back to the sender of the last block of a chain
+        self.t1LastBlockAsked = False
+        self.t1LastSequence = [None, None]
+        self.t1CommandIns = None
+        self.t1CommandClass = None
+        self.t1CommandEnd = None
+        self.t1Turnaround = None
+        self.t1CommandRecord = None
 
         # Initializing iso7816 variables
 
@@ -98,10 +232,21 @@ class Hla(HighLevelAnalyzer):
         self.N = None
         self.canChangeMode = None
         self.tEnSpec = None
-        self.WI = 10
+        self.WI = Constants.DEFAULT_WI
         self.isParamParInterface = None
         self.n = None
         self.sspT = None
+        # Decoding of the ATR: node of the cache matching the characters received so far, and (type, readData) of
+        # each of them, stored in the cache at the end of the ATR
+        self.atrNode = None
+        self.atrAnnotations = []
+        # Layout of the ATR, known as T0 and the TD(i) arrive: characters (charCount) of the historical bytes, from
+        # atrHistoStart to atrHistoEnd excluded, then the TCK if needed
+        self.atrHistoStart = 2
+        self.atrHistoEnd = 2
+        self.atrNeedsTCK = False
+        # Character (charCount) of the first EDC byte of the T=1 block, once its LEN is known
+        self.t1EdcStart = 0
 
     def decode(self, frame: AnalyzerFrame):
         '''
@@ -110,104 +255,146 @@ class Hla(HighLevelAnalyzer):
         The type and data values in `frame` will depend on the input analyzer.
         '''
 
-        self.frame = frame
-
-        binaryString = bytesToBinary(self.frame.data['data'])
-        # Storing current binary string for later checking
-        self.totalByteStrings.append(self.frame.data['data'])
-
-        # Convert binary to hex :
-        hexString = binaryToHex(binaryString)
+        value = frame.data['data'][0]
 
-        self.totalHexStrings.append('0x' + hexString)
-
-        if self.isTypeDefined:
-            # Reformat bits if needed
-            if self.isDirect:
-                pass
+        # A reset of the card: the frames still pending from the previous session come first
+        previousFrames = None
+        tsFrame = self.resetFrame
+        if tsFrame is not None:
+            self.resetFrame = None
+            if self.isATRStart(tsFrame, frame):
+                previousFrames = self.startSession()
             else:
-                # Invert and reverse the binary string to match the reversed encoding
-                binaryString = reverseBits(invertBits(binaryString))
-
-        self.saveBits(binaryString)
-        self.totalBinaryString.append(binaryString)
-
-        if self.communicationContext is Title.ATR:
-            self.handleATR(binaryString)
-
-        # Not used anymore
-        # elif self.communicationContext is Title.HEADER:
-        #    self.handleHEADER(binaryString, hexString)
-        #
-        # elif self.communicationContext is Title.DATA:
-        #    self.handleDATA(binaryString)
-
-        elif self.communicationContext is Title.PPS:
-            self.handlePPS(binaryString)
-
-        elif self.communicationContext is Title.PPS_ANSWER:
-            self.handlePPS_ANSWER(binaryString)
-
-        elif self.communicationContext is Title.LOOKING_FOR_KNOWN_INIT:
-            self.handleSearchingInit(binaryString)
+                logger.info('No T0 after the TS. Not a reset of the card.')
+            previousFrames = joinOutput(previousFrames, self.decodeCharacter(tsFrame))
+        elif (value == InitBinary.TS_DIRECT or value == InitBinary.TS_INVERSE) and \
+                self.communicationContext is not Title.ATR and self.isNewATR(frame, value):
+            # Decoded with the next character, which tells if it is T0
+            self.resetFrame = frame
+            return None
+
+        return joinOutput(previousFrames, self.decodeCharacter(frame))
+
+    # Decode the character of `frame` in the current session. Return its output frames, if any.
+    def decodeCharacter(self, frame):
+        value = frame.data['data'][0]
+        self.frame = frame
 
-        elif self.communicationContext is Title.STORING_FRAMES:
-            self.holdNeeded = True
-            self.handleStoringFrames()
+        if self.isTypeDefined and not self.isDirect:
+            # Invert and reverse the bits to match the reversed encoding
+            value = Constants.INVERSE_CONVENTION[value]
+
+        # Storing current byte for later checking
+        overflowFrame = None
+        if self.message.append(value, frame) and self.message.dropped == 1:
+            logger.warning('Message longer than the buffer. Dropping its oldest bytes.')
+            overflowFrame = AnalyzerFrame('Buffer overflow', self.message.frame(0).start_time, frame.end_time, {
+                'capacity': self.message.capacity,
+                'session': self.session
+            })
+            if self.communicationContext is Title.STORING_FRAMES:
+                # The beginning of the exchange is lost: it cannot be decoded anymore
+                self.clearingProcessForAPDU()
+        hexString = HEX[value]
 
-        elif self.communicationContext is Title.T1EXCHANGE:
-            self.handleT1(binaryString)
-
-        else:
-            self.title = Title.UNDEFINED
-            self.type = Title.UNDEFINED
-            self.readData = Title.UNDEFINED
-            # TODO: Handle context searching
+        self.handlers.get(self.communicationContext, self.handleUndefined)(value)
 
         self.charCount += 1
-        self.lastEndTime = frame.end_time
+        self.lastEnd = self.message.lastEnd
         # Return the data frame itself
+        out = None
         if not self.holdNeeded:
             if self.outputFrames is not None:
-                out = self.outputFrames.copy()
-                self.outputFrames.clear()
-                return out
-            if self.isEndOfHold:
+                out = [frame.getOutputFrame(self.session) for frame in self.outputFrames]
+                self.outputFrames = None
+            elif self.isEndOfHold:
                 self.isEndOfHold = False
-                return AnalyzerFrame(self.title, self.bigBeginning, frame.end_time, {
+                out = AnalyzerFrame(self.title, self.bigBeginning, frame.end_time, {
                     'category': self.type,
                     'transmitted_data': self.readData,
-                    'hex': hexString
+                    'hex': hexString,
+                    'session': self.session
                 })
             else:
-                return AnalyzerFrame(self.title, frame.start_time, frame.end_time, {
+                out = AnalyzerFrame(self.title, frame.start_time, frame.end_time, {
                     'category': self.type,
                     'transmitted_data': self.readData,
-                    'hex': hexString
+                    'hex': hexString,
+                    'session': self.session
                 })
 
-    # This function takes the binary string of the current octet (T0 or TD(i)), analyze what octets will come next
+        if overflowFrame is not None:
+            return joinOutput([overflowFrame], out)
+        return out
+
+    # State of the decoder without handler.
+    def handleUndefined(self, value):
+        self.title = Title.UNDEFINED
+        self.type = Title.UNDEFINED
+        self.readData = Title.UNDEFINED
+        # TODO: Handle context searching
+
+    # A reset of the card shows as a TS (SEE: iso7816_3 part 8.1) after an idle line at least as long as a reset
+    # (SEE: iso7816_3 part 6.2.2). During the exchanges, the TS must also come where a message can start, and be a
+    # character the protocol in use cannot start a message with: a reserved CLA with T=0 (SEE: iso7816_4 part 5.4.1),
+    # a NAD driving VPP with T=1. An inverse convention TS after a direct convention session reads as CLA or NAD 03,
+    # and is not taken for a reset. When T=0 exchanges are split by their procedure bytes, a message starts only where
+    # the parser waits for a header, or where the card, mute after a header, owes a procedure byte that the TS cannot
+    # be: a data byte sent late is never taken for a TS.
+    def isNewATR(self, frame, value):
+        if self.lastEnd is None:
+            return False
+        gap = self.message.getTime(frame.start_time) - self.lastEnd
+        if gap < self.timing.resetGap:
+            return False
+        if self.isTypeDefined and not self.isDirect:
+            value = Constants.INVERSE_CONVENTION[value]
+        if self.communicationContext is Title.STORING_FRAMES and self.t0Framing == T0_Framing.PROCEDURE_BYTES:
+            if self.t0.isUnexpected(value):
+                return True
+            return self.t0.isWaitingHeader() and not len(self.message) and 0x20 <= value <= 0x3F
+        isMessageStart = not len(self.message) or gap >= self.timing.endOfMessageGap
+        if self.communicationContext is Title.STORING_FRAMES:
+            return isMessageStart and 0x20 <= value <= 0x3F
+        if self.communicationContext is Title.T1EXCHANGE:
+            return isMessageStart and bool(value & 0x88)
+        return True
+
+    # True if the character of `frame` can be the T0 of an ATR starting with the TS of `tsFrame`: it follows it within
+    # the waiting time of the ATR characters (SEE: iso7816_3 part 8.2).
+    def isATRStart(self, tsFrame, frame):
+        return toNanoseconds(frame.start_time, tsFrame.start_time) <= self.timing.atrWaitingTime
+
+    # Decode what the previous session left pending, then wait for the ATR of a new session. Return the frames of the
+    # previous session, if any.
+    def startSession(self):
+        out = self.flush()
+        self.session += 1
+        logger.info('Card reset. Session %s starts.', self.session)
+        self.resetSession()
+        if self.exporter is not None:
+            self.exporter.session = self.session
+        return out
+
+    # This function takes the value of the current octet (T0 or TD(i)), analyze what octets will come next
     # and store these information.
-    def storeUpcomingOctets(self, binaryString):
+    def storeUpcomingOctets(self, value):
         names = ['D', 'C', 'B', 'A']
         for i in range(4):
             # Build the names to handle several letters and indexes.
             name = 'T' + names[i] + '(' + str(self.nbFormatCount) + ')'
-            if binaryString[i] == '1':
-                self.Ti[name] = True
-            else:
-                self.Ti[name] = False
-            print("Name : ", name, 'State : ', self.Ti[name])
+            self.Ti[name] = bool(value & (0x80 >> i))
+            logger.debug('Name : %s State : %s', name, self.Ti[name])
 
-        # If this is the first time we come here, it means the current character is a format one. The end of the
-        # binary string defines then the number of history octets.
+        # If this is the first time we come here, it means the current character is a format one. The low nibble
+        # defines then the number of history octets.
         # If not, this part of the octet defines a new available protocol.
         if self.charCount == 1:
-            self.K = binaryToDecimal(binaryString[4:8])
+            self.K = value & 0x0F
         else:
-            newProtocol = binaryToDecimal(binaryString[4:8])
+            newProtocol = value & 0x0F
             if newProtocol not in self.T:
-                self.T.append(binaryToDecimal(binaryString[4:8]))
+                self.T.append(newProtocol)
 
         # Update list of upcoming octets
         self.setOctetsList()
@@ -219,9 +406,16 @@ class Hla(HighLevelAnalyzer):
         out = self.printFormat()
 
         self.nbFormatCount += 1
+        self.updateATRLayout()
 
         return out
 
+    # Characters of the ATR, computed again only when T0 or a TD(i) announces more of them.
+    def updateATRLayout(self):
+        self.atrHistoStart = 2 + len(self.interfaceOctets)
+        self.atrHistoEnd = self.atrHistoStart + len(self.histoOctets)
+        self.atrNeedsTCK = self.checkNeedCntrlChar()
+
     # This function creates a string with every information contained in a T0 or TD(i).
     def printFormat(self):
         strg = ''
@@ -272,60 +466,48 @@ class Hla(HighLevelAnalyzer):
             self.ppsiOctets.append('PPS3')
 
     # Handle the data storage for every Tx(i) case.
-    def computeData(self, binaryString, octetType):
+    def computeData(self, value, octetType):
         self.readData = ''
         if octetType == 'TA(1)':
-            fiBits = binaryString[0:4]
-            diBits = binaryString[4:8]
-            self.FI = Constants.CONV_FI[fiBits]
-            self.DI = Constants.CONV_DI[diBits]
+            self.FI, self.DI = decodeFIDI(value)
 
             # Check if interface can trigger PPS
-            if self.FI is not Constants.DEFAULT_Fi or self.DI is not Constants.DEFAULT_Di:
+            if self.FI != Constants.DEFAULT_Fi or self.DI != Constants.DEFAULT_Di:
                 self.mightTriggerPPS = True
-                print("Interface might trigger PPS")
+                logger.info('Interface might trigger PPS')
             else:
-                print("Interface cannot trigger PPS.")
+                logger.info('Interface cannot trigger PPS.')
 
-            print("FI :", self.FI, ', DI :', self.DI)
+            logger.info('FI : %s , DI : %s', self.FI, self.DI)
             self.readData += "FI : " + str(self.FI) + ' , DI : ' + str(self.DI)
         elif octetType == 'TB(1)':
-            iiBits = binaryString[1:3]
-            pi1Bits = binaryString[3:8]
-            self.II = Constants.CONV_II[iiBits]
-            self.PI1 = binaryToDecimal(pi1Bits)
-            print("II :", self.II, ', PI1 :', self.PI1)
+            self.II = Constants.CONV_II.get((value >> 5) & 0x03, 'RFU')
+            self.PI1 = value & 0x1F
+            logger.info('II : %s , PI1 : %s', self.II, self.PI1)
             self.readData += "II : " + str(self.II) + ' , PI1 : ' + str(self.PI1)
         elif octetType == 'TC(1)':
-            self.N = binaryToDecimal(binaryString)
-            print("N :", self.N)
+            self.N = value
+            logger.info('N : %s', self.N)
             self.readData += 'N : ' + str(self.N)
             # TODO: Handle computing
         elif octetType == 'TC(2)':
-            self.WI = binaryToDecimal(binaryString)
+            self.WI = value
             self.readData += "WI = " + str(self.WI)
         elif octetType == 'TD({})'.format(self.nbFormatCount - 1):
-            self.T.append(binaryToDecimal(binaryString[3:8]))
+            self.T.append(value & 0x0F)
             if len(self.T) > 1:
-                print("Available protocols T =", self.T)
+                logger.info('Available protocols T = %s', self.T)
             else:
-                print("Available protocols T =", self.T)
+                logger.info('Available protocols T = %s', self.T)
             self.readData = 'T +:{}'.format(self.T[-1])
-            self.readData += ', ' + self.storeUpcomingOctets(binaryString)
+            self.readData += ', ' + self.storeUpcomingOctets(value)
 
         # If it's not the first octet
         elif self.nbFormatCount > 1:
             if octetType == 'TA(2)':  # Octet du mode spécifique
-                if binaryString[0] == '0':
-                    self.canChangeMode = True
-                else:
-                    self.canChangeMode = False
-
-                if binaryString[3] == '0':
-                    self.isParamParInterface = True
-                else:
-                    self.isParamParInterface = False
-                self.tEnSpec = binaryToDecimal(binaryString[4:8])
+                self.canChangeMode = not value & 0x80
+                self.isParamParInterface = not value & 0x10
+                self.tEnSpec = value & 0x0F
             # TODO: Name of Histo octetType changed. It's 'T + {index of current histo}'.
             elif octetType == "Histo":
                 pass
@@ -334,7 +516,7 @@ class Hla(HighLevelAnalyzer):
 
     def checkNeedCntrlChar(self):
         for protocol in self.T:
-            if int(protocol) is not 0:
+            if protocol != 0:
                 return True
         return False
 
@@ -342,32 +524,31 @@ class Hla(HighLevelAnalyzer):
         if self.Ti['TA(1)'] is False:
             self.FI = Constants.DEFAULT_Fi
             self.DI = Constants.DEFAULT_Di
-            print("Default FI :", self.FI, ', Default DI :', self.DI)
+            logger.info('Default FI : %s , Default DI : %s', self.FI, self.DI)
         if self.Ti['TB(1)'] is False:
             pass
         if self.Ti['TC(1)'] is False:
             self.N = Constants.DEFAULT_N
-            print("Default N :", self.N)
+            logger.info('Default N : %s', self.N)
             # TODO: Handle computing
         if self.Ti['TD(1)'] is False:
             self.T.append(0)
-            print("Default protocol : T =", self.T[0])
+            logger.info('Default protocol : T = %s', self.T[0])
 
+    # Without PPS1, the PPS request proposes the default rates.
     def setPPSDefaultData(self):
-        if self.PPSi['PPS1'] is True:
+        if self.PPSi['PPS1'] is False:
             self.FIpps = Constants.DEFAULT_Fi
             self.DIpps = Constants.DEFAULT_Di
-            print("Default FI :", self.FIpps, ', Default DI :', self.DIpps)
+            logger.info('Default FI : %s , Default DI : %s', self.FIpps, self.DIpps)
         if self.PPSi['PPS2'] is True:
             pass  # RFU
         if self.PPSi['PPS3'] is True:
             pass  # RFU
 
     def clearingProcess(self, newTitle):
-        print("End of {}. Clearing binary string.".format(self.communicationContext))
-        self.totalBinaryString.clear()
-        self.totalHexStrings.clear()
-        self.totalByteStrings.clear()
+        logger.debug('End of %s. Clearing stored bytes.', self.communicationContext)
+        self.message.clear()
         self.neededIndent = 0
 
         if newTitle is not Title.PPS_ANSWER:
@@ -376,50 +557,82 @@ class Hla(HighLevelAnalyzer):
         self.charCount = 0
         self.communicationContext = newTitle
 
-        self.messageFrames = []
+        self.apduCases = {}
+        self.apduMaxLen = None
+        self.apduCase = None
+        self.answerStart = None
+        self.expectedAnswerLength = None
+
+        self.t0.reset()
+        self.t0Roles.clear()
+        self.t0Frames = []
+        self.t0NullRun = None
+        self.t0Busy = 0
+        self.t0Turnaround = None
+        self.t0ProcedureEnd = None
+        self.t0Response = None
 
     def clearingProcessForAPDU(self):
-        tempBinaryString = self.totalBinaryString[-1]
-        tempHexStr = self.totalHexStrings[-1]
-        tempByteStr = self.totalByteStrings[-1]
+        tempByte = self.message[-1]
 
         self.clearingProcess(Title.STORING_FRAMES)
 
         # Store the current frame
-        self.messageFrames.append(self.frame)
-        self.totalBinaryString.append(tempBinaryString)
-        self.totalHexStrings.append(tempHexStr)
-        self.totalByteStrings.append(tempByteStr)
-
-        self.holdNeeded = False
-        self.isEndOfHold = True
+        self.message.append(tempByte, self.frame)
 
     def checkCntrlChar(self):
-        if self.communicationContext == Title.ATR:
-            self.totalBinaryString = self.totalBinaryString[1:]
-        calculatedTCK = calculate_TCK(self.totalBinaryString)
-        if calculatedTCK == self.totalBinaryString[-1]:
-            ans = True
-        else:
-            ans = False
-        print('Checksum :', ans)
+        # TS is not part of the TCK computation
+        start = 1 if self.communicationContext == Title.ATR else 0
+        with self.message.view(start) as data:
+            ans = checkLRC(data)
+        logger.debug('Checksum : %s', ans)
         return ans
 
-    def handleATR(self, binaryString):
-        commEnded = False
+    def handleATR(self, value):
         self.title = Title.ATR
+        node = self.atrNode
+        if node is not None:
+            # Characters of an ATR already decoded so far: take them from the cache
+            node = node.children.get(value)
+            if node is not None:
+                self.atrNode = node
+                self.type = node.type
+                self.readData = node.readData
+                if node.parameters is not None:
+                    logger.info('ATR already decoded. Parameters taken from the cache.')
+                    for name, parameter in node.parameters.items():
+                        setattr(self, name, copy.copy(parameter))
+                    self.endATR(node.transferOk)
+                return
+
+            # New ATR: decode the characters received since TS, then the current one
+            self.atrNode = None
+            charCount = self.charCount
+            for i in range(1, charCount):
+                self.charCount = i
+                self.parseATR(self.message[i])
+            self.charCount = charCount
+
+        self.parseATR(value)
+        if self.charCount == 0 and self.isTypeDefined:
+            self.atrNode = atrCache.find(value)
+
+    def parseATR(self, value):
+        commEnded = False
+        transferOk = None
         # Check if it's the first time we decode an octet to know if it's an initial octet
         if not self.isTypeDefined:
             self.type = 'TS'
-            if binaryString[2:5] == "111":
+            if value & 0x38 == 0x38:
                 self.isDirect = True
                 self.isTypeDefined = True
                 self.readData = 'direct'
-            elif binaryString[2:5] == "000":
+            elif value & 0x38 == 0x00:
                 self.isDirect = False
                 self.isTypeDefined = True
                 self.readData = 'inverted'
-            print("Encoding mode :", self.readData + ".")
+            logger.info('Encoding mode : %s.', self.readData)
+            self.atrAnnotations = [(self.type, self.readData)]
         # For every other times
         else:
 
@@ -429,24 +642,22 @@ class Hla(HighLevelAnalyzer):
                 if not self.isFormatDefined:
                     self.type = 'T0'
 
-                    self.readData = self.storeUpcomingOctets(binaryString)
+                    self.readData = self.storeUpcomingOctets(value)
 
                     self.isFormatDefined = True
 
-                elif self.charCount - 2 < len(self.interfaceOctets):
+                elif self.charCount < self.atrHistoStart:
                     self.type = self.interfaceOctets[self.charCount - 2]
-                    self.readData = self.computeData(binaryString, self.type)
+                    self.readData = self.computeData(value, self.type)
 
-                elif self.charCount - len(self.interfaceOctets) - 2 < len(self.histoOctets):
-                    self.type = self.histoOctets[self.charCount - len(self.interfaceOctets) - 2]
-                    self.readData = self.computeData(binaryString, self.type)
+                elif self.charCount < self.atrHistoEnd:
+                    self.type = self.histoOctets[self.charCount - self.atrHistoStart]
+                    self.readData = self.computeData(value, self.type)
 
-                    if not self.checkNeedCntrlChar() and self.charCount - len(self.interfaceOctets) - 2 == len(
-                            self.histoOctets) - 1:
+                    if not self.atrNeedsTCK and self.charCount == self.atrHistoEnd - 1:
                         commEnded = True
 
-                elif self.checkNeedCntrlChar() and self.charCount - 2 == len(self.interfaceOctets) + len(
-                        self.histoOctets):
+                elif self.atrNeedsTCK and self.charCount == self.atrHistoEnd:
                     self.type = "TCK"
 
                     transferOk = self.checkCntrlChar()
@@ -462,58 +673,77 @@ class Hla(HighLevelAnalyzer):
                     self.type = Title.UNDEFINED
                     self.readData = Title.UNDEFINED
 
+                self.atrAnnotations.append((self.type, self.readData))
                 if commEnded:
-                    if not self.mightTriggerPPS:
-                        if self.T[0] == 0:
-                            nextTitle = Title.STORING_FRAMES
-                        elif self.T[0] == 1:
-                            nextTitle = Title.T1EXCHANGE
-                        else:
-                            nextTitle = Title.UNDEFINED
-                    else:
-                        nextTitle = Title.LOOKING_FOR_KNOWN_INIT
-
-                    print("Next : ", nextTitle)
-                    self.clearingProcess(nextTitle)
+                    if not self.message.dropped:
+                        with self.message.view() as atr:
+                            atrCache.store(bytes(atr), self.atrAnnotations,
+                                           {name: getattr(self, name) for name in ATR_PARAMETERS}, transferOk)
+                    self.endATR(transferOk)
+
+    # End of the ATR: apply its parameters and go on with the PPS or the exchanges of its first protocol.
+    def endATR(self, transferOk):
+        if not self.mightTriggerPPS:
+            if self.T[0] == 0:
+                nextTitle = Title.STORING_FRAMES
+            elif self.T[0] == 1:
+                nextTitle = Title.T1EXCHANGE
+            else:
+                nextTitle = Title.UNDEFINED
+        else:
+            nextTitle = Title.LOOKING_FOR_KNOWN_INIT
+
+        logger.debug('Next : %s', nextTitle)
+        if self.exporter is not None:
+            self.exportATR(transferOk)
+        # The rates of TA(1) are used at once in specific mode only. Otherwise the line keeps the
+        # default ones until a PPS exchange succeeds.
+        if self.isParamParInterface:
+            self.updateTiming(self.FI, self.DI, self.T[0])
+        else:
+            self.updateTiming(Constants.DEFAULT_Fi, Constants.DEFAULT_Di, self.T[0])
+        self.atrNode = None
+        self.atrAnnotations = []
+        self.clearingProcess(nextTitle)
 
-    def handleDATA(self, binaryString):
+    def handleDATA(self, value):
         self.title = Title.DATA
         self.type = 'T{}'.format(str(self.charCount))
 
-        if (
-                self.frame.start_time - self.lastEndTime).__float__() <= 2 * self.getMinGuardTime() and self.n <= self.charCount < self.n + 3:
+        if self.getGap() <= 2 * self.timing.guardTime and self.n <= self.charCount < self.n + 3:
             # Le octet are present
             self.type = 'Le'
-            self.binaryLe += binaryString
-            self.readData = binaryString
+            self.leBytes.append(value)
+            self.readData = HEX[value]
 
-            print((self.frame.start_time - self.lastEndTime).__float__(), self.getMinGuardTime())
-            print(self.binaryLe)
-            print(self.charCount, self.n)
+            logger.debug('%s %s', self.getGap(), self.timing.guardTime)
+            logger.debug('%s', self.leBytes.hex())
+            logger.debug('%s %s', self.charCount, self.n)
 
         elif self.charCount == self.n + 3:
-            self.Le = binaryToDecimal(self.binaryLe)
+            self.Le = int.from_bytes(self.leBytes, 'big')
             self.readData = 'Max answer length = ' + str(self.Le)
-            self.binaryLe = ''
-            self.handleDataAnswer(binaryString)
+            self.leBytes.clear()
+            self.handleDataAnswer(value)
         elif self.charCount > self.n:
-            if self.binaryLe != '':
-                self.Le = binaryToDecimal(self.binaryLe)
+            if self.leBytes:
+                self.Le = int.from_bytes(self.leBytes, 'big')
                 self.readData = 'Max answer length = ' + str(self.Le)
-                self.binaryLe = ''
-                self.handleDataAnswer(binaryString)
+                self.leBytes.clear()
+                self.handleDataAnswer(value)
             else:
                 self.clearingProcess(Title.LOOKING_FOR_KNOWN_INIT)
-                self.handleSearchingInit(binaryString)
+                self.handleSearchingInit(value)
 
-    def handleDataAnswer(self, binaryString):
+    def handleDataAnswer(self, value):
         self.type = Title.DATA_ANSWER
         self.title = Title.DATA_ANSWER
 
-    def handlePPS(self, binaryString):
+    def handlePPS(self, value):
         self.title = Title.PPS
 
-        print("PPS. Binary :", binaryString)
+        if self.isDebugEnabled:
+            logger.debug('PPS. Value : %s', HEX[value])
         if self.charCount == 1:
             self.type = 'PPSS'
             self.readData = "Init octet"
@@ -521,36 +751,28 @@ class Hla(HighLevelAnalyzer):
             self.readData = ''
             self.type = 'PPS0'
 
-            if binaryString[1] == '1':
-                self.PPSi['PPS3'] = True
+            self.PPSi['PPS3'] = bool(value & 0x40)
+            if self.PPSi['PPS3']:
                 self.readData += ' PPS3 '
-            else:
-                self.PPSi['PPS3'] = False
-            if binaryString[2] == '1':
-                self.PPSi['PPS2'] = True
+            self.PPSi['PPS2'] = bool(value & 0x20)
+            if self.PPSi['PPS2']:
                 self.readData += ' PPS2 '
-            else:
-                self.PPSi['PPS2'] = False
-            if binaryString[3] == '1':
-                self.PPSi['PPS1'] = True
+            self.PPSi['PPS1'] = bool(value & 0x10)
+            if self.PPSi['PPS1']:
                 self.readData += ' PPS1 '
-            else:
-                self.PPSi['PPS1'] = False
-            self.sspT = binaryToDecimal(binaryString[4:8])
+            self.sspT = value & 0x0F
             self.setPPSiOctetsList()
+            self.setPPSDefaultData()
 
         elif self.charCount - 3 < len(self.ppsiOctets):
             self.type = self.ppsiOctets[self.charCount - 3]
-            print('Type :', self.type)
+            if self.isDebugEnabled:
+                logger.debug('Type : %s', self.type)
 
             if self.type == 'PPS1':
-                fiBits = binaryString[0:4]
-                diBits = binaryString[4:8]
-                self.FIpps = Constants.CONV_FI[fiBits]
-                self.DIpps = Constants.CONV_DI[diBits]
-                print("PPS : FI :", self.FIpps, ', DI :', self.DIpps)
+                self.FIpps, self.DIpps = decodeFIDI(value)
+                logger.info('PPS : FI : %s , DI : %s', self.FIpps, self.DIpps)
                 self.readData = "FI : " + str(self.FIpps) + ' , DI : ' + str(self.DIpps)
-                self.setPPSDefaultData()
             if self.type == 'PPS2':
                 self.readData = 'RFU'
                 pass  # RFU
@@ -566,56 +788,91 @@ class Hla(HighLevelAnalyzer):
             else:
                 self.readData = 'Error in transfer'
 
-            self.PPSMessage = self.totalBinaryString.copy()
+            with self.message.view() as data:
+                self.PPSMessage = bytearray(data)
+            if self.exporter is not None:
+                self.exporter.write({
+                    'type': 'PPS',
+                    'raw': toHex(self.PPSMessage),
+                    'protocol': self.sspT,
+                    'FI': self.FIpps,
+                    'DI': self.DIpps,
+                    'checksum_ok': transferOk
+                }, self.message.frame(0), self.frame)
 
             self.mightTriggerPPS = False
             self.clearingProcess(Title.PPS_ANSWER)
 
-    def handlePPS_ANSWER(self, binaryString):
+    def handlePPS_ANSWER(self, value):
         self.title = self.communicationContext
+        if self.charCount == 2:
+            # The answer holds PPSS, PPS0, the PPSi announced by its own PPS0 and PCK
+            self.ppsAnswerLength = 3 + bin(value & 0x70).count('1')
         if self.errorInPPS_ANSWER is False:
-            if self.charCount == 2 and binaryString[4:8] == self.PPSMessage[self.charCount - 1][4:8]:
-                print("PPS answer; rare pattern.")
-                if self.bits[Bits.b5] == 1:
-                    print("rPPS1 = dPPS1 : saving FIpps and DIpps.")
-                    self.FI = self.FIpps
-                    self.DI = self.DIpps
+            if self.charCount == 2 and value & 0x0F == self.PPSMessage[self.charCount - 1] & 0x0F:
+                logger.debug('PPS answer; rare pattern.')
+                # The negotiated rates are only applied once the whole answer is received
+                if value & 0x10:
+                    logger.info('rPPS1 = dPPS1 : keeping FIpps and DIpps.')
                 else:
-                    print("No PPS1 : using default FI and DI")
-                    self.FI = Constants.DEFAULT_Fi
-                    self.DI = Constants.DEFAULT_Di
+                    logger.info('No PPS1 : using default FI and DI')
+                    self.FIpps = Constants.DEFAULT_Fi
+                    self.DIpps = Constants.DEFAULT_Di
 
                 # RFU
-                if self.bits[Bits.b6] == 1:
-                    print("rPPS2 = dPPS2. RFU.")
+                if value & 0x20:
+                    logger.debug('rPPS2 = dPPS2. RFU.')
                 else:
-                    print("No PPS2. RFU")
+                    logger.debug('No PPS2. RFU')
 
                 # RFU
-                if self.bits[Bits.b7] == 1:
-                    print("rPPS3 = dPPS3. RFU.")
+                if value & 0x40:
+                    logger.debug('rPPS3 = dPPS3. RFU.')
                 else:
-                    print("No PPS3. RFU")
+                    logger.debug('No PPS3. RFU')
 
-            elif binaryString != self.PPSMessage[self.charCount - 1]:
+            elif self.charCount == 2:
+                self.errorInPPS_ANSWER = True
+            elif self.charCount == self.ppsAnswerLength:
+                self.errorInPPS_ANSWER = not self.checkCntrlChar()
+            # PPSS and the PPSi are echoed as requested, their positions match when the card kept all of them
+            elif (self.charCount == 1 or self.message[1] == self.PPSMessage[1]) and \
+                    value != self.PPSMessage[self.charCount - 1]:
                 self.errorInPPS_ANSWER = True
 
         self.type = self.communicationContext
         self.readData = 'Answer ok = ' + str(not self.errorInPPS_ANSWER)
-        print("PPS answer; classic pattern.")
+        if self.isDebugEnabled:
+            logger.debug('PPS answer; classic pattern.')
 
-        if self.charCount == len(self.PPSMessage):
+        if self.charCount == self.ppsAnswerLength:
             if self.errorInPPS_ANSWER:
-                print('End of PPS Answer. Something went wrong !')
+                logger.warning('End of PPS Answer. Something went wrong !')
             else:
-                print('End of PPS Answer. Everything is okay.')
-            self.clearingProcess(Title.STORING_FRAMES)
+                logger.info('End of PPS Answer. Everything is okay.')
+                # Switch the whole timing at once, the next character is sent at the negotiated rates
+                self.FI = self.FIpps
+                self.DI = self.DIpps
+                self.updateTiming(self.FI, self.DI, self.sspT)
+            if self.exporter is not None:
+                with self.message.view() as data:
+                    self.exporter.write({
+                        'type': 'PPS answer',
+                        'raw': toHex(data),
+                        'accepted': not self.errorInPPS_ANSWER,
+                        'FI': self.FI,
+                        'DI': self.DI
+                    }, self.message.frame(0), self.frame)
+            if self.sspT == 1:
+                self.clearingProcess(Title.T1EXCHANGE)
+            else:
+                self.clearingProcess(Title.STORING_FRAMES)
 
-    def handleSearchingInit(self, binaryString):
-        if binaryString == InitBinary.PPS_INIT and self.mightTriggerPPS:
-            print('PPS detected !')
+    def handleSearchingInit(self, value):
+        if value == InitBinary.PPS_INIT and self.mightTriggerPPS:
+            logger.info('PPS detected !')
             self.communicationContext = Title.PPS
-            self.handlePPS(binaryString)
+            self.handlePPS(value)
 
         else:
             self.title = Title.UNDEFINED
@@ -623,74 +880,312 @@ class Hla(HighLevelAnalyzer):
             self.readData = Title.UNDEFINED
             self.charCount = 0
 
-    def saveBits(self, binaryString):
-        self.bits[Bits.b1] = binaryString[7]
-        self.bits[Bits.b2] = binaryString[6]
-        self.bits[Bits.b3] = binaryString[5]
-        self.bits[Bits.b4] = binaryString[4]
-        self.bits[Bits.b5] = binaryString[3]
-        self.bits[Bits.b6] = binaryString[2]
-        self.bits[Bits.b7] = binaryString[1]
-        self.bits[Bits.b8] = binaryString[0]
-
-    # Return the minimum guard time between two characters in ms.
-    def getMinGuardTime(self):
-        if 15 in self.T:
-            q = Constants.DEFAULT_Fi / Constants.DEFAULT_Di
-        else:
-            q = self.FI / self.DI
+    # Export the ATR ending with the current character, with the parameters it sets. `checksumOk` is None without TCK.
+    def exportATR(self, checksumOk):
+        historicalStart = 2 + len(self.interfaceOctets)
+        with self.message.view() as atr:
+            raw = toHex(atr)
+            historical = toHex(atr[historicalStart:historicalStart + self.K])
+        self.exporter.write({
+            'type': 'ATR',
+            'raw': raw,
+            'convention': 'direct' if self.isDirect else 'inverse',
+            # In the order of the ATR, once each
+            'protocols': list(dict.fromkeys(self.T)),
+            'FI': self.FI,
+            'DI': self.DI,
+            'N': self.N,
+            'WI': self.WI,
+            'historical': historical,
+            'checksum_ok': checksumOk
+        }, self.message.frame(0), self.frame)
+
+    # Apply the rates and the protocol used on the line to the timing model, once they are known (end of the ATR or of
+    # the PPS). The waiting times only depend on the protocol in use, not on every protocol offered by the ATR.
+    def updateTiming(self, FI, DI, protocol):
+        T = (protocol, 15) if 15 in self.T else (protocol,)
+        if self.timing.setParameters(FI, DI, self.f, self.N, self.WI, T):
+            logger.info('ETU : %s ns, CWT : %s ns', self.timing.etu, self.timing.cwt)
+
+    # Idle time between the end of the previous character and the start of the current one, in nanoseconds.
+    def getGap(self):
+        return self.message.lastStart - self.lastEnd
+
+    def handleStoringFrames(self, value):
+        self.holdNeeded = True
+        gap = self.getGap()
+        # Characters of the exchange stored before the current one
+        storedLen = len(self.message) - 1
+
+        if self.answerStart is None:
+            # The card answers after a turnaround of the line, once a whole command was sent
+            if storedLen and gap > self.timing.turnaroundGap:
+                if storedLen in self.apduCases:
+                    logger.debug('End of command.')
+                    self.startAnswer(storedLen)
+                elif gap >= self.timing.endOfMessageGap:
+                    logger.warning('Error in decoding last message ! Ignoring this part.')
+                    self.clearingProcessForAPDU()
+                    return
+
+        elif gap >= self.timing.endOfMessageGap:
+            # The answer is shorter than announced by Le (status only): it ended when the next command started
+            logger.debug('End of current message.')
+            self.handleAPDU(storedLen)
+            self.clearingProcessForAPDU()
+            self.holdNeeded = False
+            return
 
-        return 12 * self.getETU() + (q * self.N / self.f)
+        if self.answerStart is None:
+            self.updateAPDUCases(value)
 
-    # Return the Character Waiting Time
-    def getCWT(self):
+        # The current character is the last one of the exchange (SW2): decode it now
+        elif len(self.message) - self.answerStart == self.expectedAnswerLength:
+            logger.debug('End of current message.')
+            self.handleAPDU(len(self.message))
+            self.clearingProcess(Title.STORING_FRAMES)
+            self.holdNeeded = False
 
-        cwt = self.getETU()
+    def flush(self):
+        '''
+        Decode the exchange still stored at the end of a capture, and return its frames if any.
 
-        if 1 in self.T:
-            cwt *= 11 + math.pow(2, self.WI)
-        else:
-            cwt *= 11
+        Logic 2 does not tell an analyzer that a capture ended, this is meant for offline tools.
+        '''
 
-        return cwt
+        previousFrames = None
+        if self.resetFrame is not None:
+            # A TS without T0: decoded in the current session
+            previousFrames = self.decodeCharacter(self.resetFrame)
+            self.resetFrame = None
+
+        out = None
+        if self.communicationContext is Title.T1EXCHANGE:
+            out = self.flushT1Chain()
+
+        elif self.communicationContext is Title.STORING_FRAMES and self.t0Framing == T0_Framing.PROCEDURE_BYTES:
+            # An exchange cut by the end of the capture is decoded if its CLA INS P1 P2 are known
+            if len(self.message) >= 4:
+                self.endT0Exchange(len(self.message))
+                out = [frame.getOutputFrame(self.session) for frame in self.outputFrames]
+                self.outputFrames = None
+            elif len(self.message):
+                logger.warning('Error in decoding last message ! Ignoring this part.')
+            self.clearingProcess(Title.STORING_FRAMES)
 
-    def getETU(self):
-        return self.FI / (self.DI * self.f)
+        elif self.communicationContext is Title.STORING_FRAMES and len(self.message):
+            if self.answerStart is None and len(self.message) not in self.apduCases:
+                logger.warning('Error in decoding last message ! Ignoring this part.')
+            else:
+                self.handleAPDU(len(self.message))
+                out = [frame.getOutputFrame(self.session) for frame in self.outputFrames]
+                self.outputFrames = None
 
-    # BUG: Since we process an APDU message in the first frame after it finished,
-    #  whe never process the last message
-    def handleStoringFrames(self):
-        # The current character is part of the message
-        if (
-                self.frame.start_time - self.lastEndTime).__float__() < self.getCWT() * 1.3 or self.charCount == 1:
-            self.messageFrames.append(self.frame)
-        else:
-            print("End of current message.")
-            if self.subContext is None:
-                self.subContext = Title.APDU
-
-            if self.subContext is Title.APDU and len(self.messageFrames) >= 4:
-                self.handleAPDU()
-            elif self.subContext is Title.APDU_ANSWER:
-                self.handleAPDUAnswer(self.messageFrames, self.totalBinaryString[:-1])
+            self.clearingProcess(Title.STORING_FRAMES)
+
+        if self.exporter is not None:
+            self.exporter.flush()
+        return joinOutput(previousFrames, out)
+
+    # T=0 exchange, split by its procedure bytes (SEE: T0Transport). Its characters are held until SW2, then decoded
+    # at once.
+    def handleT0(self, value):
+        self.holdNeeded = True
+        role = self.t0.feed(value)
+        if self.t0Turnaround is None and len(self.t0Roles) == T0Transport.HEADER_LENGTH:
+            # First character of the card
+            self.t0Turnaround = self.getGap()
+        if self.t0Response is None:
+            if role == T0Transport.ACK or role == T0Transport.ACK_ONE or role == T0Transport.NULL:
+                self.t0ProcedureEnd = self.message.lastEnd
+            elif self.t0ProcedureEnd is not None and \
+                    (role == T0Transport.SW1 or role == T0Transport.DATA and self.t0.isOutgoing):
+                # First character of the answer after the last procedure byte
+                self.t0Response = self.message.lastStart - self.t0ProcedureEnd
+
+        if role == T0Transport.NULL:
+            # The card asks for more time: a run of NULL bytes makes one frame, its bytes are not stored
+            self.message.pop()
+            if self.t0NullRun is None:
+                self.t0NullRun = [self.frame, self.frame, 1]
             else:
-                print("Error in decoding last message ! Ignoring this part.")
-                self.clearingProcessForAPDU()
+                self.t0NullRun[1] = self.frame
+                self.t0NullRun[2] += 1
+            return
+        if self.t0NullRun is not None:
+            self.endNullRun(self.frame.start_time)
+
+        self.t0Roles.append(role)
+        if role == T0Transport.SW2 or role == T0Transport.INVALID:
+            if role == T0Transport.INVALID:
+                # Neither a procedure byte nor SW1 from the card: the exchange is broken, the next character starts a
+                # new one
+                logger.warning('Unexpected procedure byte %s. Ending the exchange.', HEX[value])
+            self.endT0Exchange(len(self.message))
+            self.clearingProcess(Title.STORING_FRAMES)
+            self.holdNeeded = False
+
+    # End of the current run of NULL bytes at `endTime`: the card was busy from the first one to it.
+    def endNullRun(self, endTime):
+        first, last, count = self.t0NullRun
+        busy = toNanoseconds(endTime, first.start_time)
+        self.t0Busy += busy
+        self.t0Frames.append(Raw_Frame('APDU Ans', 'NULL', 'Card busy : {} ns'.format(busy),
+                                       bytes((T0Transport.NULL_BYTE,)) * count, first, last))
+        self.t0NullRun = None
+
+    # Decode the T=0 exchange made of the first `length` characters of the message: the command and the answer
+    # carried by the exchange, as if they were sent without procedure bytes, and the procedure bytes.
+    def endT0Exchange(self, length):
+        logger.debug('Handling T=0 exchange')
+        if self.t0NullRun is not None:
+            self.endNullRun(self.t0NullRun[1].end_time)
+        self.message.linearize()
+        values = self.message.values
+        frames = self.message.frames
+        roles = self.t0Roles
+        outputFrames = self.t0Frames
+        isOutgoing = self.t0.isOutgoing
+        # P3 is the Le or the Lc of the command, unless no data is sent at all (case 1)
+        hasP3 = isOutgoing or bool(self.t0.p3)
+
+        command = []
+        answer = []
+        for i in range(length):
+            role = roles[i]
+            if role == T0Transport.HEADER:
+                if i < 4 or hasP3:
+                    command.append(i)
+                else:
+                    outputFrames.append(APDU_Frame('APDU', 'P3', 'No data', values[i], frames[i]))
+            elif role == T0Transport.DATA:
+                if isOutgoing:
+                    answer.append(i)
+                else:
+                    command.append(i)
+            elif role == T0Transport.SW1 or role == T0Transport.SW2:
+                answer.append(i)
+            elif role == T0Transport.ACK:
+                outputFrames.append(APDU_Frame('APDU Ans', 'ACK', 'All remaining data', values[i], frames[i]))
+            elif role == T0Transport.ACK_ONE:
+                outputFrames.append(APDU_Frame('APDU Ans', 'ACK', 'Next data byte', values[i], frames[i]))
+            else:
+                outputFrames.append(APDU_Frame('APDU Ans', 'PROCEDURE', 'Unexpected procedure byte', values[i],
+                                               frames[i]))
+
+        commandBytes = bytearray(values[i] for i in command)
+        commandFrames = frames.select(command)
+        commandLen = len(command)
+        # SEE: iso7816_3 part 12.2 (cases 1, 2S and 3S carried by T=0)
+        if commandLen == 4:
+            case = '1'
+        elif isOutgoing:
+            case = '2S'
+        elif commandLen == 5 + commandBytes[4]:
+            case = '3S'
+        else:
+            case = None
+        if case is not None:
+            appendCommandFrames(outputFrames, commandBytes, commandFrames, commandLen, case, self.instructions)
+        else:
+            # The card ended the exchange before it got all the data of the command
+            logger.warning('T=0 exchange ended after %s of the %s data bytes.', commandLen - 5, commandBytes[4])
+            appendCommandFrames(outputFrames, commandBytes, commandFrames, 4, '1', self.instructions)
+            outputFrames.append(APDU_Frame('APDU', 'Lc', str(commandBytes[4]), commandBytes[4], commandFrames[4]))
+            for i in range(5, commandLen):
+                outputFrames.append(APDU_Frame('APDU', 'DATA', None, commandBytes[i], commandFrames[i]))
+
+        answerBytes = bytearray(values[i] for i in answer)
+        answerFrames = frames.select(answer)
+        answerLen = len(answer)
+        ins = commandBytes[1]
+        turnaround = self.t0Turnaround
+        response = self.t0Response
+        hasStatus = roles[length - 1] == T0Transport.SW2
+        transaction = None
+        if hasStatus:
+            self.latency.record(CLA_CLASS[commandBytes[0]], ins, turnaround, response)
+            appendAnswerFrames(outputFrames, answerBytes, answerFrames, 0, answerLen, turnaround,
+                               self.responseChaining.getCommandIns(commandBytes[0], ins), response)
+            transaction = self.responseChaining.update(commandBytes[0], ins, commandFrames[0], answerBytes, 0,
+                                                       answerLen)
+        else:
+            for i in range(answerLen):
+                outputFrames.append(APDU_Frame('APDU Ans', 'ANSWER DATA', None, answerBytes[i], answerFrames[i]))
+
+        # Command, answer and procedure bytes interleave
+        outputFrames.sort(key=lambda frame: frame.start_time)
+        self.outputFrames = outputFrames
+        self.t0Frames = []
 
-            print('End of handling.\n\n')
+        if self.exporter is not None:
+            if case is not None:
+                commandRecord = getCommandRecord(commandBytes, commandLen, case, self.instructions)
+            else:
+                commandRecord = getCommandRecord(commandBytes, 4, '1', self.instructions)
+                commandRecord['raw'] = toHex(commandBytes)
+                commandRecord['case'] = None
+            self.exporter.write({
+                'type': 'APDU',
+                'protocol': 0,
+                'command': commandRecord,
+                'response': getAnswerRecord(answerBytes, 0, answerLen, turnaround, response) if hasStatus else None,
+                'busy_ns': self.t0Busy
+            }, frames[0], frames[length - 1])
+
+        if transaction is not None:
+            self.endTransaction(transaction, answerFrames[answerLen - 2], answerFrames[answerLen - 1])
+
+    # Update the lengths the command can still have, with their case, as its bytes arrive.
+    # SEE: iso7816_4 part 5.3.2 (conditions on L)
+    def updateAPDUCases(self, value):
+        apduLen = len(self.message)
+
+        # Case 1: L=0
+        if apduLen == 4:
+            self.apduCases[4] = '1'
+        elif apduLen == 5:
+            # Case 2S: L = 1
+            self.apduCases[5] = '2S'
+            # Case 3S: L = 1+(B1) and case 4S: L = 2+(B1); (B1) != 0
+            if value != 0:
+                self.apduCases[5 + value] = '3S'
+                self.apduCases[6 + value] = '4S'
+                self.apduMaxLen = 6 + value
+        elif apduLen == 7 and self.message[4] == 0:
+            # Case 2E: L = 3; (B1) = 0
+            self.apduCases[7] = '2E'
+            self.apduMaxLen = 7
+            # Case 3E: L = 3 + (B2 || B3) and case 4E: L = 5 + (B2 || B3); (B1) = 0; (B2 || B3) != 0
+            b2b3 = self.message[5] << 8 | value
+            if b2b3 != 0:
+                self.apduCases[7 + b2b3] = '3E'
+                self.apduCases[9 + b2b3] = '4E'
+                self.apduMaxLen = 9 + b2b3
+
+        # Nothing can follow in the command: the next character is the answer
+        if apduLen == self.apduMaxLen:
+            self.startAnswer(apduLen)
+
+    # The command is the first `apduLen` characters of the exchange, the answer starts after them.
+    def startAnswer(self, apduLen):
+        self.answerStart = apduLen
+        self.apduCase = self.apduCases[apduLen]
+        self.expectedAnswerLength = getExpectedAnswerLength(self.message, apduLen, self.apduCase)
 
     # Deprecated : There is now a new way of handling APDU's
-    def handleHEADER(self, binaryString, hexString):
+    def handleHEADER(self, value):
         self.title = Title.HEADER
+        hexString = HEX[value]
 
         # Case T=0
         if self.T[0] == 0:
             if self.charCount == 1:
                 self.type = 'CLA'
-                self.readData = decodeCLA(hexString, binaryString)
+                self.readData = decodeCLA(value)
             elif self.charCount == 2:
                 self.type = 'INS'
-                self.readData = decodeINS(hexString, binaryString)
+                self.readData = decodeINS(value, self.message[0], self.instructions)
             elif self.charCount == 3:
                 self.type = 'P1'
                 self.holdNeeded = True
@@ -704,15 +1199,15 @@ class Hla(HighLevelAnalyzer):
                 self.readData = "Ref : " + hexString
             elif self.charCount == 5:
                 self.type = 'P3 (Le)'
-                self.n = binaryToDecimal(binaryString)
+                self.n = value
                 self.readData = 'n = ' + str(self.n)
                 # TODO: Handle 'n=0' Case.
-                self.totalBinaryString.clear()
+                self.message.clear()
                 self.communicationContext = Title.DATA
                 self.charCount = 0
             else:
                 self.title = Title.UNDEFINED
-                self.totalBinaryString.clear()
+                self.message.clear()
                 self.communicationContext = Title.LOOKING_FOR_KNOWN_INIT
                 self.charCount = 0
         else:
@@ -722,484 +1217,611 @@ class Hla(HighLevelAnalyzer):
             self.communicationContext = Title.LOOKING_FOR_KNOWN_INIT
             self.charCount = 0
 
-    def handleAPDU(self):
-        print("Handling APDU")
+    # Decode the exchange made of the first `end` characters of the message.
+    def handleAPDU(self, end):
+        logger.debug('Handling APDU')
         self.outputFrames = []
 
-        dataLen = len(self.messageFrames) - 4
-
-        # SEE: iso7816_4 part 5.3.2 (conditions on L)
-        sb1 = ''
-        sb2 = ''
-        sb3 = ''
-        b1 = 0
-        b2 = 0
-        b3 = 0
-
-        if dataLen + 4 > 4:
-            b1 = binaryToDecimal(self.totalBinaryString[4])
-            sb1 = self.totalBinaryString[4]
-            if dataLen + 4 > 5:
-                b2 = binaryToDecimal(self.totalBinaryString[5])
-                sb2 = self.totalBinaryString[5]
-                if dataLen + 4 > 6:
-                    b3 = binaryToDecimal(self.totalBinaryString[6])
-                    sb3 = self.totalBinaryString[6]
-
-        sbL = self.totalBinaryString[-1]
-        bL = binaryToDecimal(sbL)
-
-        case = getAPDUCase(self.messageFrames, self.totalBinaryString)
-
-        framesFromAPDU = self.messageFrames
-        apduBinaryStrings = self.totalBinaryString
-
-        cuttingPoints = self.findCuttingPoints(dataLen)
-        print('C Pts :', cuttingPoints)
-
-        if case == 'INV':
-            # Maybe we also have the answer.
-
-            print("INV Type. Trying with shrinking 1.")
-            case = getAPDUCase(self.messageFrames[0: -2], self.totalBinaryString[0: -2])
-
-            if case == 'INV':
-
-                print("Still INV Type. Trying with shrinking 2.")
-
-                if len(cuttingPoints) > 0:
-                    cuttingIndex = cuttingPoints[0]
-                    shrinkOut = self.shrinkMessage(cuttingIndex)
-
-                    framesFromAPDU = shrinkOut['apduFrames']
-                    apduBinaryStrings = shrinkOut['apduBStr']
-                    framesFromAnswer = shrinkOut['ansFrames']
-                    apduAnsBinaryStrings = shrinkOut['ansBin']
-
-                    case = getAPDUCase(framesFromAPDU, apduBinaryStrings)
-
-            else:
-                framesFromAPDU = self.messageFrames[0: -2]
-                apduBinaryStrings = self.totalBinaryString[0: -2]
-
-                framesFromAnswer = self.messageFrames[-2:]
-                apduAnsBinaryStrings = self.totalBinaryString[-3:-1]
-        elif len(cuttingPoints) > 0:
-            if cuttingPoints[0] == 5:
-                shrinkOut = self.shrinkMessage(cuttingPoints[0])
-                framesFromAPDU = shrinkOut['apduFrames']
-                apduBinaryStrings = shrinkOut['apduBStr']
-                framesFromAnswer = shrinkOut['ansFrames']
-                apduAnsBinaryStrings = shrinkOut['ansBin']
-
-                case = getAPDUCase(framesFromAPDU, apduBinaryStrings)
-
-        print("Case :", case)
-
-        i = 0
-        hexCLA = self.totalHexStrings[i]
-        cla = decodeCLA(self.totalHexStrings[i], apduBinaryStrings[i])
-        frame = APDU_Frame('APDU', 'CLA', cla, self.totalHexStrings[i], framesFromAPDU[i])
-        self.outputFrames.append(frame.getOutputFrame())
-        i += 1
-        ins = decodeINS(self.totalHexStrings[i][2:4], apduBinaryStrings[i], hexCLA)
-        frame = APDU_Frame('APDU', 'INS', ins,
-                           self.totalHexStrings[i], framesFromAPDU[i])
-        self.outputFrames.append(frame.getOutputFrame())
-        i += 1
-        frame = APDU_Frame('APDU', 'P1', self.totalHexStrings[i][2:4], self.totalHexStrings[i], framesFromAPDU[i])
-        self.outputFrames.append(frame.getOutputFrame())
-        i += 1
-        frame = APDU_Frame('APDU', 'P2', self.totalHexStrings[i][2:4], self.totalHexStrings[i], framesFromAPDU[i])
-        self.outputFrames.append(frame.getOutputFrame())
-        i += 1
-
-        if case == '1':
-            pass
-        if case == '2S':
-            frame = APDU_Frame('APDU', 'Le', str(b1), self.totalHexStrings[i], framesFromAPDU[i])
-            self.outputFrames.append(frame.getOutputFrame())
-
-        elif case == '3S' or case == '4S':
-            frame = APDU_Frame('APDU', 'Lc', str(b1), self.totalHexStrings[i], framesFromAPDU[i])
-            self.outputFrames.append(frame.getOutputFrame())
-
-            i += 1
-
-            for j in range(b1):
-                frame = APDU_Frame('APDU', 'DATA', self.totalHexStrings[i + j], self.totalHexStrings[i + j],
-                                   framesFromAPDU[i + j])
-                self.outputFrames.append(frame.getOutputFrame())
-
-            if case == '4S':
-                i += b1
-                frame = APDU_Frame('APDU', 'Le', str(bL), self.totalHexStrings[-1], framesFromAPDU[-1])
-                self.outputFrames.append(frame.getOutputFrame())
-
-        elif case == '2E':
-            le = binaryToDecimal(apduBinaryStrings[-3] + apduBinaryStrings[-2] + apduBinaryStrings[-1])
-            frame = APDU_Frame('APDU', 'Le', str(le), self.totalHexStrings[-1], framesFromAPDU[-3], framesFromAPDU[-1])
-            self.outputFrames.append(frame.getOutputFrame())
-
-        elif case == '3E' or case == '4E':
-            frame = APDU_Frame('APDU', 'Lc', str(binaryToDecimal(sb2 + sb3)),
-                               self.totalHexStrings[i] + self.totalHexStrings[i + 1],
-                               framesFromAPDU[i], framesFromAPDU[i + 1])
-            self.outputFrames.append(frame.getOutputFrame())
-
-            i += 2
-
-            for j in range(b1):
-                frame = APDU_Frame('APDU', 'DATA', self.totalHexStrings[i + j], self.totalHexStrings[i + j],
-                                   framesFromAPDU[i + j])
-                self.outputFrames.append(frame.getOutputFrame())
-
-            if case == '4E':
-                i += b1
-                frame = APDU_Frame('APDU', 'Le', str(binaryToDecimal(apduBinaryStrings[-2] + apduBinaryStrings[-1])),
-                                   self.totalHexStrings[-2] + self.totalHexStrings[-1], framesFromAPDU[-2],
-                                   framesFromAPDU[-1])
-                self.outputFrames.append(frame.getOutputFrame())
-
-        print("Switching to APDU Answer.")
-        if len(framesFromAPDU) < len(self.messageFrames):
-            # The frames contain an answer.
-            self.handleAPDUAnswer(framesFromAnswer, apduAnsBinaryStrings)
+        # Index the stored characters directly
+        self.message.linearize()
+        if self.answerStart is not None:
+            apduLen = self.answerStart
         else:
-            self.clearingProcessForAPDU()
-            self.subContext = Title.APDU_ANSWER
-
-    def handleAPDUAnswer(self, framesFromAnswer, binaryString):
-        print("Handling APDU Answer...")
-
-        if len(framesFromAnswer) > 2:
-            for i in range(len(framesFromAnswer) - 2):
-                frame = APDU_Frame('APDU Ans', 'ANSWER DATA', binaryToHex(binaryString[i]),
-                                   binaryToHex(binaryString[i]),
-                                   framesFromAnswer[i])
-                self.outputFrames.append(frame.getOutputFrame())
-        if len(framesFromAnswer) >= 2:
-            sw1Frame = framesFromAnswer[-2]
-            sw2Frame = framesFromAnswer[-1]
-
-            sw1Binary = binaryString[-2]
-            sw2Binary = binaryString[-1]
-
-            frame = decodeSWAndGenerateFrame(sw1Frame, sw2Frame, sw1Binary, sw2Binary)
-            self.outputFrames.append(frame)
-
-        print("Switching to APDU.")
-        self.subContext = Title.APDU
-        self.clearingProcessForAPDU()
-
-    def findCuttingPoints(self, dataLen):
-        cuttingPoints = []
-
-        print('CWT', self.getCWT())
-        for i in reversed(range(1, dataLen + 4)):
-            if (self.messageFrames[i].start_time - self.messageFrames[
-                i - 1].end_time).__float__() + self.getETU() > self.getCWT() / 2:
-                cuttingPoints.append(i)
-
-        return cuttingPoints
-
-    def shrinkMessage(self, cuttingIndex):
-        case = getAPDUCase(self.messageFrames[: cuttingIndex], self.totalBinaryString[: cuttingIndex])
-
-        if case != 'INV':
-            framesFromAPDU = self.messageFrames[: cuttingIndex]
-            apduBinaryStrings = self.totalBinaryString[: cuttingIndex]
-
-            framesFromAnswer = self.messageFrames[cuttingIndex:]
-            apduAnsBinaryStrings = self.totalBinaryString[cuttingIndex - 1:-1]
-
-            return {'apduFrames': framesFromAPDU, 'apduBStr': apduBinaryStrings, 'ansFrames': framesFromAnswer,
-                    'ansBin': apduAnsBinaryStrings}
-
-        return {'apduFrames': self.messageFrames, 'apduBStr': self.totalBinaryString, 'ansFrames': None, 'ansBin': None}
-
-    def handleT1(self, binaryString):
+            apduLen = end
+
+        case = self.apduCases[apduLen]
+        logger.debug('Case : %s', case)
+        appendCommandFrames(self.outputFrames, self.message.values, self.message.frames, apduLen, case,
+                            self.instructions)
+
+        transaction = None
+        if self.answerStart is not None:
+            logger.debug('Handling APDU Answer...')
+            # The first character after the command is the first one sent by the card (procedure byte or SW1)
+            values = self.message.values
+            frames = self.message.frames
+            turnaround = toNanoseconds(frames[apduLen].start_time, frames[apduLen - 1].end_time)
+            self.latency.record(CLA_CLASS[values[0]], values[1], turnaround)
+            appendAnswerFrames(self.outputFrames, values, frames, self.answerStart, end, turnaround,
+                               self.responseChaining.getCommandIns(values[0], values[1]))
+            if end - self.answerStart >= 2:
+                transaction = self.responseChaining.update(values[0], values[1], frames[0], values, self.answerStart,
+                                                           end)
+
+        if self.exporter is not None:
+            values = self.message.values
+            self.exporter.write({
+                'type': 'APDU',
+                'protocol': 0,
+                'command': getCommandRecord(values, apduLen, case, self.instructions),
+                'response': None if self.answerStart is None else getAnswerRecord(values, self.answerStart, end,
+                                                                                  turnaround)
+            }, self.message.frames[0], self.message.frames[end - 1])
+
+        if transaction is not None:
+            self.endTransaction(transaction, self.message.frames[end - 2], self.message.frames[end - 1])
+
+    # Show the answer of a `transaction` fetched in several exchanges on the status word of its last exchange, sent
+    # in `sw1Frame` and `sw2Frame`: its SW1-SW2 frame, the last one of the output, is replaced.
+    def endTransaction(self, transaction, sw1Frame, sw2Frame):
+        elapsed = toNanoseconds(sw2Frame.end_time, transaction.startFrame.start_time)
+        instruction = decodeINS(transaction.ins, transaction.cla, self.instructions)
+        logger.debug('%s answered in %s exchanges, %s ns.', instruction, transaction.exchanges, elapsed)
+        outputFrames = self.outputFrames
+        statusFrame = outputFrames[-1]
+        data = '{} ({}: {} bytes in {} exchanges)'.format(statusFrame.data.strip(), instruction, len(transaction.data),
+                                                          transaction.exchanges)
+        frame = Transaction_Frame(data, statusFrame.value, transaction.ins, transaction.exchanges,
+                                  bytes(transaction.data), elapsed, sw1Frame, sw2Frame)
+        frame.turnaround = statusFrame.turnaround
+        frame.response = statusFrame.response
+        outputFrames[-1] = frame
+
+        if self.exporter is not None:
+            self.exporter.write({
+                'type': 'Transaction',
+                'protocol': 0,
+                'channel': getChannel(transaction.cla),
+                'cla': HEX[transaction.cla],
+                'ins': HEX[transaction.ins],
+                'instruction': instruction,
+                'exchanges': transaction.exchanges,
+                'data': toHex(transaction.data),
+                'sw': HEX[transaction.sw1] + HEX[transaction.sw2],
+                'status': decodeSW(transaction.sw1, transaction.sw2),
+                'elapsed_ns': elapsed
+            }, transaction.startFrame, sw2Frame)
+
+    def handleT1(self, value):
         self.title = Title.T1EXCHANGE
-        print('Count :', self.charCount)
+        charCount = self.charCount
+        if self.isDebugEnabled:
+            logger.debug('Count : %s', charCount)
+        # INF field, checked first as most characters are part of it. Decoded with the whole INF field, at the end of
+        # the block or of the chain
+        if 3 < charCount < self.t1EdcStart:
+            self.holdNeeded = True
+            return
+
         # First byte: NAD (Node Address)
-        if self.charCount == 1:
+        if charCount == 1:
             self.type = 'NAD'
-            self.readData = 'SAD : ' + binaryString[5:] + '; DAD : ' + binaryString[0:3] + "; "
-            b8 = int(binaryString[0])
-            b4 = int(binaryString[4])
+            self.readData = 'SAD : ' + str(value & 0x07) + '; DAD : ' + str(value >> 4 & 0x07) + "; "
+            b8 = value & 0x80
+            b4 = value & 0x08
 
-            if b8 == 0 and b4 == 0:
+            if not b8 and not b4:
                 self.readData += 'Set or maintain pause sate on VPP.'
-            elif b8 == 1 and b4 == 0:
+            elif b8 and not b4:
                 self.readData += 'Set reading state on VPP until PCB.'
-            elif b8 == 0 and b4 == 1:
+            elif not b8 and b4:
                 self.readData += 'Set reading state on VPP until NAD.'
             else:
                 self.readData += 'Not allowed...'
 
         # Second byte: PCB (Protocol Control Byte)
-        elif self.charCount == 2:
+        elif charCount == 2:
             self.type = 'PCB'
             self.readData = ''
 
             # I bloc:
-            if binaryString[0] == '0':
-                self.readData += 'I bloc; N(S): ' + binaryString[1]
-                self.readData += '; bit M : ' + binaryString[2]
-                self.readData += '; RUF : ' + binaryString[3:]
+            if not value & 0x80:
+                self.readData += 'I bloc; N(S): ' + str(value >> 6 & 0x01)
+                self.readData += '; bit M : ' + str(value >> 5 & 0x01)
+                self.readData += '; RUF : ' + '{:05b}'.format(value & 0x1F)
             # R bloc:
-            elif binaryString[0:2] == '10':
+            elif value & 0xC0 == 0x80:
                 self.readData += 'R bloc; '
-                if self.readData[2] == '0':
-                    if self.readData[3] == '1':
-                        self.readData += 'Error : '
-                        if binaryString[4:] == '0001':
-                            self.readData += 'Char parity or EDC error.'
-                        elif binaryString[4:] == '0010':
-                            self.readData += 'Other error.'
-                        else:
-                            self.readData += 'RUF.'
-                    elif binaryString == '10000000' or binaryString == '10010000':
+                if not value & 0x20:
+                    if value & 0x0F == 0x00:
                         self.readData += 'No error.'
+                    elif value & 0x0F == 0x01:
+                        self.readData += 'Error : Char parity or EDC error.'
+                    elif value & 0x0F == 0x02:
+                        self.readData += 'Error : Other error.'
                     else:
                         self.readData += 'RUF.'
                 else:
                     self.readData += 'RUF.'
 
             # S bloc:
-            elif binaryString[0:2] == '11':
+            else:
                 self.readData += 'S bloc; '
-                b5__b1_meaning = decodePCBB_blocS_b5__b1(binaryString[4:])
-                if binaryString[2:] == '100100':
+                b5__b1_meaning = decodePCBB_blocS_b5__b1(value & 0x0F)
+                if value & 0x3F == 0x24:
                     self.readData += 'VPP state error.'
-                elif binaryString[2] == '0':
+                elif not value & 0x20:
                     self.readData += b5__b1_meaning
                     self.readData += ' request.'
-                elif binaryString[2] == '1':
+                else:
                     self.readData += b5__b1_meaning
                     self.readData += ' answer.'
-                else:
-                    self.readData += 'RUF.'
 
         # Third byte: len (Length)
-        elif self.charCount == 3:
+        elif charCount == 3:
             self.type = 'len'
-            self.len = binaryToDecimal(binaryString)
+            self.len = value
             self.readData = 'len : ' + str(self.len)
-        elif self.charCount - 3 <= self.len:
-            self.type = 'INF-' + str(self.charCount - 3)
+            self.t1EdcStart = 4 + value
 
-        elif self.charCount - 3 - self.len == 1:
-            if self.edc_type == EDC_Type.LRC:
+        elif charCount == self.t1EdcStart:
+            if self.edcType == EDC_Type.LRC:
                 self.type = 'EDC : ' + EDC_Type.LRC
                 transfertOK = self.checkCntrlChar()
                 if transfertOK:
-                    print("Transfer OK !")
+                    logger.debug('Transfer OK !')
                     self.readData = 'Transfer OK'
                 else:
-                    print("Error in transfer.")
+                    logger.warning('Error in transfer.')
                     self.readData = 'Error in transfer'
+                self.endT1Block(transfertOK, APDU_Frame(self.title, self.type, self.readData, value, self.frame))
                 self.clearingProcess(Title.T1EXCHANGE)
-            elif self.edc_type == EDC_Type.CRC:
+            elif self.edcType == EDC_Type.CRC:
                 self.type = 'EDC : ' + EDC_Type.CRC
                 self.holdNeeded = True
-                self.bigBeginning = self.frame.start_time
-                self.firstHexString = binaryToHex(binaryString)
             else:
                 self.type = 'EDC : ' + EDC_Type.NA
                 self.readData = 'Please specify EDC.'
-                print("\nEDC type specified as NA.")
-                print("Please specify EDC type.\n")
-        elif self.charCount - 3 - self.len == 2 and self.edc_type == EDC_Type.CRC:
-            transfertOK = checkCRCIsOK(self.totalBinaryString)
+                logger.warning('EDC type specified as NA. Please specify EDC type.')
+                # The end of the block is unknown: show the INF field as it is
+                self.outputFrames = self.getRawINFFrames()
+                self.outputFrames.append(APDU_Frame(self.title, self.type, self.readData, value, self.frame))
+                self.holdNeeded = False
+            return
+        elif charCount == self.t1EdcStart + 1 and self.edcType == EDC_Type.CRC:
+            with self.message.view() as data:
+                transfertOK = checkCRC(data)
             if transfertOK:
-                print("Transfer OK !")
+                logger.debug('Transfer OK !')
                 self.readData = 'Transfer OK'
             else:
-                print("Error in transfer.")
+                logger.warning('Error in transfer.')
                 self.readData = 'Error in transfer'
-            self.holdNeeded = False
-            self.isEndOfHold = True
+            crc = self.message[-2] << 8 | value
+            self.endT1Block(transfertOK, APDU_Frame(self.title, self.type, self.readData, crc,
+                                                    self.message.frame(-2), self.frame))
             self.clearingProcess(Title.T1EXCHANGE)
+            return
         else:
             self.title = Title.UNDEFINED
             self.type = Title.UNDEFINED
             self.readData = Title.UNDEFINED
 
-
-def getAPDUCase(messageFrames, totalBinaryString):
-    dataLen = len(messageFrames) - 4
-    print('Message length :', dataLen + 4)
-
-    # SEE: iso7816_4 part 5.3.2 (conditions on L)
-    sb2 = ''
-    sb3 = ''
-    b1 = 0
-
-    if dataLen + 4 > 4:
-        b1 = binaryToDecimal(totalBinaryString[4])
-        if dataLen + 4 > 5:
-            sb2 = totalBinaryString[5]
-            if dataLen + 4 > 6:
-                sb3 = totalBinaryString[6]
-
-    # Case 1: L=0
-    if dataLen == 0:
-        case = '1'
-    # Case 2S: L = 1
-    elif dataLen == 1:
-        case = '2S'
-    # Case 3S: L = 1+(B1); (B1) != 0
-    elif dataLen == 1 + b1 and b1 != 0:
-        case = '3S'
-    # Case 4S: L = 2+(B1); (B1) != 0
-    elif dataLen == 2 + b1 and b1 != 0:
-        case = '4S'
-    # Case 2E: L = 3; (B1) = 0
-    elif dataLen == 3 and b1 == 0:
-        case = '2E'
-    # Case 3E: L = 3 + (B2 || B3); (B1) = 0; (B2 || B3) != 0
-    elif dataLen == 3 + binaryToDecimal(sb2 + sb3) and b1 == 0 and binaryToDecimal(sb2 + sb3) != 0:
-        case = '3E'
-    # Case 4E: L = 5 + (B2 || B3); (B1) = 0; (B2 || B3) != 0
-    elif dataLen == 5 + binaryToDecimal(sb2 + sb3) and b1 == 0 and binaryToDecimal(sb2 + sb3) != 0:
-        case = '4S'
-    # Not valid cases
-    else:
-        case = 'INV'
-
-    return case
-
-
-def invertBits(bits):
-    newBits = ""
-    for b in bits:
-        if b == '1':
-            newBits += '0'
+        # Frames of the prologue are shown at once, unless a chain is pending: they would come before its APDU
+        if self.t1Chaining:
+            self.t1Frames.append(APDU_Frame(self.title, self.type, self.readData, value, self.frame))
+            self.holdNeeded = True
         else:
-            newBits += '1'
-    return newBits
+            self.holdNeeded = False
 
+    # INF field of the current block, shown byte by byte when it is not part of an APDU.
+    def getRawINFFrames(self):
+        values = self.message
+        return [APDU_Frame(Title.T1EXCHANGE, 'INF-' + str(i - 2), None, values[i], values.frame(i))
+                for i in range(3, min(3 + self.len, len(values)))]
+
+    # End of a T=1 block whose epilogue is `edcFrame`. The INF fields of the I-blocks are gathered until the last block
+    # of the chain (M bit cleared), then decoded as a whole command or answer APDU.
+    # SEE: iso7816_3 part 11.6 (chaining) and annex A (retransmission after an R-block)
+    def endT1Block(self, transferOk, edcFrame):
+        pcb = self.message[1]
+        isAccepted = False
+        isChained = False
+        if self.exporter is not None:
+            self.exportT1Block(transferOk)
+
+        if not pcb & 0x80 and transferOk:
+            sequence = pcb >> 6 & 0x01
+            # A block is sent again with the same N(S) when the receiver asked for it with an R-block
+            isResent = self.t1AfterRBlock and sequence == self.t1LastSequence[self.t1IsCommand]
+            if isResent:
+                logger.info('I-block N(S) : %s sent again. Already decoded.', sequence)
+            else:
+                isAccepted = True
+                isChained = bool(pcb & 0x20)
+                if not self.t1IsCommand and not self.t1Inf and self.t1CommandEnd is not None:
+                    # First block of the answer
+                    self.t1Turnaround = toNanoseconds(self.message.frame(0).start_time, self.t1CommandEnd)
+                self.t1LastSequence[self.t1IsCommand] = sequence
+                with self.message.view(3, 3 + self.len) as inf:
+                    self.t1Inf += inf
+                self.t1InfFrames += self.message.frames[3:3 + self.len]
+            self.t1ChainEnded = False
+            if isResent and self.t1LastBlockAsked:
+                # The last block of the chain, already decoded, is sent again: the line goes back to the receiver
+                self.t1IsCommand = not self.t1IsCommand
+                self.t1ChainEnded = True
+            self.t1AfterRBlock = False
+            self.t1LastBlockAsked = False
+        elif pcb & 0xC0 == 0x80 and transferOk:
+            # The receiver of the last block of a chain asks for it again: its sender keeps the line
+            if self.t1ChainEnded and pcb & 0x0F:
+                self.t1IsCommand = not self.t1IsCommand
+                self.t1ChainEnded = False
+                self.t1LastBlockAsked = True
+            self.t1AfterRBlock = True
+
+        if not isAccepted:
+            self.t1Frames += self.getRawINFFrames()
+        self.t1Frames.append(edcFrame)
+
+        if isChained or (self.t1Chaining and not isAccepted):
+            self.t1Chaining = True
+            self.holdNeeded = True
+            return
 
-def reverseBits(bits):
-    newBits = ""
-    for b in bits:
-        newBits = b + newBits
-    return newBits
+        outputFrames = self.t1Frames
+        if isAccepted:
+            apduFrames = self.getT1APDUFrames()
+            if self.t1IsCommand:
+                self.t1CommandEnd = edcFrame.end_time
+            else:
+                self.t1CommandIns = None
+                self.t1CommandEnd = None
+                self.t1Turnaround = None
+            if len(outputFrames) == 1:
+                # Single block: only its epilogue is held, after the whole APDU
+                outputFrames = apduFrames + outputFrames
+            else:
+                outputFrames = list(heapq.merge(outputFrames, apduFrames, key=lambda frame: frame.start_time))
+            self.t1Inf = bytearray()
+            self.t1InfFrames = FrameColumns()
+            self.t1Chaining = False
+            self.t1ChainEnded = True
+            self.t1IsCommand = not self.t1IsCommand
+
+        self.t1Frames = []
+        self.outputFrames = outputFrames
+        self.holdNeeded = False
 
+    # Export the T=1 block ending with the current character.
+    def exportT1Block(self, transferOk):
+        pcb = self.message[1]
+        record = {
+            'type': 'T=1 block',
+            'nad': HEX[self.message[0]],
+            'pcb': HEX[pcb]
+        }
+        if not pcb & 0x80:
+            record['block'] = 'I'
+            record['ns'] = pcb >> 6 & 0x01
+            record['more'] = bool(pcb & 0x20)
+        elif pcb & 0xC0 == 0x80:
+            record['block'] = 'R'
+            record['nr'] = pcb >> 4 & 0x01
+            record['error'] = pcb & 0x0F
+        else:
+            record['block'] = 'S'
+            record['function'] = decodePCBB_blocS_b5__b1(pcb & 0x0F)
+            record['response'] = bool(pcb & 0x20)
+        record['len'] = self.len
+        with self.message.view(3, 3 + self.len) as inf:
+            record['inf'] = toHex(inf)
+        with self.message.view(3 + self.len) as edc:
+            record['edc'] = toHex(edc)
+        record['checksum_ok'] = transferOk
+        self.exporter.write(record, self.message.frame(0), self.frame)
+
+    # Frames held for a T=1 chain that did not end: its INF fields are shown as they are.
+    def flushT1Chain(self):
+        if not self.t1Frames and not self.t1Inf:
+            return None
+
+        logger.warning('T=1 chain not ended. Showing its INF fields as they are.')
+        apduFrames = [APDU_Frame(Title.T1EXCHANGE, 'INF-' + str(i + 1), None, self.t1Inf[i], self.t1InfFrames[i])
+                      for i in range(len(self.t1Inf))]
+        outputFrames = heapq.merge(self.t1Frames, apduFrames, key=lambda frame: frame.start_time)
+        out = [frame.getOutputFrame(self.session) for frame in outputFrames]
+
+        self.t1Inf = bytearray()
+        self.t1InfFrames = FrameColumns()
+        self.t1Frames = []
+        self.t1Chaining = False
+        return out
 
-def binaryToDecimal(n):
-    try:
-        out = int(n, 2)
-    except:
-        out = 0
-    return out
+    # Frames of the APDU carried by the INF fields of the chain, command and answer alternating.
+    def getT1APDUFrames(self):
+        apduBytes = self.t1Inf
+        framesFromAPDU = self.t1InfFrames
+        apduLen = len(apduBytes)
+        outputFrames = []
+
+        if self.t1IsCommand:
+            case = getAPDUCase(apduBytes, apduLen)
+            if case is not None:
+                logger.debug('T=1 command. Case : %s', case)
+                appendCommandFrames(outputFrames, apduBytes, framesFromAPDU, apduLen, case, self.instructions)
+                self.t1CommandIns = apduBytes[1]
+                self.t1CommandClass = CLA_CLASS[apduBytes[0]]
+                if self.exporter is not None:
+                    # Exported with its answer
+                    self.t1CommandRecord = (getCommandRecord(apduBytes, apduLen, case, self.instructions),
+                                            framesFromAPDU[0])
+            else:
+                self.t1CommandIns = None
+                self.t1CommandRecord = None
+                if apduLen:
+                    logger.warning('INF field of %s bytes is not a command APDU.', apduLen)
+        elif apduLen >= 2:
+            if self.t1CommandIns is not None and self.t1Turnaround is not None:
+                self.latency.record(self.t1CommandClass, self.t1CommandIns, self.t1Turnaround)
+            appendAnswerFrames(outputFrames, apduBytes, framesFromAPDU, 0, apduLen, self.t1Turnaround,
+                               self.t1CommandIns)
+            if self.exporter is not None:
+                command, startFrame = self.t1CommandRecord or (None, framesFromAPDU[0])
+                self.exporter.write({
+                    'type': 'APDU',
+                    'protocol': 1,
+                    'command': command,
+                    'response': getAnswerRecord(apduBytes, 0, apduLen, self.t1Turnaround)
+                }, startFrame, framesFromAPDU[-1])
+                self.t1CommandRecord = None
+
+        if not outputFrames:
+            outputFrames = [APDU_Frame(Title.T1EXCHANGE, 'INF-' + str(i + 1), None, apduBytes[i], framesFromAPDU[i])
+                            for i in range(apduLen)]
+        return outputFrames
+
+
+# Attributes of the analyzer set by the characters of an ATR after TS, kept by the ATR cache
+ATR_PARAMETERS = ('isFormatDefined', 'nbFormatCount', 'Ti', 'K', 'T', 'interfaceOctets', 'histoOctets', 'FI', 'DI',
+                  'mightTriggerPPS', 'II', 'PI1', 'N', 'WI', 'canChangeMode', 'isParamParInterface', 'tEnSpec')
+
+# Handlers of the analyzer and decode table lookups counted by the profiler
+PROFILED_METHODS = ('decode', 'decodeCharacter', 'flush', 'startSession', 'handleATR', 'parseATR', 'endATR',
+                    'handlePPS', 'handlePPS_ANSWER', 'handleSearchingInit', 'handleStoringFrames', 'updateAPDUCases',
+                    'handleAPDU', 'handleT0', 'endT0Exchange', 'endTransaction', 'handleT1', 'endT1Block',
+                    'getT1APDUFrames', 'checkCntrlChar')
+PROFILED_FUNCTIONS = ('getAPDUCase', 'appendCommandFrames', 'appendAnswerFrames', 'appendTLVFrames', 'decodeCLA',
+                      'decodeINS', 'decodeSWAndGenerateFrame', 'decodeSW')
+
+
+# Replace the profiled handlers and functions by counting wrappers, for every analyzer of the process.
+def instrumentDecoder():
+    profiler.instrument(Hla, PROFILED_METHODS)
+    profiler.instrument(sys.modules[__name__], PROFILED_FUNCTIONS)
+    profiler.instrument(APDU_Frame, ('getOutputFrame',))
+
+
+# Number of bytes of the answer to the `apduLen` bytes command of the given case: Le data bytes, then SW1-SW2.
+# SEE: iso7816_4 part 5.3.2 (Le = 0 means the maximum length)
+def getExpectedAnswerLength(apduBytes, apduLen, case):
+    if case == '2S' or case == '4S':
+        le = apduBytes[apduLen - 1] or 256
+    elif case == '2E' or case == '4E':
+        le = (apduBytes[apduLen - 2] << 8 | apduBytes[apduLen - 1]) or 65536
+    else:
+        le = 0
 
+    return le + 2
 
-def bytesToBinary(bytesData: bytes) -> str:
-    return "{:08b}".format(int(bytesData.hex(), 16))
 
+# Case of a whole command of `apduLen` bytes, or None if its length does not match its length fields.
+# SEE: iso7816_4 part 5.3.2 (conditions on L)
+def getAPDUCase(apduBytes, apduLen):
+    if apduLen == 4:
+        return '1'
+    if apduLen < 5:
+        return None
+    b1 = apduBytes[4]
+    if apduLen == 5:
+        return '2S'
+    if b1 != 0:
+        if apduLen == 5 + b1:
+            return '3S'
+        if apduLen == 6 + b1:
+            return '4S'
+        return None
+    if apduLen == 7:
+        return '2E'
+    if apduLen < 7:
+        return None
+    b2b3 = apduBytes[5] << 8 | apduBytes[6]
+    if b2b3 != 0:
+        if apduLen == 7 + b2b3:
+            return '3E'
+        if apduLen == 9 + b2b3:
+            return '4E'
+    return None
+
+
+# Append the frames of the `apduLen` bytes command of the given case to `outputFrames`. `apduBytes` and
+# `framesFromAPDU` are indexed from the first byte of the command (CLA).
+def appendCommandFrames(outputFrames, apduBytes, framesFromAPDU, apduLen, case, instructions):
+    # SEE: iso7816_4 part 5.3.2 (conditions on L)
+    b1 = 0
+    b2b3 = 0
+
+    if apduLen > 4:
+        b1 = apduBytes[4]
+        if apduLen > 6:
+            b2b3 = apduBytes[5] << 8 | apduBytes[6]
+
+    last = apduLen - 1
+
+    i = 0
+    cla = decodeCLA(apduBytes[i])
+    outputFrames.append(APDU_Frame('APDU', 'CLA', cla, apduBytes[i], framesFromAPDU[i]))
+    i += 1
+    ins = decodeINS(apduBytes[i], apduBytes[0], instructions)
+    outputFrames.append(APDU_Frame('APDU', 'INS', ins, apduBytes[i], framesFromAPDU[i]))
+    i += 1
+    outputFrames.append(APDU_Frame('APDU', 'P1', HEX[apduBytes[i]], apduBytes[i], framesFromAPDU[i]))
+    i += 1
+    outputFrames.append(APDU_Frame('APDU', 'P2', HEX[apduBytes[i]], apduBytes[i], framesFromAPDU[i]))
+    i += 1
+
+    if case == '1':
+        pass
+    if case == '2S':
+        outputFrames.append(APDU_Frame('APDU', 'Le', str(b1), apduBytes[i], framesFromAPDU[i]))
+
+    elif case == '3S' or case == '4S':
+        outputFrames.append(APDU_Frame('APDU', 'Lc', str(b1), apduBytes[i], framesFromAPDU[i]))
 
-def binaryToHex(binaryString: str) -> str:
-    return "{0:0>4X}".format(int(binaryString, 2))[2:5]
+        i += 1
 
+        for j in range(i, i + b1):
+            outputFrames.append(APDU_Frame('APDU', 'DATA', None, apduBytes[j], framesFromAPDU[j]))
 
-def calculate_TCK(binaryData):
-    tck = "00000000"
+        if case == '4S':
+            outputFrames.append(APDU_Frame('APDU', 'Le', str(apduBytes[last]), apduBytes[last],
+                                           framesFromAPDU[last]))
 
-    # First two octets
-    for i in range(len(binaryData[0])):
-        tck = replacer(tck, charXOR(binaryData[0][i], binaryData[1][i]), i)
-    for binary in binaryData[2:-1]:
-        for i in range(len(binary)):
-            tck = replacer(tck, charXOR(tck[i], binary[i]), i)
+    elif case == '2E':
+        outputFrames.append(APDU_Frame('APDU', 'Le', str(b2b3), b2b3, framesFromAPDU[4], framesFromAPDU[last]))
 
-    return tck
+    elif case == '3E' or case == '4E':
+        outputFrames.append(APDU_Frame('APDU', 'Lc', str(b2b3), b2b3, framesFromAPDU[4], framesFromAPDU[6]))
 
+        i += 3
 
-def replacer(s, newstring, index):
-    if index < 0:  # add it to the beginning
-        return newstring + s
-    if index > len(s):  # add it to the end
-        return s + newstring
+        for j in range(i, i + b2b3):
+            outputFrames.append(APDU_Frame('APDU', 'DATA', None, apduBytes[j], framesFromAPDU[j]))
 
-    # insert the new string between "slices" of the original
-    return s[:index] + newstring + s[index + 1:]
+        if case == '4E':
+            le = apduBytes[last - 1] << 8 | apduBytes[last]
+            outputFrames.append(APDU_Frame('APDU', 'Le', str(le), le, framesFromAPDU[last - 1],
+                                           framesFromAPDU[last]))
 
 
-def charXOR(a: str, b: str) -> str:
-    if a == '1' and b == '0' or a == '0' and b == '1':
-        return '1'
-    else:
-        return '0'
-
-
-# CRC check using divider (x^16+x^12+x^5+1)
-def checkCRCIsOK(binaryStrings):
-    div = '10001000000100001'
-
-    # Generate the string
-    binaryString = ''
-    for string in binaryStrings:
-        binaryString += string
-
-    # Compute the division :
-    currString = binaryString[0:len(div)]
-    nextStr = ''
-    if div[0] == 0 or currString[0] == 1:
-        for i in range(len(div) - 1):
-            nextStr += charXOR(currString[i + 1], div[i + 1])
-    currString = nextStr
-    nextStr = ''
-
-    for bit in binaryString[len(div):]:
-        currString += bit
-        for i in range(len(div) - 1):
-            nextStr += charXOR(currString[i + 1], div[i + 1])
-        currString = nextStr
-        nextStr = ''
-
-    if '1' in currString:
-        return False
-    else:
-        return True
-
-
-def hexStringToHex(hexString: str) -> int:
-    return int(hexString, 16)
+# Exported fields of the `apduLen` bytes command of the given case.
+def getCommandRecord(apduBytes, apduLen, case, instructions):
+    cla = apduBytes[0]
+    ins = apduBytes[1]
+    record = {
+        'raw': toHex(apduBytes[:apduLen]),
+        'case': case,
+        'cla': HEX[cla],
+        'ins': HEX[ins],
+        'instruction': decodeINS(ins, cla, instructions),
+        'p1': HEX[apduBytes[2]],
+        'p2': HEX[apduBytes[3]]
+    }
+    if case == '3S' or case == '4S':
+        lc = apduBytes[4]
+        record['lc'] = lc
+        record['data'] = toHex(apduBytes[5:5 + lc])
+    elif case == '3E' or case == '4E':
+        lc = apduBytes[5] << 8 | apduBytes[6]
+        record['lc'] = lc
+        record['data'] = toHex(apduBytes[7:7 + lc])
+    if case[0] == '2' or case[0] == '4':
+        record['le'] = getExpectedAnswerLength(apduBytes, apduLen, case) - 2
+    return record
+
+
+# Exported fields of the answer stored from index `start` to `end` (excluded).
+def getAnswerRecord(answerBytes, start, end, turnaround, response=None):
+    record = {'raw': toHex(answerBytes[start:end])}
+    if end - start >= 2:
+        sw1 = answerBytes[end - 2]
+        sw2 = answerBytes[end - 1]
+        record['data'] = toHex(answerBytes[start:end - 2])
+        record['sw'] = HEX[sw1] + HEX[sw2]
+        record['status'] = decodeSW(sw1, sw2)
+    record['turnaround_ns'] = turnaround
+    if response is not None:
+        record['response_ns'] = response
+    return record
+
+
+# Append the frames of the answer stored from index `start` to `end` (excluded) to `outputFrames`: its data, then
+# SW1-SW2, carrying the `turnaround` time of the card if it is known, and with T=0 the `response` time from the
+# procedure byte to the answer. The data answering an `ins` of TLV_INSTRUCTIONS is shown as BER-TLV objects, other
+# data byte by byte.
+def appendAnswerFrames(outputFrames, answerBytes, framesFromAnswer, start, end, turnaround=None, ins=None,
+                       response=None):
+    if ins in TLV_INSTRUCTIONS and end - start > 2:
+        start = appendTLVFrames(outputFrames, answerBytes, framesFromAnswer, start, end - 2)
+    for i in range(start, end - 2):
+        outputFrames.append(APDU_Frame('APDU Ans', 'ANSWER DATA', None, answerBytes[i], framesFromAnswer[i]))
+    if end - start >= 2:
+        sw1Frame = framesFromAnswer[end - 2]
+        sw2Frame = framesFromAnswer[end - 1]
+
+        frame = decodeSWAndGenerateFrame(sw1Frame, sw2Frame, answerBytes[end - 2], answerBytes[end - 1])
+        frame.turnaround = turnaround
+        frame.response = response
+        outputFrames.append(frame)
+
+
+# Append one frame per BER-TLV object of the data stored from index `start` to `end` (excluded), and one per byte
+# between them (padding). Return the index of the first byte that is not part of a complete object.
+def appendTLVFrames(outputFrames, answerBytes, framesFromAnswer, start, end):
+    objects, stop = parseTLV(answerBytes, start, end)
+    shown = start
+    for tlv in objects:
+        for i in range(shown, tlv.start):
+            outputFrames.append(APDU_Frame('APDU Ans', 'ANSWER DATA', None, answerBytes[i], framesFromAnswer[i]))
+        tag = '{:02X}'.format(tlv.tag)
+        name = tlv.getTagName()
+        if name:
+            tag += ' ' + name
+        if tlv.constructed:
+            shown = tlv.valueStart
+            data = '{} ({} bytes)'.format(tag, tlv.end - tlv.valueStart)
+        else:
+            shown = tlv.end
+            data = tag + ': ' + toHex(answerBytes[tlv.valueStart:shown])
+        outputFrames.append(Raw_Frame('APDU Ans', 'TLV', data, bytes(answerBytes[tlv.start:shown]),
+                                      framesFromAnswer[tlv.start], framesFromAnswer[shown - 1]))
+    for i in range(shown, stop):
+        outputFrames.append(APDU_Frame('APDU Ans', 'ANSWER DATA', None, answerBytes[i], framesFromAnswer[i]))
+    return stop
 
 
 # SEE: https://cardwerk.com/smart-card-standard-iso7816-4-section-5-basic-organizations/ part 5.4.1
-def decodeCLA(hexString, binaryString):
-    hexValue = hexStringToHex(hexString)
+def decodeCLA(cla):
+    hexString = HEX[cla]
 
     # Structure and coding of command and response according to this part of ISO/IEC 7816
-    if hexString[0] == '0':
+    if cla <= 0x0F:
         readData = '0: Structure of command and response, '
-        decodeCLA_X(binaryString)
+        decodeCLA_X(cla)
 
     # RFU
-    elif 0x10 <= hexValue <= 0x7F:
+    elif 0x10 <= cla <= 0x7F:
         readData = 'RFU: {}'.format(hexString)
 
     # Structure of command and response according to this part of ISO/IEC 7816. Except for ‘X’ the coding and
     # meaning of command and response are proprietary.
-    elif 0x80 <= hexValue <= 0x9F:
-        readData = '{}: Structure of command and response, '.format(int(hexString[0]))
-        decodeCLA_X(binaryString)
+    elif 0x80 <= cla <= 0x9F:
+        readData = '{}: Structure of command and response, '.format(cla >> 4)
+        decodeCLA_X(cla)
 
     # Unless otherwise specified by the application context, structure and coding of command and response according
     # to this part of ISO/IEC 7816
-    elif hexString[0] == 'A':
+    elif 0xA0 <= cla <= 0xAF:
         readData = 'A: Structure and coding of command and response, '
-        decodeCLA_X(binaryString)
+        decodeCLA_X(cla)
 
     # Structure of command and response according to this part of ISO/IEC 7816
-    elif 0xB0 <= hexValue <= 0xCF:
+    elif 0xB0 <= cla <= 0xCF:
         readData = 'Structure of command and response: {}'.format(hexString)
 
     # Proprietary structure and coding of command and response
-    elif 0xD0 <= hexValue <= 0xFE:
+    elif 0xD0 <= cla <= 0xFE:
         readData = 'Proprietary structure and coding of command and response: {}'.format(hexString)
 
     # Reserved for PTS
@@ -1209,625 +1831,70 @@ def decodeCLA(hexString, binaryString):
     return readData
 
 
-def decodeCLA_X(binaryString):
-    secureMessagingFormat = binaryString[4:6]
+def decodeCLA_X(cla):
+    secureMessagingFormat = cla >> 2 & 0x03
     readData = ''
 
     # No SM or no SM indication
-    if secureMessagingFormat == '00':
+    if secureMessagingFormat == 0b00:
         readData += 'No SM or no SM indication.'
     # Proprietary SM format
-    elif secureMessagingFormat == '01':
+    elif secureMessagingFormat == 0b01:
         readData += 'Proprietary SM format.'
 
     # Command header not authenticated
-    elif secureMessagingFormat == '10':
+    elif secureMessagingFormat == 0b10:
         readData += 'Command header not authenticated.'
     # Command header authenticated
-    elif secureMessagingFormat == '11':
+    elif secureMessagingFormat == 0b11:
         readData += 'Command header authenticated.'
 
-    logicalChannelNumber = binaryString[6:8]
+    logicalChannelNumber = cla & 0x03
 
     readData += ' Logical Channel Number: {}'.format(logicalChannelNumber)
 
     return readData
 
 
-# SEE: https://cardwerk.com/smart-card-standard-iso7816-4-section-5-basic-organizations/ part 5.4.2
-def decodeINS(hexString, binaryString, cla):
-    readData = ''
-
-    if cla is 'FF':
-        if hexString is '82':
-            readData = 'LOAD KEY'
-        elif hexString is '86':
-            readData = 'GENERAL AUTHENTICATE'
-        elif hexString is 'B0':
-            readData = 'READ BINARY'
-        elif hexString is 'B4':
-            readData = 'GET CHALLENGE'
-        elif hexString is 'CA':
-            readData = 'GET DATA'
-        elif hexString is 'D6':
-            readData = 'UPDATE BINARY'
-        elif hexString is 'F0':
-            readData = 'CONTROL'
-        elif hexString is 'F3':
-            readData = 'MIFARE CLASSIC READ'
-        elif hexString is 'F4':
-            readData = 'MIFARE CLASSIC WRITE'
-        elif hexString is 'F5':
-            readData = 'MIFARE CLASSIC VALUE'
-        elif hexString is 'F6':
-            readData = 'RFID'
-        elif hexString is 'F7':
-            readData = 'HCE'
-        elif hexString is 'F9':
-            readData = 'SE'
-        elif hexString is 'FB':
-            readData = 'CT CONTROL'
-        elif hexString is 'FD':
-            readData = 'ECHO'
-        elif hexString is 'FE':
-            readData = 'ENCAPSULATE'
-        else:
-            readData = 'RFU'
-    else:
-        # Invalid INS codes
-        if binaryString[7] == '1' or binaryString[0:4] == '0110' or binaryString[0:4] == '1001':
-            readData += 'Invalid Code.'
-        else:
-            try:
-                instructionType = Constants.CONV_INS[hexString]
-            except:
-                instructionType = 'Unknown type : ' + hexString
-            readData += instructionType
-            print("Instruction:", instructionType)
-
-    return readData
-
-
-def decodeSWAndGenerateFrame(sw1Frame, sw2Frame, sw1Binary, sw2Binary):
-    sw1 = binaryToHex(sw1Binary)
-    sw2 = binaryToHex(sw2Binary)
-
-    readData = ''
-
-    # SEE: ISO7816_4 part 5.4.5
-    if sw1 == '61':
-        readData = 'Still ' + str(binaryToDecimal(sw2Binary)) + ' available octets.'
-    elif sw1 == '62':
-        readData = 'Memory unchanged. '
-        if sw2 == '00':
-            readData += 'No precisions.'
-        elif sw2 == '01':
-            readData += 'NV-Ram not changed 1.'
-        elif sw2 == '81':
-            readData += 'Part of returned data may be corrupted'
-        elif sw2 == '82':
-            readData += 'End of file/record reached before reading Le bytes.'
-        elif sw2 == '83':
-            readData += 'Selected file invalidated.'
-        elif sw2 == '84':
-            readData += 'Selected file is not valid. FCI not formated according to ISO'
-        elif sw2 == '85':
-            readData += 'No input data available from a sensor on the card. No Purse Engine enslaved for R3bc.'
-        elif sw2 == 'A2':
-            readData += 'Wrong R-MAC.'
-        elif sw2 == 'A4':
-            readData += 'Card locked (during reset( )).'
-        elif sw2 == 'CX':
-            readData += 'Counter with value x (command dependent).'
-        elif sw2 == 'F1':
-            readData += 'Wrong C-MAC.'
-        elif sw2 == 'F3':
-            readData += 'Internal reset.'
-        elif sw2 == 'F5':
-            readData += 'Default agent locked.'
-        elif sw2 == 'F7':
-            readData += 'Cardholder locked.'
-        elif sw2 == 'F8':
-            readData += 'Basement is current agent.'
-        elif sw2 == 'F9':
-            readData += 'CALC Key Set not unblocked.'
-        elif sw2[0] == 'F':
-            pass
-        else:
-            readData += 'RFU.'
-    elif sw1 == '63':
-        readData = 'Memory changed. '
-        if sw2 == '00':
-            readData += 'No precisions.'
-        elif sw2 == '81':
-            readData += 'File filled up by the last write. Loading/updating is not allowed.'
-        elif sw2 == '82':
-            readData += 'Card key not supported.'
-        elif sw2 == '83':
-            readData += 'Reader key not supported.'
-        elif sw2 == '84':
-            readData += 'Plaintext transmission not supported.'
-        elif sw2 == '85':
-            readData += 'Secured transmission not supported.'
-        elif sw2 == '86':
-            readData += 'Volatile memory is not available.'
-        elif sw2 == '87':
-            readData += 'Non-volatile memory is not available.'
-        elif sw2 == '88':
-            readData += 'Key number not valid.'
-        elif sw2 == '89':
-            readData += 'Key length is not correct.'
-        elif sw2 == 'C0':
-            readData += 'Verify fail, no try left.'
-        elif sw2 == 'C1':
-            readData += 'Verify fail, 1 try left.'
-        elif sw2 == 'C2':
-            readData += 'Verify fail, 2 tries left.'
-        elif sw2 == 'C3':
-            readData += 'Verify fail, 3 tries left.'
-        elif sw2[0] == 'C':
-            ##
-            readData += 'The counter has reached the value ' + str(hexStringToDecimal(sw2[1])) + '.'
-        elif sw2 == 'F1':
-            readData += 'More data expected.'
-        elif sw2 == 'F2':
-            readData += 'More data expected and proactive command pending.'
-        elif sw2[0] == 'F':
-            readData += ''
-        else:
-            readData += 'RFU'
-    elif sw1 == '64':
-        readData = 'Memory unchanged. '
-        if sw2 == '00':
-            readData += 'No information given (NV-Ram not changed).'
-        elif sw2 == '01':
-            readData += 'Command timeout. Immediate response required by the card.'
-        else:
-            readData += 'RFU.'
-    elif sw1 == '65':
-        readData = 'Memory changed. '
-        if sw2 == '00':
-            readData += 'No precisions.'
-        elif sw2 == '01':
-            readData += 'Write error. Memory failure. There have been problems in writing or reading the EEPROM. ' \
-                        'Other hardware problems may also bring this error.'
-
-        elif sw2 == '81':
-            readData += 'Memory failure.'
-        elif sw2[0] == 'F':
-            pass
-        else:
-            readData += 'RFU.'
-    elif sw1 == '66':
-        if sw2 == '00':
-            readData += 'Error while receiving (timeout)'
-        elif sw2 == '01':
-            readData += 'Error while receiving (character parity error'
-        elif sw2 == '02':
-            readData += 'Wrong checksum'
-        elif sw2 == '03':
-            readData += 'The current DF file without FCI'
-        elif sw2 == '04':
-            readData += 'No SF or KF under the current DF'
-        elif sw2 == '69':
-            readData += 'Incorrect Encryption/Decryption Padding'
-        else:
-            pass
-    elif sw1 == '67':
-        readData = 'Incorrect length.'
-    elif sw1 == '68':
-        readData = 'CLA not assumed. '
-        if sw2 == '00':
-            readData += 'No precisions.'
-        elif sw2 == '81':
-            readData += 'Logical channel not supported.'
-        elif sw2 == '82':
-            readData += 'Secure messaging not supported.'
-        elif sw2 == '83':
-            readData += 'Last command of the chain expected.'
-        elif sw2 == '84':
-            readData += 'Command chaining not supported.'
-        elif sw2[0] == 'F':
-            pass
-        else:
-            readData += 'RFU.'
-    elif sw1 == '69':
-        readData = 'Command not allowed. '
-        if sw2 == '00':
-            readData += 'No precisions.'
-        elif sw2 == '01':
-            readData += 'Command not accepted (inactive state).'
-        elif sw2 == '81':
-            readData += 'Incompatibility with file structure.'
-        elif sw2 == '82':
-            readData += 'Security condition not satisfied.'
-        elif sw2 == '83':
-            readData += 'Authentication method blocked.'
-        elif sw2 == '84':
-            readData += 'Referenced data reversibly blocked (invalidated).'
-        elif sw2 == '85':
-            readData += 'Conditions of use not satisfied.'
-        elif sw2 == '86':
-            readData += 'Command not allowed (no current EF).'
-        elif sw2 == '87':
-            readData += 'Expected secure messaging (SM) object missing.'
-        elif sw2 == '88':
-            readData += 'Incorrect secure messaging (SM) data object'
-        elif sw2 == '8D':
-            readData += 'Reserved.'
-        elif sw2 == '96':
-            readData += 'Data must be updated again.'
-        elif sw2 == 'E1':
-            readData += 'POL1 of the currently Enabled Profile prevents this action.'
-        elif sw2 == 'F0':
-            readData += 'Permission Denied.'
-        elif sw2 == 'F1':
-            readData += 'Permission Denied – Missing Privilege'
-        elif sw2[0] == 'F':
-            pass
-        else:
-            readData += 'RFU.'
-
-    elif sw1 == '6A':
-        readData = 'P1-P2 incorrect. '
-        if sw2 == '00':
-            readData += 'No precisions.'
-        elif sw2 == '80':
-            readData += 'The parameters in the data field are incorrect..'
-        elif sw2 == '81':
-            readData += 'Function not supported.'
-        elif sw2 == '82':
-            readData += 'File not found.'
-        elif sw2 == '83':
-            readData += 'Record not found.'
-        elif sw2 == '84':
-            readData += 'Not enough memory in record or file.'
-        elif sw2 == '85':
-            readData += 'Lc inconsistent with TLV structure.'
-        elif sw2 == '86':
-            readData += 'P1-P2 incorrect.'
-        elif sw2 == '87':
-            readData += 'Lc inconsistent with P1-P2.'
-        elif sw2 == '88':
-            readData += 'Reference data not found.'
-        elif sw2 == '89':
-            readData += 'File already exists'
-        elif sw2 == '8A':
-            readData += 'DF name already exists.'
-        elif sw2 == 'F0':
-            readData += 'Wrong parameter value'
-        elif sw2[0] == 'F':
-            pass
-        else:
-            readData += 'RFU.'
+# Output frames of `previous` followed by those of `out`, each being None, a frame or a list of frames.
+def joinOutput(previous, out):
+    if previous is None:
+        return out
+    if out is None:
+        return previous
+    if not isinstance(previous, list):
+        previous = [previous]
+    if isinstance(out, list):
+        return previous + out
+    return previous + [out]
 
-    elif sw1 == '6B':
-        if sw2 == '00':
-            readData = 'P1-P2 incorrect.'
-        else:
-            readData = 'Reference incorrect (procedure byte).'
-    elif sw1 == '6C':
-        if sw2 == '00':
-            readData = 'Incorrect P3 length..'
-        else:
-            readData = 'Wrong Le. Correct : ' + str(binaryToDecimal(sw2Binary)) + '.'
-    elif sw1 == '6D':
-        if sw2 == '00':
-            readData = 'INS not supported or valid.'
-        else:
-            readData = 'INS not programmed or valid.'
-    elif sw1 == '6E':
-        readData = 'CLA incorrect.'
-    elif sw1 == '6F':
-        if sw2 == '00':
-            readData = 'Command aborted – more exact diagnosis not possible.'
-        elif sw2 == 'FF':
-            readData = 'Card dead.'
-        else:
-            readData = 'No precise diagnosis.'
-    elif sw1 == '90':
-        if sw2 == '00':
-            readData = 'Command successfully executed '
-        elif sw2 == '04':
-            readData = 'PIN not successfully verified, 3 or more PIN tries left.'
-        elif sw2 == '08':
-            readData = 'Key/file not found.'
-        elif sw2 == '80':
-            readData = 'Unblock Try Counter has reached zero.'
-        else:
-            readData = 'RFU.'
-
-    elif sw1 == '91':
-        if sw2 == '00':
-            readData = 'OK'
-        elif sw2 == '01':
-            readData = 'States.activity, States.lock Status or States.lockable has wrong value'
-        elif sw2 == '02':
-            readData = 'Transaction number reached its limit'
-        elif sw2 == '0C':
-            readData = 'No changes'
-        elif sw2 == '0E':
-            readData = 'Insufficient NV-Memory to complete command'
-        elif sw2 == '1C':
-            readData = 'Command code not supported'
-        elif sw2 == '1E':
-            readData = 'CRC or MAC does not match data'
-        elif sw2 == '40':
-            readData = 'Invalid key number specified'
-        elif sw2 == '7E':
-            readData = 'Length of command string invalid'
-        elif sw2 == '9D':
-            readData = 'Not allow the requested command'
-        elif sw2 == '9E':
-            readData = 'Value of the parameter invalid'
-        elif sw2 == 'A0':
-            readData = 'Requested AID not present on PICC'
-        elif sw2 == 'A1':
-            readData = 'Unrecoverable error within application'
-        elif sw2 == 'AE':
-            readData = 'Authentication status does not allow the requested command'
-        elif sw2 == 'AF':
-            readData = 'Additional data frame is expected to be sent'
-        elif sw2 == 'BE':
-            readData = 'Out of boundary'
-        elif sw2 == 'C1':
-            readData = 'Unrecoverable error within PICC'
-        elif sw2 == 'CA':
-            readData = 'Previous Command was not fully completed'
-        elif sw2 == 'CD':
-            readData = 'PICC was disabled by an unrecoverable error'
-        elif sw2 == 'CE':
-            readData = 'Number of Applications limited to 28'
-        elif sw2 == 'DE':
-            readData = 'File or application already exists '
-        elif sw2 == 'EE':
-            readData = 'Could not complete NV-write operation due to loss of power'
-        elif sw2 == 'F0':
-            readData = 'Specified file number does not exist'
-        elif sw2 == 'F1':
-            readData = 'Unrecoverable error within file'
-        else:
-            readData = 'RFU.'
-
-    elif sw1 == '92':
-        if sw2[0] == 0:
-            readData = 'Writing to EEPROM successful after ' + str(hexStringToDecimal(sw2[1])) + ' attempts.'
-        elif sw2 == '10':
-            readData = 'Insufficient memory. No more storage available.'
-        elif sw2 == '40':
-            readData = 'Writing to EEPROM not successful.'
-        else:
-            readData = 'RFU.'
-    elif sw1 == '93':
-        if sw2 == '01':
-            readData = 'Integrity error.'
-        elif sw2 == '02':
-            readData = 'Candidate S2 invalid.'
-        elif sw2 == '03':
-            readData = 'Application is permanently locked.'
-        else:
-            readData = 'RUF.'
-
-    elif sw1 == '94':
-        if sw2 == '00':
-            readData = 'No EF selected.'
-        elif sw2 == '01':
-            readData = 'Candidate currency code does not match purse currency'
-        elif sw2 == '02':
-            readData = 'Address range exceeded.'
-        elif sw2 == '03':
-            readData = 'Candidate amount too low'
-        elif sw2 == '04':
-            readData = 'FID not found, record not found or comparison pattern not found.'
-        elif sw2 == '05':
-            readData = 'Problems in the data field.'
-        elif sw2 == '06':
-            readData = 'Required MAC unavailable'
-        elif sw2 == '07':
-            readData = 'Bad currency : purse engine has no slot with R3bc currency'
-        elif sw2 == '08':
-            readData = 'Selected file type does not match command.'
-        else:
-            readData = 'RUF.'
-
-    elif sw1 + sw2 == '9500':
-        readData = 'Bad sequence.'
-    elif sw1 + sw2 == '9680':
-        readData = 'Slave not found.'
-    elif sw1 == '97':
-        if sw2 == '00':
-            readData = 'PIN blocked and Unblock Try Counter is 1 or 2.'
-        elif sw2 == '02':
-            readData = 'Main keys are blocked.'
-        elif sw2 == '04':
-            readData = 'PIN not successfully verified, 3 or more PIN tries left.'
-        elif sw2 == '84':
-            readData = 'Base key.'
-        elif sw2 == '85':
-            readData = 'Limit exceeded – C-MAC key.'
-        elif sw2 == '86':
-            readData = 'SM error – Limit exceeded – R-MAC key.'
-        elif sw2 == '87':
-            readData = 'Limit exceeded – sequence counter.'
-        elif sw2 == '88':
-            readData = 'Limit exceeded – R-MAC length.'
-        elif sw2 == '89':
-            readData = 'Service not available.'
-        else:
-            readData = 'RUF.'
-    elif sw1 == '98':
-        if sw2 == '02':
-            readData = 'No PIN defined.'
-        elif sw2 == '04':
-            readData = 'Access conditions not satisfied, authentication failed.'
-        elif sw2 == '35':
-            readData = 'ASK RANDOM or GIVE RANDOM not executed.'
-        elif sw2 == '40':
-            readData = 'PIN verification not successful.'
-        elif sw2 == '50':
-            readData = 'INCREASE or DECREASE could not be executed because a limit has been reached.'
-        elif sw2 == '62':
-            readData = 'Authentication Error, application specific (incorrect MAC)'
-        else:
-            readData = 'RUF.'
-    elif sw1 == '99':
-        if sw2 == '00':
-            readData = '1 PIN try left'
-        elif sw2 == '04':
-            readData = 'PIN not successfully verified, 1 PIN try left'
-        elif sw2 == '85':
-            readData = 'Wrong status – Cardholder lock'
-        elif sw2 == '86':
-            readData = 'Missing privilege'
-        elif sw2 == '87':
-            readData = 'PIN is not installed'
-        elif sw2 == '88':
-            readData = 'Wrong status – R-MAC state'
-        else:
-            readData = 'RUF.'
-    elif sw1 == '9A':
-        if sw2 == '00':
-            readData = '2 PIN try left'
-        elif sw2 == '04':
-            readData = 'PIN not succesfully verified, 2 PIN try left'
-        elif sw2 == '71':
-            readData = 'Wrong parameter value – Double agent AID'
-        elif sw2 == '72':
-            readData = 'Wrong parameter value – Double agent Type'
-        else:
-            readData = 'RUF.'
-
-    elif sw1 == '9D':
-        if sw2 == '05':
-            readData = 'Incorrect certificate type'
-        elif sw2 == '07':
-            readData = 'Incorrect session data size'
-        elif sw2 == '08':
-            readData = 'Incorrect DIR file record size'
-        elif sw2 == '09':
-            readData = 'Incorrect FCI record size'
-        elif sw2 == '0A':
-            readData = 'Incorrect code size'
-        elif sw2 == '10':
-            readData = 'Insufficient memory to load application'
-        elif sw2 == '11':
-            readData = 'Invalid AID'
-        elif sw2 == '12':
-            readData = 'Duplicate AID'
-        elif sw2 == '13':
-            readData = 'Application previously loaded'
-        elif sw2 == '14':
-            readData = 'Application history list full'
-        elif sw2 == '15':
-            readData = 'Application not open'
-        elif sw2 == '17':
-            readData = 'Invalid offset'
-        elif sw2 == '18':
-            readData = 'Application already loaded'
-        elif sw2 == '19':
-            readData = 'Invalid certificate'
-        elif sw2 == '1A':
-            readData = 'Invalid signature'
-        elif sw2 == '1B':
-            readData = 'Invalid KTU'
-        elif sw2 == '1D':
-            readData = 'MSM controls not set'
-        elif sw2 == '1E':
-            readData = 'Application signature does not exist'
-        elif sw2 == '1F':
-            readData = 'KTU does not exist'
-        elif sw2 == '20':
-            readData = 'Application not loaded'
-        elif sw2 == '21':
-            readData = 'Invalid Open command data length'
-        elif sw2 == '30':
-            readData = 'Check data parameter is incorrect (invalid start address)'
-        elif sw2 == '31':
-            readData = 'Check data parameter is incorrect (invalid length)'
-        elif sw2 == '32':
-            readData = 'Check data parameter is incorrect (illegal memory check area)'
-        elif sw2 == '40':
-            readData = 'Invalid MSM Controls ciphertext'
-        elif sw2 == '41':
-            readData = 'MSM controls already set'
-        elif sw2 == '42':
-            readData = 'Set MSM Controls data length less than 2 bytes'
-        elif sw2 == '43':
-            readData = 'Invalid MSM Controls data length'
-        elif sw2 == '44':
-            readData = 'Excess MSM Controls ciphertext'
-        elif sw2 == '45':
-            readData = 'Verification of MSM Controls data failed'
-        elif sw2 == '50':
-            readData = 'Invalid MCD Issuer production ID'
-        elif sw2 == '51':
-            readData = 'Invalid MCD Issuer ID'
-        elif sw2 == '52':
-            readData = 'Invalid set MSM controls data date'
-        elif sw2 == '53':
-            readData = 'Invalid MCD number'
-        elif sw2 == '54':
-            readData = 'Reserved field error'
-        elif sw2 == '55':
-            readData = 'Reserved field error'
-        elif sw2 == '56':
-            readData = 'Reserved field error'
-        elif sw2 == '57':
-            readData = 'Reserved field error'
-        elif sw2 == '60':
-            readData = 'MAC verification failed'
-        elif sw2 == '61':
-            readData = 'Maximum number of unblocks reached'
-        elif sw2 == '62':
-            readData = 'Card was not blocked'
-        elif sw2 == '63':
-            readData = 'Crypto functions not available'
-        elif sw2 == '64':
-            readData = 'No application loaded'
-        else:
-            readData = 'RUF.'
 
-    elif sw1 == '9E':
-        if sw2 == '00':
-            readData = 'PIN not installed'
-        elif sw2 == '04':
-            readData = 'PIN not successfully verified, PIN not installed'
-        else:
-            readData = 'RUF.'
+# FI and DI coded in TA(1) or PPS1 (SEE: iso7816_3 part 8.3, tables 7 and 8). An RFU value keeps the default one.
+def decodeFIDI(value):
+    FI = Constants.CONV_FI.get(value >> 4)
+    DI = Constants.CONV_DI.get(value & 0x0F)
+    if FI is None or DI is None:
+        logger.warning('RFU FI or DI in %s. Keeping the default values.', HEX[value])
+    return Constants.DEFAULT_Fi if FI is None else FI['Fi'], Constants.DEFAULT_Di if DI is None else DI
 
-    elif sw1 == '9F':
-        if sw2 == '00':
-            readData = 'PIN blocked and Unblock Try Counter is 3'
-        elif sw2 == '04':
-            readData = 'PIN not successfully verified, PIN blocked and Unblock Try Counter is 3'
-        else:
-            readData = 'Command successfully executed; ' + str(hexStringToDecimal(sw2)) + 'bytes of data are ' \
-                                                                                          'available and can be ' \
-                                                                                          'requested using GET ' \
-                                                                                          'RESPONSE.'
 
-    elif sw1[0] == '9':
-        readData = 'Application related status.'
+def decodeSWAndGenerateFrame(sw1Frame, sw2Frame, sw1Value, sw2Value):
+    readData = decodeSW(sw1Value, sw2Value)
 
-    frame = APDU_Frame('APDU Ans', 'SW1-SW2', readData, sw1 + sw2, sw1Frame, sw2Frame)
-    return frame.getOutputFrame()
+    return APDU_Frame('APDU Ans', 'SW1-SW2', readData, sw1Value << 8 | sw2Value, sw1Frame, sw2Frame)
 
 
-def decodePCBB_blocS_b5__b1(b5__b1: str) -> str:
+def decodePCBB_blocS_b5__b1(b5__b1: int) -> str:
     out = ''
-    if b5__b1 == '0000':
+    if b5__b1 == 0b0000:
         out = 'RESYNCH'
-    elif b5__b1 == '0001':
+    elif b5__b1 == 0b0001:
         out = 'IFS'
-    elif b5__b1 == '0010':
+    elif b5__b1 == 0b0010:
         out = 'ABORT'
-    elif b5__b1 == '0011':
+    elif b5__b1 == 0b0011:
         out = 'WTX'
     else:
         out = 'RUF'
 
     return out
-
-
-def hexStringToDecimal(hexString: str) -> int:
-    return int(hexString, 16)
@@ -0,0 +1,194 @@
+# Names of the instructions (INS) of the APDU commands, from pluggable tables: ISO 7816-4 for the interindustry
+# commands, PC/SC part 3 for the pseudo-APDUs of the readers, GlobalPlatform for card managers and ETSI TS 102 221
+# for UICCs.
+#
+# A registry names every (class of CLA, INS) pair of an instruction set, so that decoding an INS is a single lookup.
+# Registries are built once, when the module is loaded.
+from Constants import HEX
+
+# Classes of CLA (SEE: iso7816_4 part 5.4.1). 'FF' is invalid for the card: PC/SC readers use it for their own
+# commands.
+INTERINDUSTRY = 'interindustry'
+PROPRIETARY = 'proprietary'
+PCSC = 'PC/SC'
+
+# CLA -> class
+CLA_CLASS = tuple(PCSC if cla == 0xFF else PROPRIETARY if cla & 0x80 else INTERINDUSTRY for cla in range(256))
+
+# SEE: https://cardwerk.com/smart-card-standard-iso7816-4-section-5-basic-organizations/ part 5.4.2
+ISO_7816_4_COMMANDS = {
+    0x0E: 'ERASE BINARY',
+    0x20: 'VERIFY',
+    0x70: 'MANAGE CHANNEL',
+    0x82: 'EXTERNAL AUTHENTICATE',
+    0x84: 'GET CHALLENGE',
+    0x88: 'INTERNAL AUTHENTICATE',
+    0xA4: 'SELECT FILE',
+    0xB0: 'READ BINARY',
+    0xB2: 'READ RECORD(S)',
+    0xC0: 'GET RESPONSE',
+    0xC2: 'ENVELOPE',
+    0xCA: 'GET DATA',
+    0xD0: 'WRITE BINARY',
+    0xD2: 'WRITE RECORD',
+    0xD6: 'UPDATE BINARY',
+    0xDA: 'PUT DATA',
+    0xDC: 'UPDATE DATA',
+    0xE2: 'APPEND RECORD',
+}
+
+# The other commands of ISO 7816-4, left out of the default set so that the names of the decoded captures do not
+# change.
+ISO_7816_4_OTHER_COMMANDS = {
+    0x04: 'DEACTIVATE FILE',
+    0x0C: 'ERASE RECORD(S)',
+    0x10: 'PERFORM SCQL OPERATION',
+    0x12: 'PERFORM TRANSACTION OPERATION',
+    0x14: 'PERFORM USER OPERATION',
+    0x22: 'MANAGE SECURITY ENVIRONMENT',
+    0x24: 'CHANGE REFERENCE DATA',
+    0x26: 'DISABLE VERIFICATION REQUIREMENT',
+    0x28: 'ENABLE VERIFICATION REQUIREMENT',
+    0x2A: 'PERFORM SECURITY OPERATION',
+    0x2C: 'RESET RETRY COUNTER',
+    0x44: 'ACTIVATE FILE',
+    0x46: 'GENERATE ASYMMETRIC KEY PAIR',
+    0x86: 'GENERAL AUTHENTICATE',
+    0xA0: 'SEARCH BINARY',
+    0xA2: 'SEARCH RECORD',
+    0xE0: 'CREATE FILE',
+    0xE4: 'DELETE FILE',
+    0xE6: 'TERMINATE DF',
+    0xE8: 'TERMINATE EF',
+    0xFE: 'TERMINATE CARD USAGE',
+}
+
+# Tables: class of CLA -> {INS -> name}. Proprietary classes keep the structure of ISO 7816-4 commands.
+ISO_7816_4 = {
+    INTERINDUSTRY: ISO_7816_4_COMMANDS,
+    PROPRIETARY: ISO_7816_4_COMMANDS,
+}
+ISO_7816_4_OTHER = {
+    INTERINDUSTRY: ISO_7816_4_OTHER_COMMANDS,
+    PROPRIETARY: ISO_7816_4_OTHER_COMMANDS,
+}
+
+# SEE: PC/SC part 3, 3.2.2 (pseudo-APDUs of the reader)
+PCSC_PART_3 = {
+    PCSC: {
+        0x82: 'LOAD KEY',
+        0x86: 'GENERAL AUTHENTICATE',
+        0xB0: 'READ BINARY',
+        0xB4: 'GET CHALLENGE',
+        0xCA: 'GET DATA',
+        0xD6: 'UPDATE BINARY',
+        0xF0: 'CONTROL',
+        0xF3: 'MIFARE CLASSIC READ',
+        0xF4: 'MIFARE CLASSIC WRITE',
+        0xF5: 'MIFARE CLASSIC VALUE',
+        0xF6: 'RFID',
+        0xF7: 'HCE',
+        0xF9: 'SE',
+        0xFB: 'CT CONTROL',
+        0xFD: 'ECHO',
+        0xFE: 'ENCAPSULATE',
+    },
+}
+
+# SEE: GlobalPlatform Card Specification, 11 (APDU command reference)
+GLOBAL_PLATFORM = {
+    PROPRIETARY: {
+        0x2A: 'PERFORM SECURITY OPERATION',
+        0x50: 'INITIALIZE UPDATE',
+        0x78: 'END R-MAC SESSION',
+        0x7A: 'BEGIN R-MAC SESSION',
+        0x82: 'EXTERNAL AUTHENTICATE',
+        0x88: 'INTERNAL AUTHENTICATE',
+        0xCA: 'GET DATA',
+        0xCB: 'GET DATA',
+        0xD8: 'PUT KEY',
+        0xE2: 'STORE DATA',
+        0xE4: 'DELETE',
+        0xE6: 'INSTALL',
+        0xE8: 'LOAD',
+        0xF0: 'SET STATUS',
+        0xF2: 'GET STATUS',
+    },
+}
+
+# SEE: ETSI TS 102 221, 10.1.2 (coding of the instruction byte)
+ETSI_TS_102_221 = {
+    INTERINDUSTRY: {
+        0x20: 'VERIFY PIN',
+        0x24: 'CHANGE PIN',
+        0x26: 'DISABLE PIN',
+        0x28: 'ENABLE PIN',
+        0x2C: 'UNBLOCK PIN',
+        0x73: 'MANAGE SECURE CHANNEL',
+        0x75: 'TRANSACT DATA',
+        0x88: 'AUTHENTICATE',
+        0x89: 'AUTHENTICATE',
+        0xDC: 'UPDATE RECORD',
+    },
+    PROPRIETARY: {
+        0x10: 'TERMINAL PROFILE',
+        0x12: 'FETCH',
+        0x14: 'TERMINAL RESPONSE',
+        0x32: 'INCREASE',
+        0x76: 'SUSPEND UICC',
+        0xAA: 'TERMINAL CAPABILITY',
+        0xC2: 'ENVELOPE',
+        0xCB: 'RETRIEVE DATA',
+        0xDB: 'SET DATA',
+        0xF2: 'STATUS',
+    },
+}
+
+# Choices of the 'Instruction set' setting -> tables, each one taking over the names of the previous ones. The first
+# one is the default.
+INSTRUCTION_SETS = {
+    'ISO 7816-4': (ISO_7816_4, PCSC_PART_3),
+    'ISO 7816-4 (all commands)': (ISO_7816_4, ISO_7816_4_OTHER, PCSC_PART_3),
+    'GlobalPlatform': (ISO_7816_4, ISO_7816_4_OTHER, PCSC_PART_3, GLOBAL_PLATFORM),
+    'ETSI TS 102 221': (ISO_7816_4, ISO_7816_4_OTHER, PCSC_PART_3, ETSI_TS_102_221),
+}
+DEFAULT_INSTRUCTION_SET = 'ISO 7816-4'
+
+# INS of the commands whose data is sent by the card, per instruction set: with T=0, their P3 is Le, else it is Lc
+# (SEE: iso7816_3 part 10.3.2). Commands with data both ways are sent as commands with data for the card (case 3),
+# their answer being fetched with GET RESPONSE.
+ISO_7816_4_OUTGOING = frozenset((0x84, 0xB0, 0xB2, 0xC0, 0xCA))
+OUTGOING_INSTRUCTIONS = {
+    'ISO 7816-4': ISO_7816_4_OUTGOING,
+    'ISO 7816-4 (all commands)': ISO_7816_4_OUTGOING,
+    'GlobalPlatform': ISO_7816_4_OUTGOING,
+    'ETSI TS 102 221': ISO_7816_4_OUTGOING | {0x12, 0xF2},
+}
+
+
+# Name of an INS found in no table: odd INS and '6X', '9X' (procedure bytes of T=0) are invalid.
+def getDefaultName(claClass, ins):
+    if claClass == PCSC:
+        return 'RFU'
+    if ins & 0x01 or ins >> 4 == 0x6 or ins >> 4 == 0x9:
+        return 'Invalid Code.'
+    return 'Unknown type : ' + HEX[ins]
+
+
+# (class of CLA, INS) -> name, for every class and INS.
+def buildRegistry(tables):
+    registry = {(claClass, ins): getDefaultName(claClass, ins)
+                for claClass in (INTERINDUSTRY, PROPRIETARY, PCSC) for ins in range(256)}
+    for table in tables:
+        for claClass, names in table.items():
+            for ins, name in names.items():
+                registry[claClass, ins] = name
+    return registry
+
+
+REGISTRIES = {name: buildRegistry(tables) for name, tables in INSTRUCTION_SETS.items()}
+
+
+# Name of the instruction `ins` sent with the class `cla`, in `registry`.
+def decodeINS(ins, cla, registry=REGISTRIES[DEFAULT_INSTRUCTION_SET]):
+    return registry[CLA_CLASS[cla], ins]
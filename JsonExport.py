@@ -0,0 +1,87 @@
+# Streaming export of the decoded units (ATR, PPS, APDU, T=1 block) as JSON lines, one object per line.
+#
+# Records are written as soon as a unit is decoded, through a buffered file flushed every few records: a capture of
+# any size is exported without keeping its records in memory, and the file follows Logic 2 while it decodes.
+import atexit
+import json
+import os
+
+from Timing import toNanoseconds
+
+# Size of the write buffer of the export file
+EXPORT_BUFFER_SIZE = 1 << 20
+# The buffer is flushed once this many records, or characters, were written since the last flush
+FLUSH_RECORDS = 256
+FLUSH_SIZE = 1 << 16
+
+# Path -> exporter writing into it. Logic 2 creates a new analyzer each time the capture is decoded again or a
+# setting changes: the new one takes over the file of the previous one.
+EXPORTERS = {}
+
+
+# Upper case hex string of `data` (bytes, bytearray or memoryview).
+def toHex(data):
+    return bytes(data).hex().upper()
+
+
+class JsonlExporter:
+
+    def __init__(self, outputFile):
+        self.outputFile = outputFile
+        # Times are exported in nanoseconds from the start of the first record
+        self.origin = None
+        self.encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        # Session of the capture the records belong to, set by the analyzer at each new ATR
+        self.session = 1
+        # Records and characters written since the last flush
+        self.pendingRecords = 0
+        self.pendingSize = 0
+
+    # Write `record`, decoded from the characters of `startFrame` to `endFrame`.
+    def write(self, record, startFrame, endFrame):
+        if self.outputFile.closed:
+            # A newer analyzer took over the file
+            return
+        if self.origin is None:
+            self.origin = startFrame.start_time
+        record['session'] = self.session
+        record['start_ns'] = toNanoseconds(startFrame.start_time, self.origin)
+        record['end_ns'] = toNanoseconds(endFrame.end_time, self.origin)
+        line = self.encoder.encode(record) + '\n'
+        self.outputFile.write(line)
+        self.pendingRecords += 1
+        self.pendingSize += len(line)
+        if self.pendingRecords >= FLUSH_RECORDS or self.pendingSize >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.outputFile.closed:
+            self.outputFile.flush()
+        self.pendingRecords = 0
+        self.pendingSize = 0
+
+    def close(self):
+        if not self.outputFile.closed:
+            self.flush()
+            self.outputFile.close()
+
+
+# Exporter writing into `fileName`. The exporter previously writing into it is closed first, and the last one is
+# closed when the process exits.
+def openExporter(fileName):
+    path = os.path.abspath(fileName)
+    previous = EXPORTERS.pop(path, None)
+    if previous is not None:
+        previous.close()
+    exporter = JsonlExporter(open(path, 'w', buffering=EXPORT_BUFFER_SIZE, encoding='utf-8'))
+    EXPORTERS[path] = exporter
+    return exporter
+
+
+def closeExporters():
+    for exporter in EXPORTERS.values():
+        exporter.close()
+    EXPORTERS.clear()
+
+
+atexit.register(closeExporters)
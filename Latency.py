@@ -0,0 +1,91 @@
+# Command to answer turnaround times of the decoded APDUs, per instruction (class of CLA and INS), in fixed-size
+# logarithmic histograms.
+from array import array
+import csv
+
+# Bucket 0 counts the null times, bucket i the times from 2 ** (i - 1) to 2 ** i ns (excluded). The last bucket also
+# counts every longer time (more than 4 minutes).
+BUCKET_COUNT = 40
+PERCENTILES = (50, 90, 99)
+
+
+# Upper bound, in nanoseconds, of the times counted by bucket `index`.
+def getBucketLimit(index):
+    return 1 << index
+
+
+# Add `time`, in nanoseconds, to the histogram of the instruction `key` in `buckets` and its statistics in `stats`.
+def addTime(buckets, stats, key, time):
+    time = max(time, 0)
+    counts = buckets.get(key)
+    if counts is None:
+        counts = buckets[key] = array('q', bytes(8 * BUCKET_COUNT))
+        stats[key] = [0, 0, time, time]
+    counts[min(time.bit_length(), BUCKET_COUNT - 1)] += 1
+
+    timeStats = stats[key]
+    timeStats[0] += 1
+    timeStats[1] += time
+    if time < timeStats[2]:
+        timeStats[2] = time
+    if time > timeStats[3]:
+        timeStats[3] = time
+
+
+# Upper bound of the `percentile`-th percentile of the times counted in `counts`: the limit of its bucket, or the
+# longest time `maximum` if it is shorter.
+def getPercentile(counts, maximum, percentile):
+    threshold = sum(counts) * percentile / 100
+    seen = 0
+    for index, bucketCount in enumerate(counts):
+        seen += bucketCount
+        if bucketCount and seen >= threshold:
+            return min(getBucketLimit(index), maximum)
+    return maximum
+
+
+# Histograms of the turnaround times, one per instruction seen in the capture. The same INS can name different
+# commands in the interindustry and proprietary classes: an instruction is a (class of CLA, INS) pair. With T=0,
+# the time from the procedure byte to the first character of the answer (data or SW1) is measured apart.
+class LatencyHistograms:
+
+    def __init__(self):
+        # Instruction -> counts of the BUCKET_COUNT buckets
+        self.buckets = {}
+        # Instruction -> [count, total, minimum, maximum], in nanoseconds
+        self.stats = {}
+        # The same, for the times from the procedure byte to the answer
+        self.responseBuckets = {}
+        self.responseStats = {}
+
+    # Record the `turnaround` of the card, and with T=0 its `response` time after the procedure byte if any.
+    def record(self, claClass, ins, turnaround, response=None):
+        key = (claClass, ins)
+        addTime(self.buckets, self.stats, key, turnaround)
+        if response is not None:
+            addTime(self.responseBuckets, self.responseStats, key, response)
+
+    def __len__(self):
+        return len(self.buckets)
+
+    # Write one CSV row per instruction: the statistics and percentiles (bucket upper bounds) of its turnaround times,
+    # then of its response times (empty without procedure byte), then the bucket counts of its turnaround times.
+    # `getName(claClass, ins)` gives the name of an instruction.
+    def writeCSV(self, outputFile, getName=None):
+        writer = csv.writer(outputFile)
+        timeFields = ['count', 'min_ns', 'mean_ns', 'max_ns'] + ['p{}_ns'.format(percentile)
+                                                                 for percentile in PERCENTILES]
+        writer.writerow(['class', 'ins', 'instruction'] + timeFields + ['response_' + field for field in timeFields] +
+                        ['lt_{}_ns'.format(getBucketLimit(index)) for index in range(BUCKET_COUNT - 1)] +
+                        ['ge_{}_ns'.format(getBucketLimit(BUCKET_COUNT - 2))])
+        for key in sorted(self.buckets):
+            claClass, ins = key
+            row = [claClass, '{:02X}'.format(ins), getName(claClass, ins) if getName else '']
+            for buckets, stats in ((self.buckets, self.stats), (self.responseBuckets, self.responseStats)):
+                if key in stats:
+                    count, total, minimum, maximum = stats[key]
+                    row += [count, minimum, total // count, maximum]
+                    row += [getPercentile(buckets[key], maximum, percentile) for percentile in PERCENTILES]
+                else:
+                    row += [''] * len(timeFields)
+            writer.writerow(row + list(self.buckets[key]))
@@ -0,0 +1,37 @@
+# Leveled logging of the analyzer. Messages are formatted only when their level is enabled.
+import logging
+import sys
+
+# Choices of the 'Log level' setting, the first one being the default.
+LOG_LEVELS = {
+    'Off': logging.CRITICAL + 1,
+    'Error': logging.ERROR,
+    'Warning': logging.WARNING,
+    'Info': logging.INFO,
+    'Debug': logging.DEBUG,
+}
+DEFAULT_LOG_LEVEL = 'Off'
+
+logger = logging.getLogger('ISO7816_HLA')
+logger.setLevel(LOG_LEVELS[DEFAULT_LOG_LEVEL])
+logger.propagate = False
+
+
+# Set the level of the analyzer messages, and write them to `fileName`, or to the console (standard output) if it is
+# empty. The logger is shared: the last analyzer created sets it for all of them.
+def configureLogging(level=DEFAULT_LOG_LEVEL, fileName=''):
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    logger.setLevel(LOG_LEVELS[level])
+    if level == 'Off':
+        return
+
+    if fileName:
+        handler = logging.FileHandler(fileName)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+    logger.addHandler(handler)
@@ -0,0 +1,160 @@
+# Bounded storage of the characters of the message being decoded.
+from array import array
+
+from Timing import GraphTimeDelta, NS_PER_SECOND, toNanoseconds
+
+
+# Times of one stored character, built on demand in place of its input frame when an output frame is made.
+class CharacterFrame:
+    __slots__ = ('start_time', 'end_time')
+
+    def __init__(self, start_time, end_time):
+        self.start_time = start_time
+        self.end_time = end_time
+
+
+# Times of a sequence of characters, kept as two columns of integer nanoseconds from `origin` (the start of the first
+# character ever stored) instead of one input frame per character. Indexing gives a CharacterFrame, slicing gives
+# FrameColumns with the same origin.
+class FrameColumns:
+    __slots__ = ('origin', 'starts', 'ends')
+
+    def __init__(self, origin=None, starts=None, ends=None):
+        self.origin = origin
+        self.starts = array('q') if starts is None else starts
+        self.ends = array('q') if ends is None else ends
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return FrameColumns(self.origin, self.starts[index], self.ends[index])
+        # Timing.fromNanoseconds(), inlined: one call per character of the output frames
+        origin = self.origin
+        return CharacterFrame(origin + GraphTimeDelta(self.starts[index] / NS_PER_SECOND),
+                              origin + GraphTimeDelta(self.ends[index] / NS_PER_SECOND))
+
+    # Times of the characters at `indexes`, in this order.
+    def select(self, indexes):
+        starts = self.starts
+        ends = self.ends
+        return FrameColumns(self.origin, array('q', [starts[i] for i in indexes]),
+                            array('q', [ends[i] for i in indexes]))
+
+    def __iadd__(self, other):
+        if self.origin is None:
+            self.origin = other.origin
+        self.starts += other.starts
+        self.ends += other.ends
+        return self
+
+    def clear(self):
+        del self.starts[:]
+        del self.ends[:]
+
+
+# Ring buffer of the byte values and times of the current message, holding at most `capacity` characters: 17 bytes
+# per character (value, start and end times), whatever the size of the input frames.
+# Once it is full, each new character overwrites the oldest one: memory stays bounded whatever the capture contains.
+class MessageBuffer:
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.values = bytearray(capacity)
+        # Times of the characters, grown up to the capacity on first use, then reused
+        self.frames = FrameColumns()
+        self.allocated = 0
+        # Times of the last character stored, in nanoseconds from the origin of `frames`
+        self.lastStart = None
+        self.lastEnd = None
+        # Index of the oldest character. Only moves when the buffer is full, so it is 0 until an overflow.
+        self.start = 0
+        self.length = 0
+        # Number of characters overwritten since the last clear
+        self.dropped = 0
+
+    def __len__(self):
+        return self.length
+
+    def getIndex(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('message index out of range')
+        return (self.start + index) % self.capacity
+
+    # Logic 2 `time` in nanoseconds from the origin of `frames`.
+    def getTime(self, time):
+        return toNanoseconds(time, self.frames.origin)
+
+    # Value of the `index`-th character of the message. Negative indexes count from the end.
+    def __getitem__(self, index):
+        return self.values[self.getIndex(index)]
+
+    # Times of the `index`-th character of the message, as a CharacterFrame.
+    def frame(self, index):
+        return self.frames[self.getIndex(index)]
+
+    # Store a character. Return True if the buffer was full and the oldest character was dropped.
+    def append(self, value, frame):
+        columns = self.frames
+        origin = columns.origin
+        if origin is None:
+            origin = columns.origin = frame.start_time
+        # Timing.toNanoseconds(), inlined: called for every character of the capture
+        start = round(float(frame.start_time - origin) * NS_PER_SECOND)
+        end = round(float(frame.end_time - origin) * NS_PER_SECOND)
+        self.lastStart = start
+        self.lastEnd = end
+
+        index = self.length
+        if index < self.capacity:
+            self.values[index] = value
+            if index < self.allocated:
+                columns.starts[index] = start
+                columns.ends[index] = end
+            else:
+                columns.starts.append(start)
+                columns.ends.append(end)
+                self.allocated += 1
+            self.length = index + 1
+            return False
+
+        index = self.start
+        self.values[index] = value
+        columns.starts[index] = start
+        columns.ends[index] = end
+        self.start = (index + 1) % self.capacity
+        self.dropped += 1
+        return True
+
+    # Remove the last character stored. The times of the last character received (lastStart, lastEnd) are kept.
+    def pop(self):
+        # New characters are stored after the last one only when the buffer starts at index 0
+        self.linearize()
+        self.length -= 1
+
+    def clear(self):
+        self.start = 0
+        self.length = 0
+        self.dropped = 0
+
+    # Move the oldest character back to the beginning of the buffer: `values` and `frames` can then be indexed
+    # directly from 0 to len(self) - 1.
+    def linearize(self):
+        if self.start:
+            start = self.start
+            columns = self.frames
+            self.values[:] = self.values[start:] + self.values[:start]
+            columns.starts[:] = columns.starts[start:] + columns.starts[:start]
+            columns.ends[:] = columns.ends[start:] + columns.ends[:start]
+            self.start = 0
+
+    # Contiguous memoryview on the values from `start` to `end` (default: the end of the message), for checksums
+    # and copies without going through each character.
+    def view(self, start=0, end=None):
+        self.linearize()
+        if end is None or end > self.length:
+            end = self.length
+        return memoryview(self.values)[start:end]
@@ -0,0 +1,74 @@
+# Lightweight stand-in for the `saleae.analyzers` module. It only provides what the analyzer needs to run outside
+# of Logic 2, for offline replay of exported captures.
+
+
+class SaleaeTimeDelta(float):
+    pass
+
+
+class SaleaeTime:
+    __slots__ = ('seconds',)
+
+    def __init__(self, seconds):
+        self.seconds = float(seconds)
+
+    def __sub__(self, other):
+        if isinstance(other, SaleaeTime):
+            return SaleaeTimeDelta(self.seconds - other.seconds)
+        return SaleaeTime(self.seconds - float(other))
+
+    def __add__(self, other):
+        return SaleaeTime(self.seconds + float(other))
+
+    def __eq__(self, other):
+        return isinstance(other, SaleaeTime) and self.seconds == other.seconds
+
+    def __lt__(self, other):
+        return self.seconds < other.seconds
+
+    def __le__(self, other):
+        return self.seconds <= other.seconds
+
+    def __hash__(self):
+        return hash(self.seconds)
+
+    def __float__(self):
+        return self.seconds
+
+    def __repr__(self):
+        return 'SaleaeTime({!r})'.format(self.seconds)
+
+    def __str__(self):
+        return '{:.9f}'.format(self.seconds)
+
+
+class AnalyzerFrame:
+    __slots__ = ('type', 'start_time', 'end_time', 'data')
+
+    def __init__(self, type: str, start_time: SaleaeTime, end_time: SaleaeTime, data: dict = None):
+        self.type = type
+        self.start_time = start_time
+        self.end_time = end_time
+        self.data = data if data is not None else {}
+
+
+class HighLevelAnalyzer:
+    pass
+
+
+class StringSetting:
+    def __init__(self, label: str = ''):
+        self.label = label
+
+
+class NumberSetting:
+    def __init__(self, label: str = '', min_value=None, max_value=None):
+        self.label = label
+        self.min_value = min_value
+        self.max_value = max_value
+
+
+class ChoicesSetting:
+    def __init__(self, choices, label: str = ''):
+        self.choices = tuple(choices)
+        self.label = label
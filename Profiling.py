@@ -0,0 +1,120 @@
+# Opt-in profiling of the decoder: calls, time and allocations per handler and per decode table lookup.
+#
+# Nothing is instrumented until profiling is enabled, so that it costs nothing otherwise. Once enabled, the profiled
+# functions are replaced by counting wrappers for the whole process: like the logger, the profiler is shared by every
+# analyzer. The statistics are saved in the pstats format (python -m pstats FILE, snakeviz, flameprof...), with a
+# text report next to them adding the allocations.
+import atexit
+import marshal
+import sys
+import time
+
+PROFILE_ENVIRONMENT_VARIABLE = 'ISO7816_HLA_PROFILE'
+REPORT_SUFFIX = '.txt'
+
+
+# Counters of the profiled functions, keyed like cProfile: (file name, first line, function name).
+class Profiler:
+
+    def __init__(self):
+        self.fileName = None
+        # Key -> [calls, own time, cumulative time, allocated blocks, {caller key -> [calls, own time, cumulative time]}]
+        self.stats = {}
+        # [key, time spent in the profiled functions it called] of the running profiled functions
+        self.stack = []
+
+    def isEnabled(self):
+        return self.fileName is not None
+
+    # Save the statistics into `fileName` when the process exits, or when dump() is called.
+    def enable(self, fileName):
+        if self.fileName is None:
+            atexit.register(self.dump)
+        self.fileName = fileName
+
+    # Replace the functions `names` of `owner` (module or class) by counting wrappers, once.
+    def instrument(self, owner, names):
+        for name in names:
+            function = getattr(owner, name)
+            if not getattr(function, 'isProfiled', False):
+                setattr(owner, name, self.wrap(function))
+
+    def wrap(self, function):
+        code = function.__code__
+        key = (code.co_filename, code.co_firstlineno, code.co_name)
+        stack = self.stack
+        record = self.record
+        getTime = time.perf_counter_ns
+        getAllocatedBlocks = sys.getallocatedblocks
+
+        def wrapper(*args, **kwargs):
+            caller = stack[-1][0] if stack else None
+            entry = [key, 0]
+            stack.append(entry)
+            blocks = getAllocatedBlocks()
+            start = getTime()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = getTime() - start
+                allocated = getAllocatedBlocks() - blocks
+                stack.pop()
+                if stack:
+                    stack[-1][1] += elapsed
+                record(key, caller, elapsed, elapsed - entry[1], allocated)
+
+        wrapper.isProfiled = True
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+
+    def record(self, key, caller, cumulative, own, allocated):
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = [0, 0, 0, 0, {}]
+        stats[0] += 1
+        stats[1] += own
+        stats[2] += cumulative
+        stats[3] += allocated
+
+        if caller is not None:
+            callerStats = stats[4].get(caller)
+            if callerStats is None:
+                callerStats = stats[4][caller] = [0, 0, 0]
+            callerStats[0] += 1
+            callerStats[1] += own
+            callerStats[2] += cumulative
+
+    # Statistics in the format of pstats: key -> (primitive calls, calls, own time, cumulative time, callers), in
+    # seconds.
+    def getPstats(self):
+        pstats = {}
+        for key, (calls, own, cumulative, allocated, callers) in self.stats.items():
+            pstats[key] = (calls, calls, own / 1e9, cumulative / 1e9,
+                           {caller: (count, count, callerOwn / 1e9, callerCumulative / 1e9)
+                            for caller, (count, callerOwn, callerCumulative) in callers.items()})
+        return pstats
+
+    # Save the statistics into `fileName` (default: the one given to enable()), and the text report next to them.
+    def dump(self, fileName=None):
+        fileName = fileName or self.fileName
+        if not fileName or not self.stats:
+            return
+
+        with open(fileName, 'wb') as statsFile:
+            marshal.dump(self.getPstats(), statsFile)
+        with open(fileName + REPORT_SUFFIX, 'w') as reportFile:
+            self.writeReport(reportFile)
+
+    # One line per profiled function, the most expensive first. Allocated blocks are the net count of memory blocks
+    # still allocated when the function returned, including the ones of the functions it called.
+    def writeReport(self, reportFile):
+        reportFile.write('{:>10} {:>12} {:>12} {:>12} {:>14}  {}\n'.format(
+            'calls', 'own ms', 'cumul ms', 'ns/call', 'alloc blocks', 'function'))
+        for key, (calls, own, cumulative, allocated, callers) in sorted(self.stats.items(),
+                                                                       key=lambda item: -item[1][2]):
+            reportFile.write('{:>10} {:>12.3f} {:>12.3f} {:>12} {:>14}  {}:{}({})\n'.format(
+                calls, own / 1e6, cumulative / 1e6, cumulative // calls, allocated, *key))
+
+
+profiler = Profiler()
@@ -0,0 +1,183 @@
+# Offline replay of Logic 2 async serial exports through the ISO7816 analyzer, without Logic 2.
+#
+# Usage: python Replay.py capture.csv [-o decoded.csv] [--edc-type LRC]
+import argparse
+import contextlib
+import csv
+import sys
+
+import Constants
+from Constants import EDC_Type, T0_Framing
+from HighLevelAnalyzer import Hla, AnalyzerFrame
+from Instructions import INSTRUCTION_SETS, DEFAULT_INSTRUCTION_SET
+from Log import LOG_LEVELS, DEFAULT_LOG_LEVEL
+from OfflineAnalyzers import SaleaeTime
+
+# Duration of a character (start bit, 8 data bits, parity bit) at the default ETU, used when the export has no
+# duration column.
+DEFAULT_CHAR_DURATION = 10 * Constants.DEFAULT_Fi / (Constants.DEFAULT_Di * Constants.DEFAULT_f)
+
+# Columns of the decoded output, after the frame type and times.
+OUTPUT_FIELDS = ('category', 'transmitted_data', 'hex', 'turnaround_ns', 'response_ns', 'ins', 'exchanges',
+                 'transaction_hex', 'elapsed_ns', 'session')
+
+TIME_COLUMNS = ('start_time', 'time [s]', 'time')
+DATA_COLUMNS = ('data', 'value')
+
+
+class ReplayError(Exception):
+    pass
+
+
+def findColumn(header, names, required=True):
+    for name in names:
+        if name in header:
+            return header.index(name)
+    if required:
+        raise ReplayError('No column named {} in the export header.'.format(' or '.join(repr(n) for n in names)))
+    return None
+
+
+def parseTime(text: str) -> float:
+    try:
+        return float(text)
+    except ValueError:
+        raise ReplayError('Cannot read {!r} as a time in seconds. Export the times as numbers.'.format(text))
+
+
+def parseByte(text: str) -> int:
+    try:
+        value = int(text.strip(), 0)
+    except ValueError:
+        raise ReplayError('Cannot read {!r} as a byte. Export the data in hex or decimal.'.format(text))
+    if not 0 <= value <= 0xFF:
+        raise ReplayError('{!r} is not a byte value.'.format(text))
+    return value
+
+
+# Yield the async serial frames of an export one row at a time, so the whole file is never held in memory.
+def readCapture(file, charDuration=DEFAULT_CHAR_DURATION):
+    reader = csv.reader(file)
+    header = [name.strip().lower() for name in next(reader, [])]
+    timeIndex = findColumn(header, TIME_COLUMNS)
+    dataIndex = findColumn(header, DATA_COLUMNS)
+    durationIndex = findColumn(header, ('duration',), required=False)
+    typeIndex = findColumn(header, ('type',), required=False)
+    # Columns a row must have, up to the last one read
+    columnCount = max(index for index in (timeIndex, dataIndex, durationIndex, typeIndex) if index is not None) + 1
+
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < columnCount:
+            # The end of an export stopped before completion
+            raise ReplayError('line {}: {} columns instead of {}, the row is truncated.'.format(
+                reader.line_num, len(row), columnCount))
+        # Logic 2 exports can also contain error rows
+        if typeIndex is not None and row[typeIndex] != 'data':
+            continue
+
+        start = parseTime(row[timeIndex])
+        if durationIndex is not None:
+            end = start + parseTime(row[durationIndex])
+        else:
+            end = start + charDuration
+
+        yield AnalyzerFrame('data', SaleaeTime(start), SaleaeTime(end), {'data': bytes((parseByte(row[dataIndex]),))})
+
+
+# Build the analyzer the way Logic 2 does: settings are set on the instance before __init__ is called.
+def createAnalyzer(**settings) -> Hla:
+    hla = Hla.__new__(Hla)
+    for name, value in settings.items():
+        setattr(hla, name, value)
+    hla.__init__()
+    return hla
+
+
+def writeFrames(writer, out) -> int:
+    if out is None:
+        return 0
+    if isinstance(out, AnalyzerFrame):
+        out = (out,)
+
+    for frame in out:
+        writer.writerow([frame.type, str(frame.start_time), str(frame.end_time)] +
+                        [frame.data.get(field, '') for field in OUTPUT_FIELDS])
+    return len(out)
+
+
+# Decode every frame of `inputFile` and write the output frames as CSV rows into `outputFile`, then the turnaround
+# histograms of the card into `latencyFile` if given. Return the number of input characters and of output frames.
+def replay(inputFile, outputFile, charDuration=DEFAULT_CHAR_DURATION, latencyFile=None, **settings):
+    hla = createAnalyzer(**settings)
+    writer = csv.writer(outputFile)
+    writer.writerow(('type', 'start_time', 'end_time') + OUTPUT_FIELDS)
+
+    charCount = 0
+    frameCount = 0
+    for frame in readCapture(inputFile, charDuration):
+        frameCount += writeFrames(writer, hla.decode(frame))
+        charCount += 1
+    # The last exchange may still be waiting for a following character
+    frameCount += writeFrames(writer, hla.flush())
+
+    if latencyFile is not None:
+        hla.latency.writeCSV(latencyFile, lambda claClass, ins: hla.instructions[claClass, ins])
+
+    return charCount, frameCount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Decode a Logic 2 async serial CSV export with the ISO7816 analyzer.')
+    parser.add_argument('input', help='async serial export (CSV)')
+    parser.add_argument('-o', '--output', help='decoded frames (CSV). Default: standard output')
+    parser.add_argument('--edc-type', choices=(EDC_Type.NA, EDC_Type.LRC, EDC_Type.CRC), default=EDC_Type.NA,
+                        help='error detection code used by T=1 blocks')
+    parser.add_argument('--char-duration', type=float, default=DEFAULT_CHAR_DURATION,
+                        help='character duration in seconds, used when the export has no duration column')
+    parser.add_argument('--clock-frequency', type=float, default=0,
+                        help='card clock frequency in Hz (default: 4.8 MHz)')
+    parser.add_argument('--t0-framing', choices=(T0_Framing.PROCEDURE_BYTES, T0_Framing.APDU),
+                        default=T0_Framing.PROCEDURE_BYTES,
+                        help='split T=0 exchanges by their procedure bytes, or by the timing for captures of '
+                             'whole APDUs (default: %(default)s)')
+    parser.add_argument('--instruction-set', choices=list(INSTRUCTION_SETS), default=DEFAULT_INSTRUCTION_SET,
+                        help='names of the instructions (default: %(default)s)')
+    parser.add_argument('--log-level', choices=list(LOG_LEVELS), default=DEFAULT_LOG_LEVEL,
+                        help='level of the analyzer messages (default: %(default)s)')
+    parser.add_argument('--log-file', default='', help='write the analyzer messages to this file instead of stderr')
+    parser.add_argument('--latency',
+                        help='write the turnaround histograms of the card, per instruction, to this CSV file')
+    parser.add_argument('--jsonl', default='',
+                        help='export the decoded units (ATR, PPS, APDU, T=1 block) as JSON lines to this file')
+    parser.add_argument('--profile', default='',
+                        help='profile the decoder and save the statistics (pstats format) to this file')
+    args = parser.parse_args(argv)
+
+    with contextlib.ExitStack() as stack:
+        inputFile = stack.enter_context(open(args.input, newline=''))
+        if args.output:
+            outputFile = stack.enter_context(open(args.output, 'w', newline=''))
+        else:
+            outputFile = sys.stdout
+        latencyFile = None
+        if args.latency:
+            latencyFile = stack.enter_context(open(args.latency, 'w', newline=''))
+        # Keep the analyzer console messages out of the decoded output
+        stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+
+        try:
+            charCount, frameCount = replay(inputFile, outputFile, args.char_duration, latencyFile,
+                                           edc_type=args.edc_type, clock_frequency=args.clock_frequency,
+                                           log_level=args.log_level, log_file=args.log_file,
+                                           profile_file=args.profile, export_file=args.jsonl,
+                                           instruction_set=args.instruction_set, t0_framing=args.t0_framing)
+        except ReplayError as e:
+            parser.exit(1, '{}: {}\n'.format(args.input, e))
+
+    print('{} characters decoded into {} frames.'.format(charCount, frameCount), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
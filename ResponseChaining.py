@@ -0,0 +1,81 @@
+# Reassembly of the answers fetched in several exchanges with T=0 (SEE: iso7816_4 part 5.3.4 and iso7816_3 part
+# 10.3.5): the card answers 61 XX while XX more bytes are available, fetched with GET RESPONSE, or 6C XX when the
+# command has to be sent again with Le = XX. The exchanges of a command are gathered, per logical channel, into one
+# transaction.
+
+GET_RESPONSE = 0xC0
+
+
+# Logical channel of a command (SEE: iso7816_4 part 5.4.1): 0 to 3 in the first interindustry class, 4 to 19 in the
+# further one. PC/SC commands of the reader (CLA FF) are counted on channel 0.
+def getChannel(cla):
+    if cla == 0xFF:
+        return 0
+    if cla & 0x40:
+        return 4 + (cla & 0x0F)
+    return cla & 0x03
+
+
+# Command whose answer is being fetched: its data gathered so far, and the INS and status word of its last exchange.
+class Transaction:
+    __slots__ = ('cla', 'ins', 'startFrame', 'data', 'exchanges', 'lastIns', 'sw1', 'sw2')
+
+    def __init__(self, cla, ins, startFrame):
+        self.cla = cla
+        self.ins = ins
+        # First character of the command
+        self.startFrame = startFrame
+        self.data = bytearray()
+        self.exchanges = 0
+        self.lastIns = ins
+        self.sw1 = None
+        self.sw2 = None
+
+
+# INS of the command continuing `transaction`: 61 XX is followed by GET RESPONSE, 6C XX by the command it answered
+# sent again, the first command or a GET RESPONSE with the wrong Le.
+def getExpectedIns(transaction):
+    return GET_RESPONSE if transaction.sw1 == 0x61 else transaction.lastIns
+
+
+class ResponseChaining:
+
+    def __init__(self):
+        # Channel -> Transaction waiting for a GET RESPONSE or for the command sent again
+        self.pending = {}
+
+    # INS of the command whose answer the command `cla` `ins` fetches: the first command of the transaction it
+    # continues, if any, else the command itself.
+    def getCommandIns(self, cla, ins):
+        transaction = self.pending.get(getChannel(cla))
+        if transaction is not None and ins == getExpectedIns(transaction):
+            return transaction.ins
+        return ins
+
+    # Account for the exchange of the command `cla` `ins`, started at `startFrame`, whose answer is stored from index
+    # `start` to `end` (excluded) of `answerBytes`: data, then SW1-SW2. Return the transaction it completes, if it
+    # took more than one exchange.
+    def update(self, cla, ins, startFrame, answerBytes, start, end):
+        sw1 = answerBytes[end - 2]
+        sw2 = answerBytes[end - 1]
+        isPending = sw1 == 0x61 or sw1 == 0x6C
+        channel = getChannel(cla)
+
+        transaction = self.pending.pop(channel, None)
+        if transaction is not None:
+            if ins != getExpectedIns(transaction):
+                transaction = None
+        if transaction is None:
+            if not isPending:
+                return None
+            transaction = Transaction(cla, ins, startFrame)
+
+        transaction.data += answerBytes[start:end - 2]
+        transaction.exchanges += 1
+        transaction.lastIns = ins
+        transaction.sw1 = sw1
+        transaction.sw2 = sw2
+        if isPending:
+            self.pending[channel] = transaction
+            return None
+        return transaction
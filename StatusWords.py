@@ -0,0 +1,354 @@
+# SEE: ISO7816_4 part 5.4.5
+
+# Text shared by every status word of a SW1 group, put before the SW2 specific message.
+SW1_PREFIX = {
+    0x62: 'Memory unchanged. ',
+    0x63: 'Memory changed. ',
+    0x64: 'Memory unchanged. ',
+    0x65: 'Memory changed. ',
+    0x68: 'CLA not assumed. ',
+    0x69: 'Command not allowed. ',
+    0x6A: 'P1-P2 incorrect. ',
+}
+
+# SW1 -> {SW2 -> message} for every fully defined status word.
+SW_MESSAGES = {
+    0x62: {
+        0x00: 'No precisions.',
+        0x01: 'NV-Ram not changed 1.',
+        0x81: 'Part of returned data may be corrupted',
+        0x82: 'End of file/record reached before reading Le bytes.',
+        0x83: 'Selected file invalidated.',
+        0x84: 'Selected file is not valid. FCI not formated according to ISO',
+        0x85: 'No input data available from a sensor on the card. No Purse Engine enslaved for R3bc.',
+        0xA2: 'Wrong R-MAC.',
+        0xA4: 'Card locked (during reset( )).',
+        0xF1: 'Wrong C-MAC.',
+        0xF3: 'Internal reset.',
+        0xF5: 'Default agent locked.',
+        0xF7: 'Cardholder locked.',
+        0xF8: 'Basement is current agent.',
+        0xF9: 'CALC Key Set not unblocked.',
+    },
+    0x63: {
+        0x00: 'No precisions.',
+        0x81: 'File filled up by the last write. Loading/updating is not allowed.',
+        0x82: 'Card key not supported.',
+        0x83: 'Reader key not supported.',
+        0x84: 'Plaintext transmission not supported.',
+        0x85: 'Secured transmission not supported.',
+        0x86: 'Volatile memory is not available.',
+        0x87: 'Non-volatile memory is not available.',
+        0x88: 'Key number not valid.',
+        0x89: 'Key length is not correct.',
+        0xC0: 'Verify fail, no try left.',
+        0xC1: 'Verify fail, 1 try left.',
+        0xC2: 'Verify fail, 2 tries left.',
+        0xC3: 'Verify fail, 3 tries left.',
+        0xF1: 'More data expected.',
+        0xF2: 'More data expected and proactive command pending.',
+    },
+    0x64: {
+        0x00: 'No information given (NV-Ram not changed).',
+        0x01: 'Command timeout. Immediate response required by the card.',
+    },
+    0x65: {
+        0x00: 'No precisions.',
+        0x01: 'Write error. Memory failure. There have been problems in writing or reading the EEPROM. '
+                  'Other hardware problems may also bring this error.',
+        0x81: 'Memory failure.',
+    },
+    0x66: {
+        0x00: 'Error while receiving (timeout)',
+        0x01: 'Error while receiving (character parity error',
+        0x02: 'Wrong checksum',
+        0x03: 'The current DF file without FCI',
+        0x04: 'No SF or KF under the current DF',
+        0x69: 'Incorrect Encryption/Decryption Padding',
+    },
+    0x68: {
+        0x00: 'No precisions.',
+        0x81: 'Logical channel not supported.',
+        0x82: 'Secure messaging not supported.',
+        0x83: 'Last command of the chain expected.',
+        0x84: 'Command chaining not supported.',
+    },
+    0x69: {
+        0x00: 'No precisions.',
+        0x01: 'Command not accepted (inactive state).',
+        0x81: 'Incompatibility with file structure.',
+        0x82: 'Security condition not satisfied.',
+        0x83: 'Authentication method blocked.',
+        0x84: 'Referenced data reversibly blocked (invalidated).',
+        0x85: 'Conditions of use not satisfied.',
+        0x86: 'Command not allowed (no current EF).',
+        0x87: 'Expected secure messaging (SM) object missing.',
+        0x88: 'Incorrect secure messaging (SM) data object',
+        0x8D: 'Reserved.',
+        0x96: 'Data must be updated again.',
+        0xE1: 'POL1 of the currently Enabled Profile prevents this action.',
+        0xF0: 'Permission Denied.',
+        0xF1: 'Permission Denied – Missing Privilege',
+    },
+    0x6A: {
+        0x00: 'No precisions.',
+        0x80: 'The parameters in the data field are incorrect..',
+        0x81: 'Function not supported.',
+        0x82: 'File not found.',
+        0x83: 'Record not found.',
+        0x84: 'Not enough memory in record or file.',
+        0x85: 'Lc inconsistent with TLV structure.',
+        0x86: 'P1-P2 incorrect.',
+        0x87: 'Lc inconsistent with P1-P2.',
+        0x88: 'Reference data not found.',
+        0x89: 'File already exists',
+        0x8A: 'DF name already exists.',
+        0xF0: 'Wrong parameter value',
+    },
+    0x6B: {
+        0x00: 'P1-P2 incorrect.',
+    },
+    0x6C: {
+        0x00: 'Incorrect P3 length..',
+    },
+    0x6D: {
+        0x00: 'INS not supported or valid.',
+    },
+    0x6F: {
+        0x00: 'Command aborted – more exact diagnosis not possible.',
+        0xFF: 'Card dead.',
+    },
+    0x90: {
+        0x00: 'Command successfully executed ',
+        0x04: 'PIN not successfully verified, 3 or more PIN tries left.',
+        0x08: 'Key/file not found.',
+        0x80: 'Unblock Try Counter has reached zero.',
+    },
+    0x91: {
+        0x00: 'OK',
+        0x01: 'States.activity, States.lock Status or States.lockable has wrong value',
+        0x02: 'Transaction number reached its limit',
+        0x0C: 'No changes',
+        0x0E: 'Insufficient NV-Memory to complete command',
+        0x1C: 'Command code not supported',
+        0x1E: 'CRC or MAC does not match data',
+        0x40: 'Invalid key number specified',
+        0x7E: 'Length of command string invalid',
+        0x9D: 'Not allow the requested command',
+        0x9E: 'Value of the parameter invalid',
+        0xA0: 'Requested AID not present on PICC',
+        0xA1: 'Unrecoverable error within application',
+        0xAE: 'Authentication status does not allow the requested command',
+        0xAF: 'Additional data frame is expected to be sent',
+        0xBE: 'Out of boundary',
+        0xC1: 'Unrecoverable error within PICC',
+        0xCA: 'Previous Command was not fully completed',
+        0xCD: 'PICC was disabled by an unrecoverable error',
+        0xCE: 'Number of Applications limited to 28',
+        0xDE: 'File or application already exists ',
+        0xEE: 'Could not complete NV-write operation due to loss of power',
+        0xF0: 'Specified file number does not exist',
+        0xF1: 'Unrecoverable error within file',
+    },
+    0x92: {
+        0x10: 'Insufficient memory. No more storage available.',
+        0x40: 'Writing to EEPROM not successful.',
+    },
+    0x93: {
+        0x01: 'Integrity error.',
+        0x02: 'Candidate S2 invalid.',
+        0x03: 'Application is permanently locked.',
+    },
+    0x94: {
+        0x00: 'No EF selected.',
+        0x01: 'Candidate currency code does not match purse currency',
+        0x02: 'Address range exceeded.',
+        0x03: 'Candidate amount too low',
+        0x04: 'FID not found, record not found or comparison pattern not found.',
+        0x05: 'Problems in the data field.',
+        0x06: 'Required MAC unavailable',
+        0x07: 'Bad currency : purse engine has no slot with R3bc currency',
+        0x08: 'Selected file type does not match command.',
+    },
+    0x97: {
+        0x00: 'PIN blocked and Unblock Try Counter is 1 or 2.',
+        0x02: 'Main keys are blocked.',
+        0x04: 'PIN not successfully verified, 3 or more PIN tries left.',
+        0x84: 'Base key.',
+        0x85: 'Limit exceeded – C-MAC key.',
+        0x86: 'SM error – Limit exceeded – R-MAC key.',
+        0x87: 'Limit exceeded – sequence counter.',
+        0x88: 'Limit exceeded – R-MAC length.',
+        0x89: 'Service not available.',
+    },
+    0x98: {
+        0x02: 'No PIN defined.',
+        0x04: 'Access conditions not satisfied, authentication failed.',
+        0x35: 'ASK RANDOM or GIVE RANDOM not executed.',
+        0x40: 'PIN verification not successful.',
+        0x50: 'INCREASE or DECREASE could not be executed because a limit has been reached.',
+        0x62: 'Authentication Error, application specific (incorrect MAC)',
+    },
+    0x99: {
+        0x00: '1 PIN try left',
+        0x04: 'PIN not successfully verified, 1 PIN try left',
+        0x85: 'Wrong status – Cardholder lock',
+        0x86: 'Missing privilege',
+        0x87: 'PIN is not installed',
+        0x88: 'Wrong status – R-MAC state',
+    },
+    0x9A: {
+        0x00: '2 PIN try left',
+        0x04: 'PIN not succesfully verified, 2 PIN try left',
+        0x71: 'Wrong parameter value – Double agent AID',
+        0x72: 'Wrong parameter value – Double agent Type',
+    },
+    0x9D: {
+        0x05: 'Incorrect certificate type',
+        0x07: 'Incorrect session data size',
+        0x08: 'Incorrect DIR file record size',
+        0x09: 'Incorrect FCI record size',
+        0x0A: 'Incorrect code size',
+        0x10: 'Insufficient memory to load application',
+        0x11: 'Invalid AID',
+        0x12: 'Duplicate AID',
+        0x13: 'Application previously loaded',
+        0x14: 'Application history list full',
+        0x15: 'Application not open',
+        0x17: 'Invalid offset',
+        0x18: 'Application already loaded',
+        0x19: 'Invalid certificate',
+        0x1A: 'Invalid signature',
+        0x1B: 'Invalid KTU',
+        0x1D: 'MSM controls not set',
+        0x1E: 'Application signature does not exist',
+        0x1F: 'KTU does not exist',
+        0x20: 'Application not loaded',
+        0x21: 'Invalid Open command data length',
+        0x30: 'Check data parameter is incorrect (invalid start address)',
+        0x31: 'Check data parameter is incorrect (invalid length)',
+        0x32: 'Check data parameter is incorrect (illegal memory check area)',
+        0x40: 'Invalid MSM Controls ciphertext',
+        0x41: 'MSM controls already set',
+        0x42: 'Set MSM Controls data length less than 2 bytes',
+        0x43: 'Invalid MSM Controls data length',
+        0x44: 'Excess MSM Controls ciphertext',
+        0x45: 'Verification of MSM Controls data failed',
+        0x50: 'Invalid MCD Issuer production ID',
+        0x51: 'Invalid MCD Issuer ID',
+        0x52: 'Invalid set MSM controls data date',
+        0x53: 'Invalid MCD number',
+        0x54: 'Reserved field error',
+        0x55: 'Reserved field error',
+        0x56: 'Reserved field error',
+        0x57: 'Reserved field error',
+        0x60: 'MAC verification failed',
+        0x61: 'Maximum number of unblocks reached',
+        0x62: 'Card was not blocked',
+        0x63: 'Crypto functions not available',
+        0x64: 'No application loaded',
+    },
+    0x9E: {
+        0x00: 'PIN not installed',
+        0x04: 'PIN not successfully verified, PIN not installed',
+    },
+    0x9F: {
+        0x00: 'PIN blocked and Unblock Try Counter is 3',
+        0x04: 'PIN not successfully verified, PIN blocked and Unblock Try Counter is 3',
+    },
+    0x95: {
+        0x00: 'Bad sequence.',
+    },
+    0x96: {
+        0x80: 'Slave not found.',
+    },
+}
+
+
+def _proprietaryOrRFU(sw2):
+    # 'XF' values are proprietary
+    if sw2 >> 4 == 0xF:
+        return ''
+    return 'RFU.'
+
+
+def _memoryChanged(sw2):
+    if sw2 >> 4 == 0xC:
+        return 'The counter has reached the value ' + str(sw2 & 0x0F) + '.'
+    if sw2 >> 4 == 0xF:
+        return ''
+    return 'RFU'
+
+
+def _memoryUnchanged(sw2):
+    if sw2 >> 4 == 0xC:
+        return 'Counter with value ' + str(sw2 & 0x0F) + ' (command dependent).'
+    return _proprietaryOrRFU(sw2)
+
+
+def _writingEEPROM(sw2):
+    if sw2 >> 4 == 0x0:
+        return 'Writing to EEPROM successful after ' + str(sw2 & 0x0F) + ' attempts.'
+    return 'RFU.'
+
+
+# SW1 -> message used when SW2 has no entry in SW_MESSAGES. Wildcard ranges (61xx, 6Cxx, 63Cx, 9Fxx, ...) use a
+# function of SW2.
+SW1_DEFAULT = {
+    0x61: lambda sw2: 'Still ' + str(sw2) + ' available octets.',
+    0x62: _memoryUnchanged,
+    0x63: _memoryChanged,
+    0x64: 'RFU.',
+    0x65: _proprietaryOrRFU,
+    0x66: '',
+    0x67: 'Incorrect length.',
+    0x68: _proprietaryOrRFU,
+    0x69: _proprietaryOrRFU,
+    0x6A: _proprietaryOrRFU,
+    0x6B: 'Reference incorrect (procedure byte).',
+    0x6C: lambda sw2: 'Wrong Le. Correct : ' + str(sw2) + '.',
+    0x6D: 'INS not programmed or valid.',
+    0x6E: 'CLA incorrect.',
+    0x6F: 'No precise diagnosis.',
+    0x90: 'RFU.',
+    0x91: 'RFU.',
+    0x92: _writingEEPROM,
+    0x93: 'RUF.',
+    0x94: 'RUF.',
+    0x97: 'RUF.',
+    0x98: 'RUF.',
+    0x99: 'RUF.',
+    0x9A: 'RUF.',
+    0x9D: 'RUF.',
+    0x9E: 'RUF.',
+    0x9F: lambda sw2: 'Command successfully executed; ' + str(sw2) + ' bytes of data are available and can be '
+                      'requested using GET RESPONSE.',
+}
+
+# Dense table indexed by SW1SW2, filled the first time each status word is seen.
+_swTable = None
+
+
+def _resolveSW(sw1, sw2):
+    readData = SW_MESSAGES.get(sw1, {}).get(sw2)
+    if readData is None:
+        readData = SW1_DEFAULT.get(sw1)
+        if readData is None:
+            # Other '9X' values are application related
+            readData = 'Application related status.' if sw1 >> 4 == 0x9 else ''
+        elif not isinstance(readData, str):
+            readData = readData(sw2)
+    return SW1_PREFIX.get(sw1, '') + readData
+
+
+# Return the meaning of a status word.
+def decodeSW(sw1, sw2):
+    global _swTable
+    if _swTable is None:
+        _swTable = [None] * 0x10000
+
+    sw = sw1 << 8 | sw2
+    readData = _swTable[sw]
+    if readData is None:
+        readData = _swTable[sw] = _resolveSW(sw1, sw2)
+    return readData
@@ -0,0 +1,110 @@
+# Transport of the T=0 protocol (SEE: iso7816_3 part 10.3): the reader sends a header CLA INS P1 P2 P3, then the card
+# drives the exchange with procedure bytes until it sends SW1-SW2:
+# - ACK (INS): the P3 bytes still to come are sent at once;
+# - ACK (INS xor FF): one data byte is sent, then a new procedure byte;
+# - NULL (60): the card is busy, a new procedure byte follows;
+# - SW1 (6X but 60, 9X): SW2 follows and ends the exchange.
+# The data is sent by the card for the commands reading data (P3 is then Le), by the reader otherwise (P3 is Lc).
+#
+# The parser only follows these bytes: it does not depend on the timing of the characters.
+
+# Roles of the characters of an exchange
+HEADER = 0
+ACK = 1
+ACK_ONE = 2
+NULL = 3
+DATA = 4
+SW1 = 5
+SW2 = 6
+# Neither a procedure byte nor SW1 where one is expected: the exchange is broken
+INVALID = 7
+
+NULL_BYTE = 0x60
+HEADER_LENGTH = 5
+
+# States of the parser
+_HEADER = 0
+_PROCEDURE = 1
+_DATA = 2
+_SW2 = 3
+_ENDED = 4
+
+
+class T0Parser:
+
+    # `outgoing`: INS of the commands whose data is sent by the card.
+    def __init__(self, outgoing):
+        self.outgoing = outgoing
+        self.reset()
+
+    # Wait for the header of a new exchange.
+    def reset(self):
+        self.state = _HEADER
+        self.count = 0
+        self.ins = None
+        self.p3 = None
+        # True if the data is sent by the card
+        self.isOutgoing = False
+        # Data bytes still to come, and whether the last ACK only allowed one of them
+        self.remaining = 0
+        self.isSingle = False
+
+    # True between two exchanges, before the first character of a header.
+    def isWaitingHeader(self):
+        return self.state == _HEADER and not self.count
+
+    # True if the card is expected to send a procedure byte, and `value` is neither one nor SW1: the card went mute
+    # after the header, and `value` comes from something else, like the reset of the card.
+    def isUnexpected(self, value):
+        if self.state != _PROCEDURE:
+            return False
+        return value != NULL_BYTE and value != self.ins and value != self.ins ^ 0xFF and \
+            value & 0xF0 != 0x60 and value & 0xF0 != 0x90
+
+    # Role of the next character of the exchange, of value `value`.
+    def feed(self, value):
+        state = self.state
+
+        # Most characters are data, sent after an ACK
+        if state == _DATA:
+            self.remaining -= 1
+            if not self.remaining or self.isSingle:
+                self.state = _PROCEDURE
+            return DATA
+
+        if state == _HEADER:
+            self.count += 1
+            if self.count == 2:
+                self.ins = value
+                self.isOutgoing = value in self.outgoing
+            elif self.count == HEADER_LENGTH:
+                self.p3 = value
+                # P3 = 0 asks for 256 bytes from the card, and sends no data to it
+                self.remaining = value or (256 if self.isOutgoing else 0)
+                self.state = _PROCEDURE
+            return HEADER
+
+        if state == _SW2:
+            self.state = _ENDED
+            return SW2
+
+        if state == _ENDED:
+            return INVALID
+
+        # Procedure byte
+        if value == NULL_BYTE:
+            return NULL
+        if value == self.ins:
+            self.isSingle = False
+            if self.remaining:
+                self.state = _DATA
+            return ACK
+        if value == self.ins ^ 0xFF:
+            self.isSingle = True
+            if self.remaining:
+                self.state = _DATA
+            return ACK_ONE
+        if value & 0xF0 == 0x60 or value & 0xF0 == 0x90:
+            self.state = _SW2
+            return SW1
+        return INVALID
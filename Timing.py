@@ -0,0 +1,77 @@
+# Timing of the line (SEE: iso7816_3 parts 7.1, 7.2, 10.2 and 11.4), in integer nanoseconds.
+import Constants
+
+try:
+    from saleae.data import GraphTimeDelta
+except ImportError:
+    from OfflineAnalyzers import SaleaeTimeDelta as GraphTimeDelta
+
+NS_PER_SECOND = 1000000000
+
+
+# Nanoseconds elapsed from `origin` to `time`, both Logic 2 times.
+def toNanoseconds(time, origin):
+    return round(float(time - origin) * NS_PER_SECOND)
+
+
+# Logic 2 time `ns` nanoseconds after `origin`.
+def fromNanoseconds(ns, origin):
+    return origin + GraphTimeDelta(ns / NS_PER_SECOND)
+
+
+# Times derived from the parameters of the line. They are computed again only when a parameter changes (ATR, PPS),
+# so that checking the gap between two characters is a single integer comparison.
+class TimingModel:
+
+    def __init__(self):
+        self.FI = Constants.DEFAULT_Fi
+        self.DI = Constants.DEFAULT_Di
+        self.f = Constants.DEFAULT_f
+        self.N = Constants.DEFAULT_N
+        self.WI = Constants.DEFAULT_WI
+        self.T = (0,)
+        self.computeTimes()
+
+    # Change the parameters of the line. Return True if one of them changed, and the times were computed again.
+    def setParameters(self, FI, DI, f, N, WI, T):
+        parameters = (FI, DI, f, N, WI, tuple(T))
+        if parameters == (self.FI, self.DI, self.f, self.N, self.WI, self.T):
+            return False
+
+        self.FI, self.DI, self.f, self.N, self.WI, self.T = parameters
+        self.computeTimes()
+        return True
+
+    def computeTimes(self):
+        etu = self.FI / (self.DI * self.f)
+
+        # Character Waiting Time
+        if 1 in self.T:
+            cwt = etu * (11 + 2 ** self.WI)
+        else:
+            cwt = etu * 11
+
+        # Minimum delay between the leading edges of two characters, N being the extra guard time
+        if 15 in self.T:
+            q = Constants.DEFAULT_Fi / Constants.DEFAULT_Di
+        else:
+            q = self.FI / self.DI
+        guardTime = 12 * etu + q * self.N / self.f
+
+        # Block Waiting Time of T=1, with the default BWI
+        bwt = 11 * etu + 2 ** Constants.DEFAULT_BWI * 960 * Constants.DEFAULT_Fi / self.f
+
+        self.etu = round(etu * NS_PER_SECOND)
+        self.cwt = round(cwt * NS_PER_SECOND)
+        self.guardTime = round(guardTime * NS_PER_SECOND)
+        self.bwt = round(bwt * NS_PER_SECOND)
+
+        # Gaps between two characters of a T=0 exchange: the line turned around (the card answers the command), or
+        # the message ended (a new command starts).
+        self.turnaroundGap = round((cwt / 2 - etu) * NS_PER_SECOND)
+        self.endOfMessageGap = round(cwt * 1.3 * NS_PER_SECOND)
+        # Shortest idle line before the TS of a new ATR: the reset of the card
+        self.resetGap = round(2 * Constants.RESET_CYCLES / self.f * NS_PER_SECOND)
+        # Longest delay between the leading edges of two characters of an ATR, sent with the default FI and DI
+        self.atrWaitingTime = round(Constants.ATR_WAITING_ETU * Constants.DEFAULT_Fi / (Constants.DEFAULT_Di * self.f)
+                                    * NS_PER_SECOND)